@@ -0,0 +1,167 @@
+from typing import Optional, Iterable, Deque
+from collections import deque
+import asyncio
+import json
+import logging
+import math
+from config import settings
+from auth import fake_users_db, get_bearer_token, get_username_from_token
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class AdmissionController:
+    """
+    Tracks in-flight requests and Celery queue depth and decides whether a new
+    request may start.
+
+    Low-priority requests (anonymous and free-tier) are shed once load passes
+    `low_priority_share` of capacity, keeping the remaining headroom for premium
+    users. High-priority requests that arrive at full capacity wait up to
+    `max_wait` seconds for a slot before being rejected.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_queue_depth: int,
+        low_priority_share: float = 0.75,
+        max_wait: float = 0.5,
+        retry_after: int = 5,
+        queue_names: Iterable[str] = ("celery",),
+        poll_interval: float = 1.0,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue_depth = max_queue_depth
+        self.low_priority_share = low_priority_share
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self.queue_names = list(queue_names)
+        self.poll_interval = poll_interval
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.redis = None
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._task: Optional[asyncio.Task] = None
+
+    def is_high_priority(self, headers) -> bool:
+        username = get_username_from_token(get_bearer_token(headers.get("authorization")))
+        if not username:
+            return False
+        return fake_users_db.get(username, {}).get("is_premium", False)
+
+    def _capacity(self, high_priority: bool):
+        share = 1.0 if high_priority else self.low_priority_share
+        return self.max_in_flight * share, self.max_queue_depth * share
+
+    def has_room(self, high_priority: bool) -> bool:
+        max_in_flight, max_queue_depth = self._capacity(high_priority)
+        return self.in_flight < max_in_flight and self.queue_depth < max_queue_depth
+
+    def retry_after_seconds(self) -> int:
+        load = max(
+            self.in_flight / max(self.max_in_flight, 1),
+            self.queue_depth / max(self.max_queue_depth, 1),
+        )
+        return max(1, math.ceil(self.retry_after * load))
+
+    async def acquire(self, high_priority: bool) -> bool:
+        """Reserve a slot for a request, returning False if it should be shed."""
+        if self.has_room(high_priority):
+            self.in_flight += 1
+            return True
+        if not high_priority or self.max_wait <= 0 or self.queue_depth >= self.max_queue_depth:
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        # The releasing request handed its slot over to us
+        return True
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    async def _poll_queue_depth(self):
+        while True:
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for name in self.queue_names:
+                        pipe.llen(name)
+                    self.queue_depth = sum(await pipe.execute())
+            except Exception as e:
+                logger.debug(f"Could not read Celery queue depth: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self, redis_client):
+        """Start sampling Celery queue depth from the broker."""
+        self.redis = redis_client
+        if self._task is None:
+            self._task = asyncio.create_task(self._poll_queue_depth())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware that rejects requests with 503 and Retry-After before they
+    reach the application when the controller has no room for them.
+
+    Paths in `protected_paths` and anything outside `guarded_prefix` bypass
+    admission control entirely.
+    """
+
+    def __init__(self, app, controller: AdmissionController, guarded_prefix: str = "/api/", protected_paths: Iterable[str] = ()):
+        self.app = app
+        self.controller = controller
+        self.guarded_prefix = guarded_prefix
+        self.protected_paths = frozenset(protected_paths)
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not path.startswith(self.guarded_prefix) or path in self.protected_paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"] if k == b"authorization"}
+        if not await self.controller.acquire(self.controller.is_high_priority(headers)):
+            await self._reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": "Server is overloaded. Please retry later."}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.controller.retry_after_seconds()).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+# Shared admission controller for the API
+admission_controller = AdmissionController(
+    max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+    max_queue_depth=settings.ADMISSION_MAX_QUEUE_DEPTH,
+    low_priority_share=settings.ADMISSION_LOW_PRIORITY_SHARE,
+    max_wait=settings.ADMISSION_MAX_WAIT,
+    retry_after=settings.ADMISSION_RETRY_AFTER,
+)
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for CPU-bound hot paths.
+
+Each benchmark is timed over a synthetic corpus of configurable size.
+Results are printed and can be saved as JSON; --compare flags benchmarks
+that got slower than a saved baseline by more than --threshold.
+
+Example:
+    ./benchmarks.py --docs 200 --words 400 --output bench.json
+    ./benchmarks.py --compare bench.json --threshold 0.15
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Any, Tuple
+from corpus import corpus_bytes, make_corpus
+
+# Registered benchmarks: name -> setup(corpus) returning (operation, bytes per call)
+BENCHMARKS: Dict[str, Callable[[List[str]], Tuple[Callable[[], Any], int]]] = {}
+
+def benchmark(name: str):
+    """Register a benchmark setup function under `name`."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+# Benchmarks
+
+@benchmark("auth.jwt_encode")
+def bench_jwt_encode(corpus):
+    from auth import create_access_token
+    return (lambda: create_access_token({"sub": "benchmark_user"})), 0
+
+@benchmark("auth.jwt_decode")
+def bench_jwt_decode(corpus):
+    from auth import create_access_token, get_username_from_token
+    token, _ = create_access_token({"sub": "benchmark_user"})
+    return (lambda: get_username_from_token(token)), 0
+
+@benchmark("validation.text_input")
+def bench_text_input(corpus):
+    from routes.plagiarism import TextInput
+    from config import settings
+    docs = [doc[:settings.MAX_TEXT_LENGTH] for doc in corpus]
+
+    def run():
+        for doc in docs:
+            TextInput(text=doc)
+    return run, corpus_bytes(docs)
+
+@benchmark("validation.plagiarism_result")
+def bench_plagiarism_result(corpus):
+    from routes.plagiarism import PlagiarismResult
+    results = [
+        {"percentage": i % 100 + 0.5, "sources": [f"https://example.com/source{j}" for j in range(10)]}
+        for i in range(len(corpus))
+    ]
+
+    def run():
+        for result in results:
+            PlagiarismResult(**result)
+    return run, 0
+
+def history_page(corpus):
+    """A /history response body with one plagiarism entry per document."""
+    return {
+        "items": [
+            {
+                "id": i,
+                "type": "plagiarism",
+                "text": doc,
+                "result": {"percentage": 10.5, "sources": [f"https://example.com/source{j}" for j in range(5)]},
+                "timestamp": "2024-01-01T00:00:00Z",
+            }
+            for i, doc in enumerate(corpus)
+        ],
+        "next_cursor": "MTIz",
+    }
+
+@benchmark("encoding.response_model")
+def bench_response_model(corpus):
+    # FastAPI's default path: validate against response_model, jsonable_encoder, JSONResponse
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from routes.user import HistoryPage
+    page = history_page(corpus)
+    body = JSONResponse(page).body
+    return (lambda: JSONResponse(jsonable_encoder(HistoryPage(**page))).body), len(body)
+
+@benchmark("encoding.fast_response")
+def bench_fast_response(corpus):
+    from responses import fast_response
+    from routes.user import HistoryPage
+    page = history_page(corpus)
+    body = fast_response(page).body
+    return (lambda: fast_response(page, HistoryPage).body), len(body)
+
+def register_compression_benchmarks():
+    from content_encoding import available_encodings, encoder_for, DEFAULT_LEVELS
+
+    def setup(encoding, level):
+        def bench(corpus):
+            from responses import dumps
+            body = dumps(history_page(corpus))
+
+            def run():
+                encoder = encoder_for(encoding, level)
+                encoder.compress(body)
+                encoder.finish()
+            return run, len(body)
+        return bench
+
+    for encoding in available_encodings():
+        for level in sorted({1, DEFAULT_LEVELS[encoding]}):
+            benchmark(f"compression.{encoding}_{level}")(setup(encoding, level))
+
+register_compression_benchmarks()
+
+def register_frame_benchmarks():
+    from frames import CODECS
+
+    def setup(media_type, direction):
+        def bench(corpus):
+            from frames import FrameDecoder, encode_frame
+            documents = [{"id": f"doc-{i}", "text": doc} for i, doc in enumerate(corpus)]
+            body = b"".join(encode_frame(document, media_type) for document in documents)
+            if direction == "encode":
+                return (lambda: b"".join(encode_frame(document, media_type) for document in documents)), len(body)
+            return (lambda: FrameDecoder(media_type, len(body)).feed(body)), len(body)
+        return bench
+
+    for media_type in CODECS:
+        name = media_type.rsplit("+", 1)[1]
+        for direction in ("encode", "decode"):
+            benchmark(f"frames.{name}_{direction}")(setup(media_type, direction))
+
+register_frame_benchmarks()
+
+def register_source_store_benchmarks():
+    def setup(cache_blocks):
+        def bench(corpus):
+            import tempfile
+            from source_store import SourceStore
+            store = SourceStore(tempfile.mkdtemp(prefix="bench_sources_"), block_chars=4096, cache_blocks=cache_blocks)
+            for i, doc in enumerate(corpus):
+                store.add(f"https://example.com/{i}", doc)
+            rng = random.Random(1)
+            spans = []
+            for _ in range(100):
+                i = rng.randrange(len(corpus))
+                start = rng.randrange(len(corpus[i]))
+                spans.append((f"https://example.com/{i}", start, start + 80))
+
+            def run():
+                for url, start, end in spans:
+                    store.snippet(url, start, end, 200)
+            return run, 0
+        return bench
+
+    benchmark("sources.snippet")(setup(0))
+    benchmark("sources.snippet_cached")(setup(256))
+
+register_source_store_benchmarks()
+
+def obfuscate(corpus: List[str], seed: int = 1) -> List[str]:
+    """Corpus with some letters swapped for Cyrillic lookalikes and zero-width spaces added."""
+    rng = random.Random(seed)
+    lookalikes = {"a": "\u0430", "e": "\u0435", "o": "\u043e", "p": "\u0440", "c": "\u0441"}
+    return [
+        "".join(
+            lookalikes[c] if c in lookalikes and rng.random() < 0.2 else c + "\u200b" if rng.random() < 0.01 else c
+            for c in doc
+        )
+        for doc in corpus
+    ]
+
+def register_normalize_benchmarks():
+    def setup(function, obfuscated):
+        def bench(corpus):
+            import normalize
+            operation = getattr(normalize, function)
+            docs = obfuscate(corpus) if obfuscated else corpus
+
+            def run():
+                for doc in docs:
+                    operation(doc)
+            return run, corpus_bytes(docs)
+        return bench
+
+    for function in ("fold", "normalize"):
+        benchmark(f"normalize.{function}")(setup(function, False))
+        benchmark(f"normalize.{function}_obfuscated")(setup(function, True))
+
+register_normalize_benchmarks()
+
+@benchmark("simhash.fingerprint")
+def bench_simhash_fingerprint(corpus):
+    import simhash
+
+    def run():
+        for doc in corpus:
+            simhash.fingerprint(simhash.tokenize(doc))
+    return run, corpus_bytes(corpus)
+
+@benchmark("simhash.lookup")
+def bench_simhash_lookup(corpus):
+    import simhash
+    index = simhash.SimHashIndex(max_distance=5, max_entries=20000)
+    rng = random.Random(1)
+    for _ in range(20000):
+        index.add(rng.getrandbits(64), None, "", {})
+    queries = [rng.getrandbits(64) for _ in range(100)]
+
+    def run():
+        for value in queries:
+            index.lookup(value)
+    return run, 0
+
+def register_submission_benchmarks():
+    """Delta index insert and query at two delta sizes; the times should match."""
+    def setup(operation, size):
+        def bench(corpus):
+            import os
+            import tempfile
+            from submissions import Submission, SubmissionIndex, fingerprints
+            index = SubmissionIndex(os.path.join(tempfile.mkdtemp(prefix="bench_submissions_"), "submissions.db"))
+            rng = random.Random(1)
+            # Filler submissions with realistic fingerprint counts
+            for i in range(size):
+                values = {rng.getrandbits(63) for _ in range(120)}
+                index.insert(Submission(f"filler-{i}", "filler", f"filler-{i}", 0.0, values))
+            values = [fingerprints(doc) for doc in corpus]
+            counter = iter(range(10 ** 9))
+
+            if operation == "insert":
+                def run():
+                    for doc_values in values:
+                        n = next(counter)
+                        index.insert(Submission(f"bench-{n}", "bench", f"bench-{n}", 0.0, doc_values))
+            else:
+                for i, doc_values in enumerate(values):
+                    index.insert(Submission(f"doc-{i}", "owner", f"doc-{i}", 0.0, doc_values))
+
+                def run():
+                    for doc_values in values:
+                        index.search(doc_values, "bench", 0.1, 5)
+            return run, 0
+        return bench
+
+    for size in (1000, 20000):
+        for operation in ("insert", "query"):
+            benchmark(f"submissions.delta_{operation}_{size // 1000}k")(setup(operation, size))
+
+register_submission_benchmarks()
+
+@benchmark("history.digest")
+def bench_history_digest(corpus):
+    from history import digest
+
+    def run():
+        for doc in corpus:
+            digest(doc)
+    return run, corpus_bytes(corpus)
+
+@benchmark("history.compress")
+def bench_history_compress(corpus):
+    import zlib
+    encoded = [doc.encode("utf-8") for doc in corpus]
+
+    def run():
+        for body in encoded:
+            zlib.compress(body, 6)
+    return run, corpus_bytes(corpus)
+
+@benchmark("rate_limit.window")
+def bench_rate_limit_window(corpus):
+    from rate_limit import LocalWindow
+    window = LocalWindow(limit=10 ** 9, window=1)
+    return window.take, 0
+
+@benchmark("tracing.parse_traceparent")
+def bench_traceparent(corpus):
+    from tracing import parse_traceparent
+    header = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+    return (lambda: parse_traceparent(header)), 0
+
+# Runner
+
+def time_operation(operation: Callable[[], Any], min_time: float, repeat: int) -> List[float]:
+    """Return seconds per call for each of `repeat` timed rounds."""
+    # Calibrate the number of calls per round to take at least min_time
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            operation()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 10 or calls >= 10 ** 7:
+            break
+        calls *= 10
+    calls = max(1, int(calls * (min_time / max(elapsed, 1e-9))))
+
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            operation()
+        rounds.append((time.perf_counter() - start) / calls)
+    return rounds
+
+def run_benchmarks(names: List[str], corpus: List[str], min_time: float, repeat: int) -> Dict[str, Any]:
+    results = {}
+    for name in names:
+        operation, nbytes = BENCHMARKS[name](corpus)
+        rounds = time_operation(operation, min_time, repeat)
+        median = statistics.median(rounds)
+        result = {
+            "median_s": median,
+            "min_s": min(rounds),
+            "stdev_s": statistics.stdev(rounds) if len(rounds) > 1 else 0.0,
+            "ops_per_s": 1 / median if median else 0.0,
+        }
+        if nbytes:
+            result["mb_per_s"] = nbytes / median / 1e6 if median else 0.0
+        results[name] = result
+        throughput = f"  {result['mb_per_s']:9.1f} MB/s" if nbytes else ""
+        print(f"{name:<36} {format_seconds(median):>12}/op{throughput}")
+    return results
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Return benchmarks whose median time regressed by more than threshold."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base["median_s"]:
+            continue
+        change = result["median_s"] / base["median_s"] - 1
+        if change > threshold:
+            regressions.append(
+                f"{name}: {format_seconds(result['median_s'])} vs {format_seconds(base['median_s'])} (+{change:.0%})"
+            )
+    return regressions
+
+def main():
+    """Run the benchmark suite."""
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for PlagiaTech hot paths")
+    parser.add_argument("--docs", type=int, default=100, help="Documents in the synthetic corpus")
+    parser.add_argument("--words", type=int, default=300, help="Words per document")
+    parser.add_argument("--seed", type=int, default=42, help="Corpus random seed")
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Target seconds per timed round")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed rounds per benchmark")
+    parser.add_argument("--list", action="store_true", help="List benchmarks and exit")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown vs. baseline (fraction)")
+
+    args = parser.parse_args()
+
+    names = [name for name in sorted(BENCHMARKS) if args.filter in name]
+    if args.list:
+        print("\n".join(names))
+        return
+
+    corpus = make_corpus(args.docs, args.words, args.seed)
+    print(f"Corpus: {args.docs} docs x {args.words} words ({corpus_bytes(corpus) / 1e6:.2f} MB)\n")
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "docs": args.docs,
+            "words": args.words,
+            "seed": args.seed,
+        },
+        "results": run_benchmarks(names, corpus, args.min_time, args.repeat),
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report["results"], baseline, args.threshold)
+        if regressions:
+            print("\n=== Regressions vs. baseline ===")
+            for regression in regressions:
+                print(f"- {regression}")
+            sys.exit(1)
+        print("\nNo regressions vs. baseline")
+
+if __name__ == "__main__":
+    main()
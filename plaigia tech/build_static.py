@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Build the static frontend for production serving.
+
+Copies `static/` to `dist/`, renaming assets (JS, CSS, images, ...) to
+content-hashed filenames and rewriting references to them in the HTML pages,
+writes precompressed `.gz` (and `.br`, if brotli is installed) variants, and
+records every file's ETag, size and variants in `dist/manifest.json`.
+
+Hashed assets can be cached forever (`Cache-Control: immutable`); HTML pages
+keep their names and are revalidated with their ETag, so a repeat page load
+costs a few 304 responses.
+
+Example:
+    ./build_static.py --source static --output dist
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+from typing import Dict, Any
+
+try:
+    import brotli
+except ImportError:  # optional: only .gz variants are written without it
+    brotli = None
+
+# Files that keep their names (entry points) and are revalidated on every load
+ENTRY_SUFFIXES = (".html",)
+
+COMPRESSIBLE_SUFFIXES = (".html", ".js", ".mjs", ".css", ".json", ".svg", ".txt", ".map", ".xml")
+
+# Variants smaller than this are not worth the extra file and lookup
+MIN_COMPRESS_SIZE = 256
+
+def content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def hashed_name(name: str, digest: str) -> str:
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{digest[:12]}{ext}"
+
+def rewrite_references(html: str, renames: Dict[str, str]) -> str:
+    """Point src/href attributes at the hashed asset names (kept relative)."""
+    def replace(match):
+        attribute, quote, prefix, name = match.groups()
+        if name not in renames:
+            return match.group(0)
+        return f"{attribute}={quote}{renames[name]}{quote}"
+    return re.sub(r"""\b(src|href)=(["'])(\./|/|/static/)?([^"'?#]+)\2""", replace, html)
+
+def write_variants(output: str, served: str, data: bytes) -> Dict[str, Dict[str, Any]]:
+    """Write precompressed variants of `output`/`served`; returns those that are smaller."""
+    variants = {}
+    if not served.endswith(COMPRESSIBLE_SUFFIXES) or len(data) < MIN_COMPRESS_SIZE:
+        return variants
+    candidates = [("gzip", ".gz", lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        candidates.insert(0, ("br", ".br", lambda d: brotli.compress(d, quality=11)))
+    for encoding, suffix, compress in candidates:
+        compressed = compress(data)
+        if len(compressed) < len(data):
+            with open(os.path.join(output, served + suffix), "wb") as f:
+                f.write(compressed)
+            # Relative to the output root, like the manifest's file names
+            variants[encoding] = {"path": served + suffix, "size": len(compressed)}
+    return variants
+
+def build(source: str, output: str) -> Dict[str, Any]:
+    """Build `source` into `output` and return the manifest."""
+    if os.path.isdir(output):
+        shutil.rmtree(output)
+    os.makedirs(output)
+
+    names = sorted(
+        os.path.relpath(os.path.join(root, filename), source).replace(os.sep, "/")
+        for root, _, filenames in os.walk(source)
+        for filename in filenames
+    )
+    contents = {}
+    for name in names:
+        with open(os.path.join(source, name), "rb") as f:
+            contents[name] = f.read()
+
+    # Assets first, so pages can be rewritten to their hashed names
+    renames = {
+        name: hashed_name(name, content_hash(data))
+        for name, data in contents.items()
+        if not name.endswith(ENTRY_SUFFIXES)
+    }
+    for name in names:
+        if name.endswith(ENTRY_SUFFIXES):
+            contents[name] = rewrite_references(contents[name].decode("utf-8"), renames).encode("utf-8")
+
+    files = {}
+    for name in names:
+        data = contents[name]
+        served = renames.get(name, name)
+        path = os.path.join(output, served)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        files[served] = {
+            "source": name,
+            "etag": content_hash(data),
+            "size": len(data),
+            "immutable": name in renames,
+            "encodings": write_variants(output, served, data),
+        }
+
+    manifest = {"assets": renames, "files": files}
+    with open(os.path.join(output, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def main():
+    """Run the static build."""
+    parser = argparse.ArgumentParser(description="Build hashed, precompressed static assets")
+    parser.add_argument("--source", default="static", help="Source directory")
+    parser.add_argument("--output", default="dist", help="Output directory (replaced)")
+
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    manifest = build(args.source, args.output)
+    for served, entry in sorted(manifest["files"].items()):
+        variants = ", ".join(f"{encoding} {variant['size']}" for encoding, variant in entry["encodings"].items())
+        print(f"{served:<40} {entry['size']:>8} bytes{'  (' + variants + ')' if variants else ''}")
+    print(f"\nBuilt {len(manifest['files'])} files into {args.output}/")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Client and throughput check for the bulk plagiarism endpoint.
+
+Sends a batch of documents to POST /api/check-plagiarism/bulk as
+length-prefixed MessagePack (or JSON) frames and reads the result frames as
+they stream back, reporting documents/sec. With --single the same documents
+are instead checked one request at a time against POST /api/check-plagiarism,
+for comparison.
+
+Documents come from a JSONL file (one `{"id": ..., "text": ...}` per line) or
+are generated; --duplicates makes a fraction of generated documents repeats.
+
+Example:
+    ./bulk_client.py --in-process --provider-latency 0.05 --docs 2000
+    ./bulk_client.py --in-process --provider-latency 0.05 --docs 100 --single
+    ./bulk_client.py --url http://localhost:8000/api --input docs.jsonl --output results.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from corpus import make_corpus
+from config import settings
+from frames import CODECS, FRAMES_JSON, FRAMES_MSGPACK, FrameDecoder, encode_frame
+from load_test import DEFAULT_API_URL, create_users
+
+def load_documents(args) -> List[Dict[str, Any]]:
+    if args.input:
+        with open(args.input) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    corpus = make_corpus(args.docs, args.words, args.seed)
+    rng = random.Random(args.seed)
+    for i in range(1, len(corpus)):
+        if rng.random() < args.duplicates:
+            corpus[i] = corpus[rng.randrange(i)]
+    return [{"id": f"doc-{i}", "text": text} for i, text in enumerate(corpus)]
+
+async def run_bulk(client: httpx.AsyncClient, headers: Dict[str, str], documents: List[Dict[str, Any]],
+                   media_type: str, output) -> Dict[str, Any]:
+    body = b"".join(encode_frame(document, media_type) for document in documents)
+    decoder = FrameDecoder(media_type, max_frame_size=len(body) + 1024 * 1024)
+    results = 0
+    first_result = None
+    summary: Dict[str, Any] = {}
+    start = time.perf_counter()
+    async with client.stream(
+        "POST", "/check-plagiarism/bulk", content=body, headers={**headers, "Content-Type": media_type}
+    ) as response:
+        if response.status_code != 200:
+            await response.aread()
+            raise SystemExit(f"Bulk request failed: HTTP {response.status_code} {response.text}")
+        async for chunk in response.aiter_bytes():
+            for frame in decoder.feed(chunk):
+                if frame.get("done"):
+                    summary = frame
+                    continue
+                results += 1
+                if first_result is None:
+                    first_result = time.perf_counter() - start
+                if output:
+                    output.write(json.dumps(frame) + "\n")
+    decoder.finish()
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": f"bulk ({media_type.rsplit('+', 1)[1]})",
+        "documents": len(documents),
+        "results": results,
+        "request_bytes": len(body),
+        "first_result_s": first_result,
+        "elapsed_s": elapsed,
+        "docs_per_s": len(documents) / elapsed,
+        "server": summary,
+    }
+
+async def run_single(client: httpx.AsyncClient, headers: Dict[str, str], documents: List[Dict[str, Any]],
+                     output) -> Dict[str, Any]:
+    errors = 0
+    start = time.perf_counter()
+    for index, document in enumerate(documents):
+        response = await client.post("/check-plagiarism", json={"text": document["text"]}, headers=headers)
+        if response.status_code != 200:
+            errors += 1
+        if output:
+            output.write(json.dumps({"index": index, "id": document.get("id"), **response.json()}) + "\n")
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": "single-document loop",
+        "documents": len(documents),
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "docs_per_s": len(documents) / elapsed,
+    }
+
+async def run(args) -> Dict[str, Any]:
+    documents = load_documents(args)
+    if args.in_process:
+        import main
+        transport = httpx.ASGITransport(app=main.app)
+        base_url = "http://testserver/api"
+        lifespan = main.app.router.lifespan_context(main.app)
+    else:
+        transport = None
+        base_url = args.url
+        lifespan = None
+
+    output = open(args.output, "w") if args.output else None
+    async with httpx.AsyncClient(base_url=base_url, transport=transport, timeout=args.timeout) as client:
+        if lifespan is not None:
+            await lifespan.__aenter__()
+        try:
+            if args.token:
+                token = args.token
+            else:
+                token = (await create_users(client, 1, premium=True))[0]["token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            if args.single:
+                return await run_single(client, headers, documents, output)
+            media_type = FRAMES_JSON if args.format == "json" else FRAMES_MSGPACK
+            return await run_bulk(client, headers, documents, media_type, output)
+        finally:
+            if lifespan is not None:
+                await lifespan.__aexit__(None, None, None)
+            if output:
+                output.close()
+
+def main():
+    """Run the bulk client."""
+    parser = argparse.ArgumentParser(description="Send a bulk plagiarism check and measure throughput")
+    parser.add_argument("--url", default=DEFAULT_API_URL, help="API base URL")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Drive the app in-process through the ASGI transport (no server needed)")
+    parser.add_argument("--token", help="Access token (default: register a premium user)")
+    parser.add_argument("--input", help="JSONL file of {\"id\", \"text\"} documents")
+    parser.add_argument("--docs", type=int, default=1000, help="Number of generated documents")
+    parser.add_argument("--words", type=int, default=300, help="Words per generated document")
+    parser.add_argument("--duplicates", type=float, default=0.1, help="Fraction of generated documents that repeat")
+    parser.add_argument("--seed", type=int, default=42, help="Corpus random seed")
+    parser.add_argument("--format", choices=["msgpack", "json"],
+                        default="msgpack" if FRAMES_MSGPACK in CODECS else "json", help="Frame encoding")
+    parser.add_argument("--single", action="store_true", help="Loop over the single-document endpoint instead")
+    parser.add_argument("--timeout", type=float, default=3600, help="Request timeout in seconds")
+    parser.add_argument("--provider-latency", type=float, default=None,
+                        help="Simulated provider latency for --in-process runs (seconds)")
+    parser.add_argument("--output", help="Write result frames as JSONL to this file")
+
+    args = parser.parse_args()
+
+    if args.in_process and args.provider_latency is not None:
+        # Settings are already loaded (frames imports them), so override in place
+        settings.MOCK_PROVIDER_LATENCY = args.provider_latency
+
+    result = asyncio.run(run(args))
+    print(f"Mode:        {result['mode']}")
+    print(f"Documents:   {result['documents']}")
+    if "server" in result:
+        server = result["server"]
+        print(f"Unique:      {server.get('unique')}  (invalid {server.get('invalid')}, failed {server.get('failed')})")
+        print(f"Request:     {result['request_bytes'] / 1024:.1f} KiB")
+        print(f"First result {result['first_result_s'] * 1000:.0f} ms")
+    else:
+        print(f"Errors:      {result['errors']}")
+    print(f"Elapsed:     {result['elapsed_s']:.2f} s")
+    print(f"Throughput:  {result['docs_per_s']:.1f} docs/s")
+
+if __name__ == "__main__":
+    main()
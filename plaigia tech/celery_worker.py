@@ -1,9 +1,18 @@
 from celery import Celery
-import os
+from celery.signals import before_task_publish, task_prerun, task_postrun, worker_init, worker_process_shutdown
 import httpx
 import time
+import uuid
 import logging
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+from metrics import CELERY_TASK_DURATION, mark_process_dead, record_cache
+from profiling import profiler
+from tracing import tracer
+from config import settings, validate_settings
+import webhooks
+import detection
+import normalize
+import providers
 
 # Configure logging
 logging.basicConfig(
@@ -12,8 +21,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Get Redis URL from environment variable or use default
-redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Same Redis as the API (see redis_pool.py)
+redis_url = settings.REDIS_URL
 
 # Create Celery app
 celery_app = Celery(
@@ -32,18 +41,190 @@ celery_app.conf.update(
     task_track_started=True,
     task_time_limit=300,  # 5 minutes
     worker_concurrency=4,
+    # Run tasks inline in the caller (local testing without a worker)
+    task_always_eager=settings.CELERY_TASK_ALWAYS_EAGER,
+    # Broker and result backend connections are pooled, bounded and health
+    # checked with the same settings as the API's pool
+    broker_pool_limit=settings.REDIS_MAX_CONNECTIONS,
+    broker_connection_retry_on_startup=True,
+    broker_transport_options={
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+        "retry_on_timeout": True,
+    },
+    redis_max_connections=settings.REDIS_MAX_CONNECTIONS,
+    redis_socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    redis_socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    redis_backend_health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+    redis_retry_on_timeout=True,
 )
 
 # Cache for storing results (in production, use Redis)
 result_cache = {}
 
+# Task start times for runtime metrics, keyed by task id
+_task_started: Dict[str, float] = {}
+
+# Active stack samplers for profiled tasks, keyed by task id
+_task_samplers: Dict[str, Any] = {}
+
+# Active trace spans (and context tokens) for running tasks, keyed by task id
+_task_spans: Dict[str, Any] = {}
+
+# Webhook event type prefix for tasks that accept a callback_url
+WEBHOOK_EVENTS = {
+    "check_plagiarism_task": "plagiarism",
+    "rephrase_text_task": "rephrase",
+}
+
+# State recorded for these tasks when they are queued. Celery reports any id
+# it has no record of as PENDING, so without it a made-up or expired task id
+# looks exactly like one still waiting in the broker.
+QUEUED = "QUEUED"
+TRACKED_TASKS = set(WEBHOOK_EVENTS)
+
+@worker_init.connect
+def check_settings(**kwargs):
+    """Validate settings when a worker starts (the API does this in its startup event)."""
+    validate_settings()
+
+@worker_process_shutdown.connect
+def drop_process_metrics(pid=None, **kwargs):
+    """Drop an exiting pool process's live gauges from the shared metrics directory."""
+    mark_process_dead(pid)
+
+@before_task_publish.connect
+def inject_trace_context(headers=None, **kwargs):
+    """Carry the publisher's trace context and publish time in the task message."""
+    if headers is not None:
+        tracer.inject(headers)
+        headers["published_at"] = time.time()
+
+@before_task_publish.connect
+def record_queued_state(sender=None, headers=None, **kwargs):
+    """Record tasks that can be polled as QUEUED before the message is sent (the worker overwrites it)."""
+    if sender in TRACKED_TASKS and headers and headers.get("id"):
+        celery_app.backend.store_result(headers["id"], None, QUEUED)
+
+def task_header(request, name: str):
+    """Read a custom message header (request attribute on workers, headers dict when eager)."""
+    value = getattr(request, name, None)
+    if value is None:
+        value = (getattr(request, "headers", None) or {}).get(name)
+    return value
+
+def start_task_span(task_id: str, task):
+    """Continue the publisher's trace, recording time spent waiting in the broker."""
+    now = time.time()
+    parent = task_header(task.request, "traceparent")
+    published_at = task_header(task.request, "published_at")
+    if parent and published_at:
+        queue_span = tracer.start_span("celery.queue_wait", parent=parent, start=float(published_at))
+        queue_span.set("celery.task", task.name)
+        tracer.finish(queue_span, end=now)
+    span = tracer.start_span(f"celery.task {task.name}", parent=parent, start=now)
+    span.set("celery.task_id", task_id)
+    _task_spans[task_id] = (span, tracer.activate(span))
+
+def finish_task_span(task_id: str, state: str):
+    entry = _task_spans.pop(task_id, None)
+    if entry is not None:
+        span, token = entry
+        span.set("celery.state", state)
+        tracer.deactivate(token)
+        tracer.finish(span)
+
+@task_prerun.connect
+def start_task_timer(task_id=None, task=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+    if task is not None:
+        start_task_span(task_id, task)
+        if profiler.should_profile("task", task.name):
+            _task_samplers[task_id] = profiler.start()
+
+@task_postrun.connect
+def record_task_duration(task_id=None, task=None, state=None, **kwargs):
+    finish_task_span(task_id, state or "UNKNOWN")
+    start = _task_started.pop(task_id, None)
+    if start is not None and task is not None:
+        duration = time.perf_counter() - start
+        CELERY_TASK_DURATION.labels(task.name, state or "UNKNOWN").observe(duration)
+        sampler = _task_samplers.pop(task_id, None)
+        if sampler is not None:
+            profiler.write("task", task.name, sampler.stop(), duration)
+
+@task_postrun.connect
+def queue_completion_webhook(task_id=None, task=None, kwargs=None, retval=None, state=None, **extra):
+    """Queue a webhook event when a task submitted with a callback_url finishes."""
+    callback_url = (kwargs or {}).get("callback_url")
+    if not callback_url or task is None or state not in ("SUCCESS", "FAILURE"):
+        return
+    prefix = WEBHOOK_EVENTS.get(task.name, task.name)
+    if state == "SUCCESS":
+        event = webhooks.build_event(f"{prefix}.completed", task_id, "completed", result=retval)
+    else:
+        event = webhooks.build_event(f"{prefix}.failed", task_id, "failed", error=str(retval))
+    schedule_webhook(callback_url, event)
+
+def schedule_webhook(url: str, event: Dict[str, Any]):
+    """Add an event to the endpoint's pending batch, scheduling a delivery if none is due."""
+    try:
+        if webhooks.get_store().push(url, event):
+            deliver_webhooks.apply_async(args=[url], countdown=settings.WEBHOOK_BATCH_WINDOW)
+    except Exception as e:
+        logger.error(f"Failed to queue webhook for task {event['task_id']}: {e}")
+
+@celery_app.task(bind=True, name="deliver_webhooks", max_retries=None)
+def deliver_webhooks(self, url: str, events: Optional[List[Dict[str, Any]]] = None,
+                     delivery_id: Optional[str] = None, attempt: int = 1) -> Dict[str, Any]:
+    """
+    POST pending completion events to a callback URL as one signed batch.
+
+    A first attempt takes up to WEBHOOK_BATCH_SIZE pending events for the
+    endpoint; retries resend the same batch under the same delivery id with
+    exponential backoff, up to WEBHOOK_MAX_ATTEMPTS attempts.
+    """
+    store = webhooks.get_store()
+    if events is None:
+        events, remaining = store.pop_batch(url, settings.WEBHOOK_BATCH_SIZE)
+        if remaining:
+            deliver_webhooks.apply_async(args=[url])
+        if not events:
+            return {"delivered": 0}
+        delivery_id = uuid.uuid4().hex
+
+    entry = webhooks.deliver(url, events, delivery_id, attempt, headers=tracer.inject({}))
+    if entry["error"] is None:
+        entry["outcome"] = "delivered"
+    elif webhooks.is_retryable(entry) and attempt < settings.WEBHOOK_MAX_ATTEMPTS:
+        entry["outcome"] = "retrying"
+    else:
+        entry["outcome"] = "failed"
+    store.log(entry)
+
+    if entry["outcome"] == "retrying":
+        countdown = webhooks.retry_delay(attempt)
+        logger.warning(f"Webhook delivery {delivery_id} to {url} failed ({entry['error']}); retrying in {countdown:.1f}s")
+        raise self.retry(
+            args=[url],
+            kwargs={"events": events, "delivery_id": delivery_id, "attempt": attempt + 1},
+            countdown=countdown,
+        )
+    if entry["outcome"] == "failed":
+        logger.error(f"Webhook delivery {delivery_id} to {url} failed permanently: {entry['error']}")
+    return {"delivery_id": delivery_id, "outcome": entry["outcome"], "events": len(events)}
+
 @celery_app.task(bind=True, name="check_plagiarism_task")
-def check_plagiarism_task(self, text: str) -> Dict[str, Any]:
+def check_plagiarism_task(self, text: str, callback_url: Optional[str] = None,
+                          cost_limit: Optional[float] = None) -> Dict[str, Any]:
     """
     Check text for plagiarism using external API.
     
     Args:
         text: The text to check for plagiarism
+        callback_url: Optional URL that receives a webhook when the task finishes
+        cost_limit: Most a provider backend may cost for this check (see providers.py)
         
     Returns:
         Dict containing percentage and sources
@@ -51,29 +232,21 @@ def check_plagiarism_task(self, text: str) -> Dict[str, Any]:
     task_id = self.request.id
     logger.info(f"Starting plagiarism check task {task_id}")
     
-    # Check cache first
-    cache_key = f"plagiarism:{hash(text)}"
-    if cache_key in result_cache:
+    # Check cache first (keyed by the normalized text, see normalize.py)
+    cache_key = f"plagiarism:{normalize.cache_key(text)}"
+    with tracer.span("cache.lookup", cache="plagiarism") as span:
+        hit = cache_key in result_cache
+        if span is not None:
+            span.set("cache.hit", hit)
+    record_cache("plagiarism", hit)
+    if hit:
         logger.info(f"Cache hit for task {task_id}")
         return result_cache[cache_key]
     
     try:
-        # In production, integrate with Copyleaks or PlagScan API
-        # api_key = os.getenv("COPYLEAKS_API_KEY")
-        # headers = {"Authorization": f"Bearer {api_key}"}
-        
-        # Simulate API call with delay
+        # The shared detection engine (see detection.py) calls the provider
         logger.info(f"Calling external plagiarism API for task {task_id}")
-        time.sleep(2)  # Simulate API delay
-        
-        # Simulated result
-        result = {
-            "percentage": 10.5,
-            "sources": [
-                "https://example.com/source1",
-                "https://example.com/source2"
-            ]
-        }
+        result = detection.check_text_sync(text, cost_limit)
         
         # Cache the result
         result_cache[cache_key] = result
@@ -86,12 +259,15 @@ def check_plagiarism_task(self, text: str) -> Dict[str, Any]:
         self.retry(exc=e, countdown=5, max_retries=3)
 
 @celery_app.task(bind=True, name="rephrase_text_task")
-def rephrase_text_task(self, text: str) -> str:
+def rephrase_text_task(self, text: str, callback_url: Optional[str] = None,
+                       cost_limit: Optional[float] = None) -> str:
     """
     Rephrase text using AI model.
     
     Args:
         text: The text to rephrase
+        callback_url: Optional URL that receives a webhook when the task finishes
+        cost_limit: Most a provider backend may cost for this rephrasing (see providers.py)
         
     Returns:
         Rephrased text
@@ -99,23 +275,20 @@ def rephrase_text_task(self, text: str) -> str:
     task_id = self.request.id
     logger.info(f"Starting text rephrasing task {task_id}")
     
-    # Check cache first
-    cache_key = f"rephrase:{hash(text)}"
-    if cache_key in result_cache:
+    # Check cache first (keyed by the exact text: rephrasings follow its wording)
+    cache_key = f"rephrase:{normalize.exact_key(text)}"
+    with tracer.span("cache.lookup", cache="rephrase") as span:
+        hit = cache_key in result_cache
+        if span is not None:
+            span.set("cache.hit", hit)
+    record_cache("rephrase", hit)
+    if hit:
         logger.info(f"Cache hit for task {task_id}")
         return result_cache[cache_key]
     
     try:
-        # In production, integrate with OpenAI or Hugging Face API
-        # api_key = os.getenv("OPENAI_API_KEY")
-        # headers = {"Authorization": f"Bearer {api_key}"}
-        
-        # Simulate API call with delay
         logger.info(f"Calling external rephrasing API for task {task_id}")
-        time.sleep(2)  # Simulate API delay
-        
-        # Simulated result
-        rephrased = "The swift brown fox leaps over the idle dog."
+        rephrased = providers.rephrasing.call_sync(text, cost_limit)
         
         # Cache the result
         result_cache[cache_key] = rephrased
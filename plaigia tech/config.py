@@ -16,8 +16,24 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = os.getenv("JWT_ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
     
+    # Admin Settings (admin endpoints are disabled while empty)
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+    
     # Redis Settings
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    # One pool per process shared by every subsystem; callers wait up to
+    # REDIS_POOL_TIMEOUT seconds for a free connection
+    REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+    REDIS_POOL_TIMEOUT: float = float(os.getenv("REDIS_POOL_TIMEOUT", "1.0"))
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "1.0"))
+    REDIS_HEALTH_CHECK_INTERVAL: float = float(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "15"))
+    REDIS_RETRY_BASE: float = float(os.getenv("REDIS_RETRY_BASE", "0.1"))
+    REDIS_RETRY_MAX: float = float(os.getenv("REDIS_RETRY_MAX", "10"))
+    # Send each request's Redis commands as one pipeline (disable to compare)
+    REDIS_PIPELINE: bool = os.getenv("REDIS_PIPELINE", "True").lower() == "true"
+    # Shared plagiarism result cache and Idempotency-Key replay window (seconds)
+    RESULT_CACHE_TTL: int = int(os.getenv("RESULT_CACHE_TTL", "86400"))
+    IDEMPOTENCY_TTL: int = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
     
     # Server Settings
     PORT: int = int(os.getenv("PORT", "8000"))
@@ -27,6 +43,9 @@ class Settings(BaseSettings):
     # Rate Limiting
     RATE_LIMIT_DEFAULT: str = os.getenv("RATE_LIMIT_DEFAULT", "100/hour")
     RATE_LIMIT_FREE_TIER: str = os.getenv("RATE_LIMIT_FREE_TIER", "10/day")
+    RATE_LIMIT_PREMIUM_TIER: str = os.getenv("RATE_LIMIT_PREMIUM_TIER", "unlimited")
+    RATE_LIMIT_PREMIUM: str = os.getenv("RATE_LIMIT_PREMIUM", "1000/hour")
+    RATE_LIMIT_SYNC_INTERVAL: float = float(os.getenv("RATE_LIMIT_SYNC_INTERVAL", "1.0"))
     
     # CORS Settings
     CORS_ORIGINS: List[str] = [
@@ -37,8 +56,97 @@ class Settings(BaseSettings):
         "http://127.0.0.1:3000",
     ]
     
+    # Admission Control
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "True").lower() == "true"
+    ADMISSION_MAX_IN_FLIGHT: int = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "200"))
+    ADMISSION_MAX_QUEUE_DEPTH: int = int(os.getenv("ADMISSION_MAX_QUEUE_DEPTH", "1000"))
+    ADMISSION_LOW_PRIORITY_SHARE: float = float(os.getenv("ADMISSION_LOW_PRIORITY_SHARE", "0.75"))
+    ADMISSION_MAX_WAIT: float = float(os.getenv("ADMISSION_MAX_WAIT", "0.5"))
+    ADMISSION_RETRY_AFTER: int = int(os.getenv("ADMISSION_RETRY_AFTER", "5"))
+    
+    # Profiling
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "data/profiles")
+    PROFILE_MAX_BYTES: int = int(os.getenv("PROFILE_MAX_BYTES", str(50 * 1024 * 1024)))
+    
+    # Tracing
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "True").lower() == "true"
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+    # Honour the sampled flag of incoming traceparent headers (only behind a trusted proxy)
+    TRACE_TRUST_INCOMING: bool = os.getenv("TRACE_TRUST_INCOMING", "False").lower() == "true"
+    TRACE_EXPORT_PATH: str = os.getenv("TRACE_EXPORT_PATH", "data/traces.jsonl")
+    TRACE_EXPORT_MAX_BYTES: int = int(os.getenv("TRACE_EXPORT_MAX_BYTES", str(100 * 1024 * 1024)))
+    
+    # Celery (eager mode runs tasks inline, for local testing without a worker)
+    CELERY_TASK_ALWAYS_EAGER: bool = os.getenv("CELERY_TASK_ALWAYS_EAGER", "False").lower() == "true"
+    
+    # Webhooks
+    WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET", "your_webhook_secret")
+    WEBHOOK_TIMEOUT: float = float(os.getenv("WEBHOOK_TIMEOUT", "10"))
+    WEBHOOK_MAX_ATTEMPTS: int = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+    WEBHOOK_RETRY_BASE: float = float(os.getenv("WEBHOOK_RETRY_BASE", "2"))
+    WEBHOOK_RETRY_MAX: float = float(os.getenv("WEBHOOK_RETRY_MAX", "600"))
+    WEBHOOK_BATCH_WINDOW: float = float(os.getenv("WEBHOOK_BATCH_WINDOW", "1.0"))
+    WEBHOOK_BATCH_SIZE: int = int(os.getenv("WEBHOOK_BATCH_SIZE", "50"))
+    WEBHOOK_LOG_SIZE: int = int(os.getenv("WEBHOOK_LOG_SIZE", "1000"))
+    
+    # Near-Duplicate Fast Path (SimHash of previously checked submissions)
+    SIMHASH_ENABLED: bool = os.getenv("SIMHASH_ENABLED", "True").lower() == "true"
+    SIMHASH_MAX_DISTANCE: int = int(os.getenv("SIMHASH_MAX_DISTANCE", "5"))
+    SIMHASH_MIN_WORDS: int = int(os.getenv("SIMHASH_MIN_WORDS", "50"))
+    SIMHASH_MAX_ENTRIES: int = int(os.getenv("SIMHASH_MAX_ENTRIES", "20000"))
+    
+    # Submission Index (earlier submissions searched for copying between students)
+    SUBMISSION_INDEX_ENABLED: bool = os.getenv("SUBMISSION_INDEX_ENABLED", "True").lower() == "true"
+    SUBMISSION_INDEX_PATH: str = os.getenv("SUBMISSION_INDEX_PATH", "data/submissions.db")
+    SUBMISSION_FLUSH_INTERVAL: float = float(os.getenv("SUBMISSION_FLUSH_INTERVAL", "30"))
+    SUBMISSION_DELTA_MAX: int = int(os.getenv("SUBMISSION_DELTA_MAX", "5000"))
+    SUBMISSION_MIN_OVERLAP: float = float(os.getenv("SUBMISSION_MIN_OVERLAP", "0.1"))
+    SUBMISSION_MAX_MATCHES: int = int(os.getenv("SUBMISSION_MAX_MATCHES", "5"))
+    
+    # Bulk Checks (length-prefixed frame batches)
+    BULK_MAX_DOCUMENTS: int = int(os.getenv("BULK_MAX_DOCUMENTS", "50000"))
+    BULK_MAX_BODY_BYTES: int = int(os.getenv("BULK_MAX_BODY_BYTES", str(64 * 1024 * 1024)))
+    BULK_CONCURRENCY: int = int(os.getenv("BULK_CONCURRENCY", "32"))
+    
+    # Source Store (local reference corpus used for match snippets)
+    SOURCE_STORE_DIR: str = os.getenv("SOURCE_STORE_DIR", "data/sources")
+    SOURCE_BLOCK_CHARS: int = int(os.getenv("SOURCE_BLOCK_CHARS", "16384"))
+    SOURCE_BLOCK_CACHE: int = int(os.getenv("SOURCE_BLOCK_CACHE", "256"))
+    SNIPPET_MAX_CONTEXT: int = int(os.getenv("SNIPPET_MAX_CONTEXT", "2000"))
+    
+    # History Settings
+    HISTORY_DB_PATH: str = os.getenv("HISTORY_DB_PATH", "data/history.db")
+    
+    # Simulated provider latency in seconds (used until real providers are configured)
+    MOCK_PROVIDER_LATENCY: float = float(os.getenv("MOCK_PROVIDER_LATENCY", "1.0"))
+    
+    # Provider Backends (JSON list, or a JSON file path; see providers.py). Empty
+    # uses the API keys above, or simulated providers where a key is missing
+    PROVIDER_BACKENDS: str = os.getenv("PROVIDER_BACKENDS", "")
+    PROVIDER_MAX_COST_FREE: float = float(os.getenv("PROVIDER_MAX_COST_FREE", "1.0"))
+    PROVIDER_MAX_COST_PREMIUM: float = float(os.getenv("PROVIDER_MAX_COST_PREMIUM", "10.0"))
+    PROVIDER_EWMA_ALPHA: float = float(os.getenv("PROVIDER_EWMA_ALPHA", "0.2"))
+    PROVIDER_PROBE_INTERVAL: float = float(os.getenv("PROVIDER_PROBE_INTERVAL", "10"))
+    PROVIDER_ERROR_THRESHOLD: float = float(os.getenv("PROVIDER_ERROR_THRESHOLD", "0.5"))
+    PROVIDER_COOLDOWN: float = float(os.getenv("PROVIDER_COOLDOWN", "30"))
+    PROVIDER_MAX_ATTEMPTS: int = int(os.getenv("PROVIDER_MAX_ATTEMPTS", "2"))
+    PROVIDER_QUEUE_TIMEOUT: float = float(os.getenv("PROVIDER_QUEUE_TIMEOUT", "10"))
+    
+    # Static Files (STATIC_BUILD_DIR is served instead of STATIC_DIR once built)
+    STATIC_DIR: str = os.getenv("STATIC_DIR", "static")
+    STATIC_BUILD_DIR: str = os.getenv("STATIC_BUILD_DIR", "dist")
+    
+    # Response Encoding
+    # Hot endpoints return trusted data without response_model re-validation;
+    # enable to validate them anyway (e.g. while developing)
+    VALIDATE_RESPONSES: bool = os.getenv("VALIDATE_RESPONSES", "False").lower() == "true"
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1000"))
+    
     # Text Processing Settings
     MAX_TEXT_LENGTH: int = 10000
+    MAX_BODY_BYTES: int = int(os.getenv("MAX_BODY_BYTES", "16384"))
+    # Recent rephrasings kept per process, keyed by the exact text (0 disables)
+    REPHRASE_CACHE_ENTRIES: int = int(os.getenv("REPHRASE_CACHE_ENTRIES", "1000"))
     
     class Config:
         env_file = ".env"
@@ -63,11 +171,10 @@ def validate_settings():
         # JWT secret key should be strong in production
         if settings.JWT_SECRET_KEY == "your_jwt_secret_key":
             print("WARNING: Using default JWT_SECRET_KEY in production is insecure!")
+        if settings.WEBHOOK_SECRET == "your_webhook_secret":
+            print("WARNING: Using default WEBHOOK_SECRET in production is insecure!")
     
     if missing:
         print(f"WARNING: Missing required environment variables: {', '.join(missing)}")
         if settings.ENVIRONMENT == "production":
             raise ValueError(f"Missing required environment variables for production: {', '.join(missing)}")
-
-# Validate settings on import
-validate_settings()
@@ -0,0 +1,206 @@
+from typing import Dict, List, Optional, Tuple
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional: br is not offered without it
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd is not offered without it
+    zstandard = None
+
+# Server preference when the client accepts several encodings equally
+PREFERENCE = ("zstd", "br", "gzip")
+
+DEFAULT_LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+
+COMPRESSIBLE_TYPES = (b"application/json", b"text/", b"application/javascript", b"image/svg+xml", b"application/x-msgpack")
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+class _BrotliEncoder:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+class _ZstdEncoder:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+ENCODERS = {"gzip": _GzipEncoder}
+if brotli is not None:
+    ENCODERS["br"] = _BrotliEncoder
+if zstandard is not None:
+    ENCODERS["zstd"] = _ZstdEncoder
+
+def available_encodings() -> List[str]:
+    return [name for name in PREFERENCE if name in ENCODERS]
+
+def encoder_for(name: str, level: int):
+    return ENCODERS[name](level)
+
+def negotiate(accept_encoding: str, available: List[str]) -> Optional[str]:
+    """
+    Pick a content coding from an Accept-Encoding header.
+
+    The highest q-value wins; ties go to the first entry of `available`
+    (server preference). Returns None when nothing acceptable is available.
+    """
+    qualities: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        qualities[name.strip()] = q
+    wildcard = qualities.get("*")
+    best, best_q = None, 0.0
+    for name in available:
+        q = qualities.get(name, wildcard if wildcard is not None else 0.0)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+class CompressionMiddleware:
+    """
+    ASGI middleware that compresses responses with zstd, brotli or gzip.
+
+    The coding is negotiated from Accept-Encoding, preferring zstd and brotli
+    when their (optional) packages are installed. Levels can be tuned per
+    route prefix: fast levels for small latency-sensitive responses, higher
+    ones for large cacheable pages. Complete bodies smaller than
+    `minimum_size` are sent as-is; streamed bodies are compressed and flushed
+    chunk by chunk. A strong ETag is made weak on compressed responses, as
+    the bytes sent are no longer those it was computed for.
+    """
+
+    def __init__(self, app, minimum_size: int = 1000, levels: Optional[Dict[str, int]] = None,
+                 route_levels: Optional[Dict[str, Dict[str, int]]] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {**DEFAULT_LEVELS, **(levels or {})}
+        # Longest prefix first, so the most specific route wins
+        self.route_levels: List[Tuple[str, Dict[str, int]]] = sorted(
+            (route_levels or {}).items(), key=lambda item: len(item[0]), reverse=True
+        )
+        self.available = available_encodings()
+
+    def level_for(self, path: str, encoding: str) -> int:
+        for prefix, levels in self.route_levels:
+            if path.startswith(prefix) and encoding in levels:
+                return levels[encoding]
+        return self.levels[encoding]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate(accept_encoding, self.available) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder = None
+        passthrough = False
+
+        async def compressing_send(message):
+            nonlocal start_message, encoder, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if encoder is None:
+                headers = start_message.get("headers", [])
+                if not self._should_compress(start_message["status"], headers) or (
+                    not more_body and len(body) < self.minimum_size
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                encoder = encoder_for(encoding, self.level_for(scope["path"], encoding))
+                vary = [v for k, v in headers if k == b"vary"]
+                headers = [
+                    (k, b"W/" + v if k == b"etag" and not v.startswith(b"W/") else v)
+                    for k, v in headers
+                    if k not in (b"content-length", b"vary")
+                ]
+                headers += [
+                    (b"content-encoding", encoding.encode()),
+                    (b"vary", b", ".join(vary + [b"Accept-Encoding"])),
+                ]
+                if more_body:
+                    await send({**start_message, "headers": headers})
+                else:
+                    compressed = encoder.compress(body) + encoder.finish()
+                    headers.append((b"content-length", str(len(compressed)).encode()))
+                    await send({**start_message, "headers": headers})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+
+            if more_body:
+                chunk = encoder.compress(body) + encoder.flush()
+            else:
+                chunk = encoder.compress(body) + encoder.finish()
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
+
+    @staticmethod
+    def _should_compress(status: int, headers) -> bool:
+        if status < 200 or status in (204, 206, 304):
+            return False
+        content_type = b""
+        for name, value in headers:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value
+        return content_type.startswith(COMPRESSIBLE_TYPES)
@@ -0,0 +1,34 @@
+"""
+Synthetic text for benchmarks, load tools and demo data.
+
+Documents are sentences of words drawn from a small vocabulary, seeded so
+the same arguments always produce the same corpus.
+"""
+
+import random
+from typing import List
+
+VOCABULARY = (
+    "the of and to in is that for it as was with be by on not he this are or his from at which but have an "
+    "they you were her she there been one all we their has would when if so no will more can out other "
+    "analysis research student essay source original text document similar paragraph citation reference "
+    "quick brown fox lazy dog academic integrity plagiarism detection compare submission"
+).split()
+
+def make_corpus(docs: int, words: int, seed: int = 42) -> List[str]:
+    """Generate `docs` pseudo-random documents of `words` words each."""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(docs):
+        sentences = []
+        remaining = words
+        while remaining > 0:
+            length = min(remaining, rng.randint(6, 20))
+            sentence = " ".join(rng.choice(VOCABULARY) for _ in range(length))
+            sentences.append(sentence.capitalize() + ".")
+            remaining -= length
+        corpus.append(" ".join(sentences))
+    return corpus
+
+def corpus_bytes(corpus: List[str]) -> int:
+    return sum(len(doc.encode("utf-8")) for doc in corpus)
@@ -0,0 +1,78 @@
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Optional, Tuple, Union
+import asyncio
+import logging
+import providers
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+async def check_text(text: str, cost_limit: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Check one text for plagiarism on the best available provider backend
+    (see providers.py) that costs at most `cost_limit` per request.
+
+    Shared by the single-document, bulk and background (Celery) checks.
+    """
+    return await providers.plagiarism.call(text, cost_limit)
+
+def check_text_sync(text: str, cost_limit: Optional[float] = None) -> Dict[str, Any]:
+    """Blocking variant of check_text for Celery workers."""
+    return providers.plagiarism.call_sync(text, cost_limit)
+
+async def _numbered(texts: Union[Iterable[str], AsyncIterable[str]]) -> AsyncIterator[Tuple[int, str]]:
+    if hasattr(texts, "__aiter__"):
+        index = 0
+        async for text in texts:
+            yield index, text
+            index += 1
+    else:
+        for index, text in enumerate(texts):
+            yield index, text
+
+async def check_many(
+    texts: Union[Iterable[str], AsyncIterable[str]], concurrency: int, cost_limit: Optional[float] = None
+) -> AsyncIterator[Tuple[int, Optional[Dict[str, Any]], Optional[Exception]]]:
+    """
+    Check many texts, yielding (index, result, error) as each one finishes.
+
+    `texts` may be an async iterable (e.g. documents decoded as a request body
+    streams in), so checks start before the last text has arrived; indexes
+    number the texts in the order they come. A fixed pool of `concurrency`
+    workers pulls texts in order, so memory stays flat however long the input
+    is. Closing the iterator early (e.g. the client went away) cancels the
+    checks still running.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    pending = _numbered(texts)
+    pulling = asyncio.Lock()
+
+    async def worker():
+        try:
+            while True:
+                # An async generator can't be advanced by two workers at once
+                async with pulling:
+                    index, text = await pending.__anext__()
+                try:
+                    queue.put_nowait((index, await check_text(text, cost_limit), None))
+                except Exception as e:
+                    logger.warning(f"Check {index} failed: {e}")
+                    queue.put_nowait((index, None, e))
+        except StopAsyncIteration:
+            pass
+        finally:
+            queue.put_nowait(None)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+    try:
+        running = len(workers)
+        while running:
+            item = await queue.get()
+            if item is None:
+                running -= 1
+            else:
+                yield item
+        # Re-raises an error from the texts iterable, if any
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
@@ -0,0 +1,80 @@
+from typing import Any, Callable, Dict, List, Tuple
+import json
+import struct
+from responses import dumps
+
+try:
+    import msgpack
+except ImportError:  # optional: only JSON frames are accepted without it
+    msgpack = None
+
+# Each frame is a 4-byte big-endian payload length followed by the payload,
+# one MessagePack or JSON document per frame
+FRAMES_MSGPACK = "application/vnd.plagiatech.frames+msgpack"
+FRAMES_JSON = "application/vnd.plagiatech.frames+json"
+
+HEADER = struct.Struct(">I")
+
+class FrameError(ValueError):
+    """Raised for a malformed or oversized frame stream."""
+
+def _codecs() -> Dict[str, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]]:
+    codecs = {FRAMES_JSON: (dumps, json.loads)}
+    if msgpack is not None:
+        codecs[FRAMES_MSGPACK] = (
+            lambda obj: msgpack.packb(obj, use_bin_type=True),
+            lambda data: msgpack.unpackb(data, raw=False),
+        )
+    return codecs
+
+CODECS = _codecs()
+
+def media_type_for(content_type: str) -> str:
+    """Frame media type named by a Content-Type header, or "" if unsupported."""
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type if media_type in CODECS else ""
+
+def encode_frame(obj: Any, media_type: str) -> bytes:
+    payload = CODECS[media_type][0](obj)
+    return HEADER.pack(len(payload)) + payload
+
+class FrameDecoder:
+    """
+    Incremental decoder for a length-prefixed frame stream.
+
+    Feed it body chunks as they arrive; complete frames are decoded and
+    returned, partial ones are kept until the rest arrives.
+    """
+
+    def __init__(self, media_type: str, max_frame_size: int):
+        self.loads = CODECS[media_type][1]
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[Any]:
+        self._buffer += data
+        objects = []
+        offset = 0
+        view = memoryview(self._buffer)
+        try:
+            while len(view) - offset >= HEADER.size:
+                (size,) = HEADER.unpack_from(view, offset)
+                if size > self.max_frame_size:
+                    raise FrameError(f"Frame of {size} bytes exceeds the {self.max_frame_size} byte limit")
+                end = offset + HEADER.size + size
+                if end > len(view):
+                    break
+                try:
+                    objects.append(self.loads(bytes(view[offset + HEADER.size:end])))
+                except Exception as e:
+                    raise FrameError(f"Undecodable frame: {e}")
+                offset = end
+        finally:
+            view.release()
+        del self._buffer[:offset]
+        return objects
+
+    def finish(self):
+        """Check that the stream did not end in the middle of a frame."""
+        if self._buffer:
+            raise FrameError(f"Stream ended inside a frame ({len(self._buffer)} trailing bytes)")
@@ -0,0 +1,66 @@
+"""
+Gunicorn configuration for running the API with multiple worker processes.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+The app is imported once in the master (preload_app) so configuration,
+compiled models and other read-only module state are shared with the workers
+copy-on-write. Nothing holding sockets, file handles or threads may be
+created at import: Redis clients, and the SQLite connections and background
+tasks of the history store and the submission index, are opened per worker
+in the startup event; exporters and subsystems start on first use in the
+worker.
+
+Rolling restarts:
+- SIGHUP: start fresh workers, then gracefully stop the old ones. With
+  preload_app the code is not re-imported, so use this for config changes.
+- SIGUSR2 then SIGWINCH/SIGQUIT to the old master: re-exec a new master with
+  new code, then retire the old one once the new workers are serving.
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("GUNICORN_PRELOAD", "True").lower() == "true"
+
+# Recycle workers after a number of requests (jittered so they don't all
+# restart at once) to bound the effect of slow leaks and fragmentation
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+# Collections in the master would touch reference counts and GC headers of
+# every preloaded object, so keep the collector off until the app is loaded
+gc.disable()
+
+def on_starting(server):
+    # No worker is running yet, so files left in the multiprocess metrics
+    # directory belong to a previous run
+    from metrics import clear_multiprocess_dir
+    clear_multiprocess_dir()
+
+def when_ready(server):
+    # Move everything allocated so far into the permanent generation so the
+    # workers' collectors never write to (and un-share) those pages
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Preloaded app frozen: {gc.get_freeze_count()} objects shared with workers")
+
+def post_fork(server, worker):
+    gc.enable()
+
+def child_exit(server, worker):
+    # Drop the exited worker's live gauges from the multiprocess metrics
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid)
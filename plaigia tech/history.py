@@ -0,0 +1,233 @@
+from typing import Optional, Dict, Any, List, Tuple
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+HISTORY_TYPES = ("plagiarism", "rephrase")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    type TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    text_digest TEXT NOT NULL,
+    output_digest TEXT,
+    result TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_history_user ON history (username, id);
+CREATE INDEX IF NOT EXISTS ix_history_user_type ON history (username, type, id);
+CREATE TABLE IF NOT EXISTS bodies (
+    digest TEXT PRIMARY KEY,
+    body BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+def digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+def encode_cursor(entry_id: int) -> str:
+    return base64.urlsafe_b64encode(str(entry_id).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+class HistoryStore:
+    """
+    Append-only store of plagiarism and rephrase results.
+
+    Text bodies are zlib-compressed and stored once per content digest. Entries
+    are queued by the request handlers and written by a background task in
+    batches, one transaction per batch. Pages are read with keyset pagination
+    on the entry id, so fetching any page costs the same.
+    """
+
+    def __init__(self, path: str, batch_size: int = 200, queue_size: int = 10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened on first use, not at import: a connection must not be shared
+        # with processes forked from a preloading Gunicorn master. Callers hold _lock.
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def append(self, username: str, type: str, text: str, result: Dict[str, Any], output: Optional[str] = None):
+        """Queue an entry for writing; never blocks the request path."""
+        if self._queue is None:
+            logger.warning(f"History store not started, dropping {type} entry for {username}")
+            return
+        entry = (username, type, time.time(), text, output, result)
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            logger.warning(f"History queue full, dropping {type} entry for {username}")
+
+    def _write_batch(self, batch: List[Tuple]):
+        bodies: Dict[str, bytes] = {}
+        rows = []
+        for username, type, created_at, text, output, result in batch:
+            text_digest = digest(text)
+            bodies.setdefault(text_digest, text)
+            output_digest = None
+            if output is not None:
+                output_digest = digest(output)
+                bodies.setdefault(output_digest, output)
+            rows.append((username, type, created_at, text_digest, output_digest, json.dumps(result)))
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO bodies (digest, body) VALUES (?, ?)",
+                    [(d, zlib.compress(body.encode("utf-8"), 6)) for d, body in bodies.items()],
+                )
+                conn.executemany(
+                    "INSERT INTO history (username, type, created_at, text_digest, output_digest, result) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} history entries: {e}", exc_info=True)
+
+    def start(self):
+        """Open this process's connection and start the writer (called in each worker)."""
+        with self._lock:
+            self._connection()
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the writer after flushing queued entries, and close the connection."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        batch = []
+        while self._queue is not None and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        if batch:
+            await asyncio.to_thread(self._write_batch, batch)
+        self._queue = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _read_page(
+        self,
+        username: str,
+        limit: int,
+        before_id: Optional[int],
+        type: Optional[str],
+        since: Optional[float],
+        until: Optional[float],
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        query = "SELECT id, type, created_at, text_digest, output_digest, result FROM history WHERE username = ?"
+        params: List[Any] = [username]
+        if type:
+            query += " AND type = ?"
+            params.append(type)
+        if before_id is not None:
+            query += " AND id < ?"
+            params.append(before_id)
+        if since is not None:
+            query += " AND created_at >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND created_at < ?"
+            params.append(until)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute(query, params).fetchall()
+            more = len(rows) > limit
+            rows = rows[:limit]
+            digests = {d for row in rows for d in (row[3], row[4]) if d}
+            bodies: Dict[str, str] = {}
+            if digests:
+                placeholders = ",".join("?" * len(digests))
+                for d, body in conn.execute(
+                    f"SELECT digest, body FROM bodies WHERE digest IN ({placeholders})", list(digests)
+                ):
+                    bodies[d] = zlib.decompress(body).decode("utf-8")
+
+        items = []
+        for entry_id, entry_type, created_at, text_digest, output_digest, result in rows:
+            timestamp = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(created_at))
+            if entry_type == "rephrase":
+                items.append({
+                    "id": entry_id,
+                    "type": entry_type,
+                    "original": bodies.get(text_digest),
+                    "rephrased": bodies.get(output_digest),
+                    "timestamp": timestamp,
+                })
+            else:
+                items.append({
+                    "id": entry_id,
+                    "type": entry_type,
+                    "text": bodies.get(text_digest),
+                    "result": json.loads(result),
+                    "timestamp": timestamp,
+                })
+        next_cursor = encode_cursor(rows[-1][0]) if more and rows else None
+        return items, next_cursor
+
+    async def page(
+        self,
+        username: str,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        type: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Return one page of a user's history, newest first, and the next cursor."""
+        before_id = decode_cursor(cursor) if cursor else None
+        return await asyncio.to_thread(self._read_page, username, limit, before_id, type, since, until)
+
+# Process-wide history store
+history_store = HistoryStore(settings.HISTORY_DB_PATH)
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Load generator for the PlagiaTech API.
+
+Drives a mixed workload (register/login/check/rephrase/usage) from a pool of
+asyncio workers sharing one pooled HTTP client, either closed-loop (fixed
+concurrency) or open-loop (Poisson arrivals at a fixed rate). Requests made
+during the warm-up period are discarded. Reports throughput, latency
+percentiles and error rates, optionally saved as JSON and compared against a
+stored baseline.
+
+Run against a live server with --url, or fully offline with --in-process,
+which drives the app through httpx's ASGI transport with simulated providers.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional, Any
+
+import httpx
+
+# Default API URL
+DEFAULT_API_URL = "http://localhost:8000/api"
+
+# Operation weights for each workload profile
+PROFILES: Dict[str, Dict[str, int]] = {
+    "mixed": {"check": 45, "rephrase": 30, "usage": 15, "login": 8, "register": 2},
+    "check": {"check": 100},
+    "rephrase": {"rephrase": 100},
+    "read": {"usage": 80, "login": 20},
+    "auth": {"login": 70, "register": 30},
+}
+
+SAMPLE_TEXT = (
+    "The quick brown fox jumps over the lazy dog. "
+    "Plagiarism detection compares submitted text against known sources. "
+)
+
+PERCENTILES = (50, 95, 99, 99.9)
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+class Recorder:
+    """Collects latencies and outcomes per operation after warm-up."""
+
+    def __init__(self, warmup_until: float):
+        self.warmup_until = warmup_until
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.measure_start: Optional[float] = None
+        self.measure_end: Optional[float] = None
+
+    def record(self, op: str, started: float, elapsed: float, status: str):
+        if started < self.warmup_until:
+            return
+        if self.measure_start is None:
+            self.measure_start = started
+        self.measure_end = started + elapsed
+        self.latencies[op].append(elapsed)
+        self.statuses[op][status] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        window = (self.measure_end or 0) - (self.measure_start or 0)
+        operations = {}
+        all_latencies: List[float] = []
+        total = errors = 0
+        for op, values in sorted(self.latencies.items()):
+            values.sort()
+            all_latencies.extend(values)
+            statuses = dict(self.statuses[op])
+            op_errors = sum(n for s, n in statuses.items() if not s.startswith("2"))
+            total += len(values)
+            errors += op_errors
+            operations[op] = {
+                "requests": len(values),
+                "error_rate": op_errors / len(values) if values else 0.0,
+                "statuses": statuses,
+                "latency_ms": {f"p{p:g}": percentile(values, p) * 1000 for p in PERCENTILES},
+            }
+        all_latencies.sort()
+        return {
+            "requests": total,
+            "duration_s": window,
+            "throughput_rps": total / window if window > 0 else 0.0,
+            "error_rate": errors / total if total else 0.0,
+            "latency_ms": {f"p{p:g}": percentile(all_latencies, p) * 1000 for p in PERCENTILES},
+            "operations": operations,
+        }
+
+class Workload:
+    """Issues one operation of the chosen profile per call."""
+
+    def __init__(self, client: httpx.AsyncClient, profile: str, users: List[Dict[str, str]], text: str):
+        self.client = client
+        self.ops = list(PROFILES[profile].keys())
+        self.weights = list(PROFILES[profile].values())
+        self.users = users
+        self.text = text
+
+    async def run_one(self, recorder: Recorder):
+        op = random.choices(self.ops, self.weights)[0]
+        user = random.choice(self.users)
+        headers = {"Authorization": f"Bearer {user['token']}"}
+        started = time.perf_counter()
+        try:
+            if op == "check":
+                response = await self.client.post("/check-plagiarism", json={"text": self.text}, headers=headers)
+            elif op == "rephrase":
+                response = await self.client.post("/rephrase", json={"text": self.text}, headers=headers)
+            elif op == "usage":
+                response = await self.client.get("/usage", headers=headers)
+            elif op == "login":
+                response = await self.client.post(
+                    "/token", data={"username": user["username"], "password": user["password"]}
+                )
+            else:
+                name = f"load_{uuid.uuid4().hex[:12]}"
+                response = await self.client.post(
+                    "/register",
+                    json={"username": name, "email": f"{name}@example.com", "password": "LoadTest123"},
+                )
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        recorder.record(op, started, time.perf_counter() - started, status)
+
+async def create_users(client: httpx.AsyncClient, count: int, premium: bool) -> List[Dict[str, str]]:
+    """Register and log in the pool of users the workload acts as."""
+    async def create(i: int) -> Dict[str, str]:
+        username = f"load_{uuid.uuid4().hex[:12]}"
+        password = "LoadTest123"
+        response = await client.post(
+            "/register", json={"username": username, "email": f"{username}@example.com", "password": password}
+        )
+        response.raise_for_status()
+        response = await client.post("/token", data={"username": username, "password": password})
+        response.raise_for_status()
+        token = response.json()["access_token"]
+        if premium:
+            # Premium users are not capped by the free-tier usage quota
+            await client.post("/premium", headers={"Authorization": f"Bearer {token}"})
+        return {"username": username, "password": password, "token": token}
+
+    return await asyncio.gather(*(create(i) for i in range(count)))
+
+async def closed_loop(workload: Workload, recorder: Recorder, concurrency: int, deadline: float):
+    async def worker():
+        while time.perf_counter() < deadline:
+            await workload.run_one(recorder)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+async def open_loop(workload: Workload, recorder: Recorder, rate: float, concurrency: int, deadline: float):
+    """Poisson arrivals at `rate` per second, at most `concurrency` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = set()
+    dropped = 0
+
+    async def run():
+        try:
+            await workload.run_one(recorder)
+        finally:
+            semaphore.release()
+
+    next_arrival = time.perf_counter()
+    while next_arrival < deadline:
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if semaphore.locked():
+            dropped += 1
+        else:
+            await semaphore.acquire()
+            task = asyncio.create_task(run())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        next_arrival += random.expovariate(rate)
+    await asyncio.gather(*tasks)
+    return dropped
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return human-readable regressions of result against baseline."""
+    regressions = []
+    if result["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        regressions.append(
+            f"throughput {result['throughput_rps']:.1f} rps < baseline {baseline['throughput_rps']:.1f} rps"
+        )
+    if result["error_rate"] > baseline["error_rate"] + tolerance / 10:
+        regressions.append(f"error rate {result['error_rate']:.2%} > baseline {baseline['error_rate']:.2%}")
+    for op, stats in result["operations"].items():
+        base = baseline.get("operations", {}).get(op)
+        if not base:
+            continue
+        for key in ("p95", "p99"):
+            if stats["latency_ms"][key] > base["latency_ms"][key] * (1 + tolerance):
+                regressions.append(
+                    f"{op} {key} {stats['latency_ms'][key]:.1f} ms > baseline {base['latency_ms'][key]:.1f} ms"
+                )
+    return regressions
+
+def print_report(result: Dict[str, Any]):
+    print("\n=== Load Test Results ===")
+    print(f"Requests: {result['requests']} in {result['duration_s']:.1f} s")
+    print(f"Throughput: {result['throughput_rps']:.1f} req/s")
+    print(f"Error rate: {result['error_rate']:.2%}")
+    print(f"{'operation':<10} {'count':>7} {'errors':>7} " + " ".join(f"{'p' + format(p, 'g'):>9}" for p in PERCENTILES))
+    rows = list(result["operations"].items()) + [("all", {
+        "requests": result["requests"], "error_rate": result["error_rate"], "latency_ms": result["latency_ms"],
+    })]
+    for op, stats in rows:
+        latencies = " ".join(f"{stats['latency_ms']['p' + format(p, 'g')]:>7.1f}ms" for p in PERCENTILES)
+        print(f"{op:<10} {stats['requests']:>7} {stats['error_rate']:>7.2%} {latencies}")
+
+async def run(args) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if args.in_process:
+        import main
+        transport = httpx.ASGITransport(app=main.app)
+        base_url = "http://testserver/api"
+        lifespan = main.app.router.lifespan_context(main.app)
+    else:
+        transport = None
+        base_url = args.url
+        lifespan = None
+
+    async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits, timeout=args.timeout) as client:
+        if lifespan is not None:
+            await lifespan.__aenter__()
+        try:
+            print(f"Creating {args.users} users...")
+            users = await create_users(client, args.users, premium=not args.free_tier)
+            workload = Workload(client, args.profile, users, args.text)
+            start = time.perf_counter()
+            recorder = Recorder(warmup_until=start + args.warmup)
+            deadline = start + args.warmup + args.duration
+            mode = f"{args.rate:g} req/s open-loop" if args.rate else f"{args.concurrency} concurrent workers"
+            print(f"Running '{args.profile}' profile with {mode} for {args.warmup:g}s warm-up + {args.duration:g}s")
+            dropped = 0
+            if args.rate:
+                dropped = await open_loop(workload, recorder, args.rate, args.concurrency, deadline)
+            else:
+                await closed_loop(workload, recorder, args.concurrency, deadline)
+        finally:
+            if lifespan is not None:
+                await lifespan.__aexit__(None, None, None)
+
+    result = recorder.summary()
+    result["config"] = {
+        "profile": args.profile,
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "users": args.users,
+        "in_process": args.in_process,
+        "dropped_arrivals": dropped,
+    }
+    return result
+
+def main():
+    """Run the load test."""
+    parser = argparse.ArgumentParser(description="Load test PlagiaTech API endpoints")
+    parser.add_argument("--url", default=DEFAULT_API_URL, help="API base URL")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Drive the app in-process through the ASGI transport (no server needed)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="mixed", help="Workload profile")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent workers / max in-flight requests")
+    parser.add_argument("--rate", type=float, default=0, help="Open-loop arrival rate in req/s (0 = closed loop)")
+    parser.add_argument("--duration", type=float, default=30, help="Measured duration in seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Warm-up seconds excluded from results")
+    parser.add_argument("--users", type=int, default=10, help="Number of users to create")
+    parser.add_argument("--free-tier", action="store_true", help="Keep users on the free tier (quota applies)")
+    parser.add_argument("--text", default=SAMPLE_TEXT, help="Text to submit")
+    parser.add_argument("--timeout", type=float, default=30, help="Request timeout in seconds")
+    parser.add_argument("--provider-latency", type=float, default=None,
+                        help="Simulated provider latency for --in-process runs (seconds)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against a previous JSON result")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed regression vs. baseline (fraction)")
+
+    args = parser.parse_args()
+
+    if args.in_process and args.provider_latency is not None:
+        # Must be set before the app (and its settings) are imported
+        os.environ["MOCK_PROVIDER_LATENCY"] = str(args.provider_latency)
+
+    result = asyncio.run(run(args))
+    print_report(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print("\n=== Regressions vs. baseline ===")
+            for regression in regressions:
+                print(f"- {regression}")
+            sys.exit(1)
+        print("\nNo regressions vs. baseline")
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,27 @@
 
 from fastapi import FastAPI, Request, Response, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse
-from fastapi_limiter import FastAPILimiter
-from fastapi_limiter.depends import RateLimiter
-from routes import plagiarism, rephrase, user
-from config import settings
-import redis.asyncio as redis
+from routes import plagiarism, bulk, rephrase, user, admin
+from config import settings, validate_settings
+from metering import init_metering
+from rate_limit import rate_limiter
+from history import history_store
+from submissions import submission_index
+from admission import AdmissionMiddleware, admission_controller
+from body_limit import BodyLimitMiddleware, text_body_limit
+from metrics import MetricsMiddleware, CELERY_QUEUE_DEPTH, mark_process_dead, render_metrics
+from profiling import ProfilingMiddleware, profiler
+from tracing import TracingMiddleware, tracer
+from subsystems import subsystems
+from responses import FastJSONResponse
+from content_encoding import CompressionMiddleware
+from static_files import CachedStaticFiles, StaticManifest
+from redis_pool import redis_pool
 import uvicorn
+import asyncio
 import logging
-import time
 import os
 
 # Configure logging
@@ -28,6 +38,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
+    default_response_class=FastJSONResponse,
 )
 
 # Configure CORS
@@ -39,17 +50,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Add GZip compression
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+# Negotiated zstd/brotli/gzip compression: fast levels for latency-sensitive
+# check results, higher ones for larger history pages
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    route_levels={
+        "/api/check-plagiarism": {"zstd": 1, "br": 1, "gzip": 1},
+        "/api/rephrase": {"zstd": 1, "br": 1, "gzip": 1},
+        "/api/history": {"zstd": 6, "br": 5, "gzip": 6},
+    },
+)
+
+# Reject oversized request bodies while they stream in, before JSON parsing
+app.add_middleware(
+    BodyLimitMiddleware,
+    limits={
+        "/api/check-plagiarism": text_body_limit(settings.MAX_TEXT_LENGTH),
+        "/api/check-plagiarism/async": text_body_limit(settings.MAX_TEXT_LENGTH) + 2048,
+        "/api/check-plagiarism/bulk": settings.BULK_MAX_BODY_BYTES,
+        "/api/rephrase": text_body_limit(settings.MAX_TEXT_LENGTH),
+    },
+    default_limit=settings.MAX_BODY_BYTES,
+)
+
+# Start or continue a trace for every request
+app.add_middleware(TracingMiddleware, tracer=tracer, trust_incoming=settings.TRACE_TRUST_INCOMING)
+
+# Opt-in sampling profiler for selected routes
+app.add_middleware(ProfilingMiddleware, profiler=profiler, admin_token=settings.ADMIN_TOKEN)
 
-# Request timing middleware
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
+# Admission control (outermost but for metrics, so shed requests cost as little
+# as possible while still being counted)
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=admission_controller,
+        protected_paths={"/api/token", "/api/register", "/api/admin/profiling"},
+    )
+
+# Request metrics and X-Process-Time header (outermost, so shed requests are counted too)
+app.add_middleware(MetricsMiddleware)
 
 # Error handling middleware
 @app.exception_handler(Exception)
@@ -63,35 +104,57 @@ async def global_exception_handler(request: Request, exc: Exception):
 # Initialize rate limiter
 @app.on_event("startup")
 async def startup():
-    try:
-        # Connect to Redis for rate limiting
-        redis_instance = redis.from_url(settings.REDIS_URL, encoding="utf-8", decode_responses=True)
-        await FastAPILimiter.init(redis_instance)
-        logger.info("Connected to Redis for rate limiting")
-    except Exception as e:
-        logger.warning(f"Failed to connect to Redis: {e}. Rate limiting disabled.")
+    validate_settings()
+    history_store.start()
+    submission_index.start()
+    # Every subsystem shares one connection pool; while Redis is unreachable
+    # they fall back to per-process state and the pool keeps reconnecting
+    init_metering(redis_pool)
+    await redis_pool.start()
+    # Rate limiting answers locally and reconciles with Redis whenever it is reachable
+    rate_limiter.start(redis_pool)
+    admission_controller.start(redis_pool.client)
+    # Build heavy subsystems in the background; /ready reports when this is done
+    app.state.warm_up = asyncio.create_task(subsystems.warm_up())
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown():
+    admission_controller.stop()
+    await rate_limiter.stop()
+    await history_store.stop()
+    await submission_index.stop()
+    await subsystems.close()
+    await redis_pool.close()
+    # uvicorn --reload and plain uvicorn workers have no gunicorn child_exit hook
+    mark_process_dead()
     logger.info("Shutting down API")
 
 # Include routers with rate limiting
 app.include_router(
     plagiarism.router, 
     prefix="/api",
-    dependencies=[Depends(RateLimiter(times=100, seconds=3600))] if settings.ENVIRONMENT == "production" else []
+    dependencies=[Depends(rate_limiter)] if settings.ENVIRONMENT == "production" else []
+)
+app.include_router(
+    bulk.router,
+    prefix="/api",
+    dependencies=[Depends(rate_limiter)] if settings.ENVIRONMENT == "production" else []
 )
 app.include_router(
     rephrase.router, 
     prefix="/api",
-    dependencies=[Depends(RateLimiter(times=100, seconds=3600))] if settings.ENVIRONMENT == "production" else []
+    dependencies=[Depends(rate_limiter)] if settings.ENVIRONMENT == "production" else []
 )
 app.include_router(user.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
 
-# Serve static files (if needed)
-if os.path.exists("static"):
-    app.mount("/static", StaticFiles(directory="static"), name="static")
+# Serve static files: the hashed, precompressed build (see build_static.py) when
+# present, otherwise the sources as-is
+if StaticManifest.exists(settings.STATIC_BUILD_DIR):
+    app.mount("/static", CachedStaticFiles(settings.STATIC_BUILD_DIR), name="static")
+elif os.path.exists(settings.STATIC_DIR):
+    app.mount("/static", StaticFiles(directory=settings.STATIC_DIR), name="static")
 
 @app.get("/")
 def read_root():
@@ -102,11 +165,24 @@ def read_root():
         "environment": settings.ENVIRONMENT
     }
 
+# Prometheus metrics endpoint
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    CELERY_QUEUE_DEPTH.set(admission_controller.queue_depth)
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 # Health check endpoint
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
 
+# Readiness check endpoint (503 until subsystem warm-up has finished)
+@app.get("/ready")
+def readiness_check():
+    status = subsystems.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
 # For running the app directly
 if __name__ == "__main__":
     uvicorn.run(
@@ -0,0 +1,253 @@
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from typing import Optional, Dict, List, Tuple, Deque
+from collections import defaultdict, deque
+import logging
+import os
+import time
+from config import settings
+from redis_pool import Batch
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Seconds per rate unit accepted in settings such as "10/day"
+RATE_UNITS: Dict[str, int] = {
+    "second": 1,
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+}
+
+# Sliding-window check-and-increment, executed atomically inside Redis.
+# Uses the Redis server clock so every API and Celery process agrees on
+# window boundaries regardless of local clock skew.
+#
+# KEYS[1] - sorted set of usage events for one user
+# ARGV[1] - window length in milliseconds
+# ARGV[2] - limit (-1 for unlimited)
+# ARGV[3] - unique member for this event
+# ARGV[4] - number of events to record (0 to only inspect the window)
+#
+# Returns {allowed, used, reset_in_ms}
+METER_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local used = redis.call('ZCARD', KEYS[1])
+local count = tonumber(ARGV[4])
+local allowed = 1
+if limit >= 0 and used + math.max(count, 1) > limit then
+    allowed = 0
+elseif count > 0 then
+    for i = 1, count do
+        redis.call('ZADD', KEYS[1], now, ARGV[3] .. ':' .. i)
+    end
+    redis.call('PEXPIRE', KEYS[1], window)
+    used = used + count
+end
+local reset = 0
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if oldest[2] then
+    reset = tonumber(oldest[2]) + window - now
+end
+return {allowed, used, reset}
+"""
+
+# Id of a usage recorded in the in-process window, which has no per-event ids
+LOCAL_EVENT = "local"
+
+class UsageWindow(BaseModel):
+    allowed: bool
+    used: int
+    limit: Optional[int] = None
+    window_seconds: int
+    reset_in: float = 0.0
+
+    @property
+    def remaining(self) -> Optional[int]:
+        if self.limit is None:
+            return None
+        return max(0, self.limit - self.used)
+
+def parse_rate(rate: str) -> Tuple[Optional[int], int]:
+    """
+    Parse a rate string such as "10/day" into (limit, window_seconds).
+
+    "unlimited" (or an empty string) yields a limit of None with a daily window.
+    """
+    rate = (rate or "").strip().lower()
+    if rate in ("", "unlimited"):
+        return None, RATE_UNITS["day"]
+    try:
+        count, unit = rate.split("/", 1)
+        unit = unit.strip().rstrip("s")
+        return int(count), RATE_UNITS[unit]
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate limit: {rate!r} (expected e.g. '10/day')")
+
+def tier_limits() -> Dict[str, Tuple[Optional[int], int]]:
+    """Build per-tier usage limits from settings."""
+    return {
+        "free": parse_rate(settings.RATE_LIMIT_FREE_TIER),
+        "premium": parse_rate(settings.RATE_LIMIT_PREMIUM_TIER),
+    }
+
+def tier_for(is_premium: bool) -> str:
+    return "premium" if is_premium else "free"
+
+class UsageMeter:
+    """
+    Per-user usage metering with sliding windows.
+
+    Backed by a single Lua script in Redis (run by EVALSHA through the shared
+    pool) so that the check and the increment happen in one command and stay
+    consistent across all uvicorn and Celery processes. The command can also
+    be added to a larger Batch (see preflight.py) to share its round trip.
+    When Redis is not available, an in-process window is used instead
+    (correct per process only). Usage of unlimited tiers is not recorded.
+    """
+
+    def __init__(self, pool=None, key_prefix: str = "usage"):
+        self.pool = pool
+        self.key_prefix = key_prefix
+        self.limits = tier_limits()
+        self._sha = pool.register_script(METER_SCRIPT) if pool is not None else None
+        self._local: Dict[str, Deque[float]] = defaultdict(deque)
+
+    @property
+    def shared(self) -> bool:
+        """Whether usage is currently recorded in Redis."""
+        return self.pool is not None and self.pool.available
+
+    def _key(self, username: str) -> str:
+        return f"{self.key_prefix}:{username}"
+
+    def unlimited(self, tier: str) -> bool:
+        return self.limits[tier][0] is None
+
+    def add_command(self, batch: Batch, username: str, tier: str, count: int) -> Tuple[int, str]:
+        """Queue the check-and-record command; returns its reply index and the event member."""
+        limit, window = self.limits[tier]
+        member = os.urandom(8).hex()
+        index = batch.add(
+            "EVALSHA", self._sha, 1, self._key(username),
+            window * 1000, -1 if limit is None else limit, member, count,
+        )
+        return index, member
+
+    def parse(self, reply, tier: str) -> UsageWindow:
+        limit, window = self.limits[tier]
+        allowed, used, reset_ms = reply
+        return UsageWindow(
+            allowed=bool(allowed), used=int(used), limit=limit,
+            window_seconds=window, reset_in=max(0, int(reset_ms)) / 1000,
+        )
+
+    def add_refund(self, batch: Batch, username: str, member: str, count: int):
+        """Queue removal of the events recorded under `member` (e.g. for a replayed request)."""
+        batch.add("ZREM", self._key(username), *[f"{member}:{i}" for i in range(1, count + 1)])
+
+    async def _run(self, username: str, tier: str, count: int) -> UsageWindow:
+        if self.unlimited(tier):
+            return UsageWindow(allowed=True, used=0, window_seconds=self.limits[tier][1])
+        if self.shared:
+            try:
+                batch = Batch()
+                self.add_command(batch, username, tier, count)
+                replies = await self.pool.execute(batch)
+                return self.parse(replies[0], tier)
+            except Exception as e:
+                logger.warning(f"Usage metering in Redis failed: {e}. Falling back to local window.")
+        return self.run_local(username, tier, count)
+
+    def run_local(self, username: str, tier: str, count: int) -> UsageWindow:
+        limit, window = self.limits[tier]
+        return self._run_local(username, limit, window, count)
+
+    def _run_local(self, username: str, limit: Optional[int], window: int, count: int) -> UsageWindow:
+        now = time.monotonic()
+        events = self._local[username]
+        while events and events[0] <= now - window:
+            events.popleft()
+        allowed = limit is None or len(events) + max(count, 1) <= limit
+        if allowed and count and limit is not None:
+            events.extend([now] * count)
+        reset_in = events[0] + window - now if events else 0.0
+        return UsageWindow(
+            allowed=allowed, used=len(events), limit=limit,
+            window_seconds=window, reset_in=reset_in,
+        )
+
+    async def consume(self, username: str, tier: str, amount: int = 1) -> UsageWindow:
+        """Atomically check the user's quota and record `amount` usages if they all fit."""
+        return await self._run(username, tier, amount)
+
+    async def peek(self, username: str, tier: str) -> UsageWindow:
+        """Return the user's current window without recording usage."""
+        return await self._run(username, tier, 0)
+
+    async def charge(self, username: str, tier: str, count: int) -> Tuple[UsageWindow, List[str]]:
+        """
+        Like consume, but also returns an id for each recorded usage, so that
+        some of them can be given back with refund() (e.g. checks that failed).
+        """
+        limit, window = self.limits[tier]
+        if limit is None:
+            return UsageWindow(allowed=True, used=0, window_seconds=window), []
+        if self.shared:
+            try:
+                batch = Batch()
+                index, member = self.add_command(batch, username, tier, count)
+                usage = self.parse((await self.pool.execute(batch))[index], tier)
+                return usage, [f"{member}:{i}" for i in range(1, count + 1)] if usage.allowed else []
+            except Exception as e:
+                logger.warning(f"Usage metering in Redis failed: {e}. Falling back to local window.")
+        usage = self._run_local(username, limit, window, count)
+        return usage, [LOCAL_EVENT] * count if usage.allowed else []
+
+    async def refund(self, username: str, events: List[str]):
+        """Remove usages recorded by charge(), by the ids it returned."""
+        shared = [event for event in events if event != LOCAL_EVENT]
+        local = self._local[username]
+        for _ in range(min(len(events) - len(shared), len(local))):
+            local.pop()
+        if shared and self.pool is not None:
+            batch = Batch()
+            batch.add("ZREM", self._key(username), *shared)
+            try:
+                await self.pool.execute(batch)
+            except Exception as e:
+                logger.warning(f"Failed to refund usage: {e}")
+
+# Process-wide meter, replaced with a Redis-backed one at startup
+meter = UsageMeter()
+
+def init_metering(pool) -> UsageMeter:
+    """Install the Redis-backed meter used by the API routes."""
+    global meter
+    meter = UsageMeter(pool)
+    return meter
+
+def limit_exceeded(usage: UsageWindow, is_premium: bool) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Free tier limit reached. Please upgrade to premium." if not is_premium
+        else "Usage limit reached. Please try again later.",
+        headers={"Retry-After": str(int(usage.reset_in) + 1)},
+    )
+
+async def enforce_usage_limit(username: str, is_premium: bool, amount: int = 1) -> UsageWindow:
+    """
+    Record `amount` usages for the user, raising 429 if their tier quota can't cover them.
+    """
+    usage = await meter.consume(username, tier_for(is_premium), amount)
+    if not usage.allowed:
+        raise limit_exceeded(usage, is_premium)
+    return usage
+
+async def meter_for_user(username: str, is_premium: bool) -> UsageWindow:
+    """Return the user's current usage window without consuming quota."""
+    return await meter.peek(username, tier_for(is_premium))
@@ -0,0 +1,191 @@
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+    CONTENT_TYPE_LATEST, generate_latest, multiprocess,
+)
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+import glob
+import logging
+import os
+import time
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# When PROMETHEUS_MULTIPROC_DIR is set (multiple uvicorn/gunicorn workers or
+# Celery), every process writes its samples to memory-mapped files in that
+# directory and /metrics aggregates them on scrape.
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUEST_LATENCY = Histogram(
+    "plagiatech_http_request_duration_seconds",
+    "HTTP request latency by route and status",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "plagiatech_http_requests_in_flight",
+    "HTTP requests currently being handled",
+    multiprocess_mode="livesum",
+)
+UPSTREAM_LATENCY = Histogram(
+    "plagiatech_upstream_request_duration_seconds",
+    "Latency of calls to upstream plagiarism and rephrasing providers",
+    ["provider", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "plagiatech_cache_requests_total",
+    "Result cache lookups by cache and outcome",
+    ["cache", "result"],
+)
+CELERY_QUEUE_DEPTH = Gauge(
+    "plagiatech_celery_queue_depth",
+    "Tasks waiting in the Celery broker queue",
+    multiprocess_mode="livemax",
+)
+CELERY_TASK_DURATION = Histogram(
+    "plagiatech_celery_task_duration_seconds",
+    "Celery task runtime by task and final state",
+    ["task", "state"],
+    buckets=LATENCY_BUCKETS,
+)
+REDIS_ROUND_TRIPS = Histogram(
+    "plagiatech_redis_round_trips",
+    "Redis round trips (commands or pipelines sent) per HTTP request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20),
+)
+
+# Round trips of the current request; a one-element list so tasks the request
+# spawns (which copy the context) add to the same count
+_round_trips: ContextVar[Optional[List[int]]] = ContextVar("redis_round_trips", default=None)
+
+# Label children are cached so the request path avoids the labels() lookup
+_request_children: Dict[Tuple[str, str, str], object] = {}
+
+def observe_request(method: str, route: str, status: int, duration: float):
+    key = (method, route, str(status))
+    child = _request_children.get(key)
+    if child is None:
+        child = _request_children[key] = REQUEST_LATENCY.labels(*key)
+    child.observe(duration)
+
+@contextmanager
+def observe_upstream(provider: str):
+    """Time a call to an upstream provider."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "success"
+    finally:
+        UPSTREAM_LATENCY.labels(provider, outcome).observe(time.perf_counter() - start)
+
+def route_label(scope) -> str:
+    """
+    Path template of the matched route, e.g. /api/check-plagiarism/{task_id}.
+
+    Some FastAPI versions report routes relative to the router they were
+    included from, so any missing prefix is restored from the request path.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    missing = scope["path"].count("/") - template.count("/")
+    if missing > 0:
+        prefix = "/".join(scope["path"].split("/")[:missing + 1])
+        template = prefix + template
+    return template
+
+def record_redis_round_trip():
+    counter = _round_trips.get()
+    if counter is not None:
+        counter[0] += 1
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+def clear_multiprocess_dir():
+    """
+    Delete every process's sample files, so samples (and the live gauges) of
+    processes from a previous run are not aggregated forever. Call only while
+    no other process is writing to the directory, i.e. when starting them all.
+    """
+    directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if not directory or not os.path.isdir(directory):
+        return
+    removed = 0
+    for path in glob.glob(os.path.join(directory, "*.db")):
+        os.remove(path)
+        removed += 1
+    if removed:
+        logger.info(f"Removed {removed} stale metrics files from {directory}")
+
+def mark_process_dead(pid: Optional[int] = None):
+    """Drop the live gauges of an exiting process from the aggregated metrics."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid() if pid is None else pid)
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Render all metrics in the Prometheus text format."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency, in-flight requests and
+    Redis round trips per request.
+
+    Latency is measured with a monotonic clock up to the start of the response
+    and also returned in the X-Process-Time header. Routes are labelled by
+    their path template (e.g. /api/check-plagiarism/{task_id}) to keep label
+    cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+        recorded = False
+
+        def record():
+            nonlocal recorded
+            recorded = True
+            elapsed = time.perf_counter() - start
+            observe_request(scope["method"], route_label(scope), status_code, elapsed)
+            return elapsed
+
+        async def timed_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed = record()
+                message["headers"] = list(message.get("headers", [])) + [(b"x-process-time", str(elapsed).encode())]
+            await send(message)
+
+        round_trips = [0]
+        token = _round_trips.set(round_trips)
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            _round_trips.reset(token)
+            if not recorded:
+                record()
+            REDIS_ROUND_TRIPS.labels(scope["method"], route_label(scope)).observe(round_trips[0])
@@ -0,0 +1,176 @@
+from bisect import bisect_right
+from typing import List, Tuple
+import hashlib
+import re
+import threading
+import unicodedata
+
+# Lowercase Cyrillic and Greek letters that pass for Latin ones (after case
+# folding, so capital lookalikes such as Cyrillic Н and Greek Ρ are covered too)
+HOMOGLYPHS = {
+    "а": "a", "в": "b", "е": "e", "һ": "h", "і": "i", "ј": "j", "к": "k", "ӏ": "l",
+    "м": "m", "н": "h", "о": "o", "р": "p", "ԛ": "q", "с": "c", "ѕ": "s", "т": "t",
+    "у": "y", "ԝ": "w", "х": "x", "ԁ": "d",
+    "α": "a", "β": "b", "ε": "e", "ζ": "z", "η": "n", "ι": "i", "κ": "k", "μ": "m",
+    "ν": "v", "ο": "o", "ρ": "p", "τ": "t", "υ": "u", "χ": "x",
+    "ı": "i", "ɑ": "a", "ɡ": "g",
+}
+
+# Code points that render as nothing; most are category Cf, these are not
+INVISIBLE = {"\u034f", "\u115f", "\u1160", "\u17b4", "\u17b5", "\u3164", "\uffa0"}
+
+# Runs of spaces left where punctuation and whitespace were mapped to " "
+_SPACE_RUNS = re.compile(r" {2,}")
+_EDGE_SPACES = re.compile(r"^ +| +$| {2,}")
+
+def fold_char(ch: str) -> str:
+    """
+    Normalized form of one code point: NFKC, case folding, diacritics and
+    invisible characters dropped, homoglyphs mapped to Latin, and anything
+    that is not part of a word mapped to a space.
+    """
+    category = unicodedata.category(ch)
+    if category == "Cf" or ch in INVISIBLE:
+        return ""
+    folded = unicodedata.normalize("NFD", unicodedata.normalize("NFKC", ch).casefold())
+    out = []
+    for c in folded:
+        if unicodedata.combining(c):
+            continue
+        c = HOMOGLYPHS.get(c, c)
+        # Spacing marks (combining class 0) are part of words in e.g. Indic scripts
+        out.append(c if c.isalnum() or unicodedata.category(c)[0] == "M" else " ")
+    return unicodedata.normalize("NFC", "".join(out))
+
+class _FoldTable(dict):
+    """
+    str.translate table filled lazily, one entry per distinct code point seen.
+
+    Code points whose normalized form is not exactly one character (zero-width
+    characters, combining marks, ligatures, "ß") are "irregular": only they
+    move offsets, and a compiled character class finds them in a text.
+    """
+
+    def __init__(self):
+        super().__init__((code, fold_char(chr(code))) for code in range(128))
+        self._irregular = set()
+        self._pattern = None
+        self._lock = threading.Lock()
+
+    def __missing__(self, code: int) -> str:
+        ch = chr(code)
+        out = fold_char(ch)
+        # Unassigned code points are not cached, so the table stays bounded
+        if unicodedata.category(ch) != "Cn":
+            self[code] = out
+        if len(out) != 1:
+            with self._lock:
+                self._irregular.add(ch)
+                self._pattern = None
+        return out
+
+    def irregular_pattern(self):
+        """Compiled character class of the irregular code points seen so far (None if none)."""
+        pattern = self._pattern
+        if pattern is None and self._irregular:
+            with self._lock:
+                chars = "".join(re.escape(ch) for ch in sorted(self._irregular))
+                pattern = self._pattern = re.compile(f"[{chars}]")
+        return pattern
+
+_table = _FoldTable()
+
+def _add_breakpoint(starts: List[int], targets: List[int], position: int, target: int):
+    if starts[-1] == position:
+        targets[-1] = target
+    else:
+        starts.append(position)
+        targets.append(target)
+
+def _lookup(starts: List[int], targets: List[int], position: int) -> int:
+    i = bisect_right(starts, position) - 1
+    return targets[i] + position - starts[i]
+
+class Normalized:
+    """
+    Normalized text with a map from its offsets back to the original text.
+
+    Offsets are piecewise linear: a new segment starts only where an irregular
+    character was dropped or expanded (translation) or a run of spaces was
+    collapsed, so the map costs memory per change, not per character, and a
+    lookup is two binary searches.
+    """
+
+    __slots__ = ("text", "original", "_translated", "_collapsed")
+
+    def __init__(self, text: str, original: str, translated: Tuple[List[int], List[int]],
+                 collapsed: Tuple[List[int], List[int]]):
+        self.text = text
+        self.original = original
+        self._translated = translated
+        self._collapsed = collapsed
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def to_original(self, position: int) -> int:
+        """Offset in the original text of the character at `position` of the normalized text."""
+        if position >= len(self.text):
+            return len(self.original)
+        return _lookup(*self._translated, _lookup(*self._collapsed, position))
+
+    def original_span(self, start: int, end: int) -> Tuple[int, int]:
+        """Span of the original text that normalized characters [start, end) came from."""
+        if end <= start:
+            position = self.to_original(start)
+            return position, position
+        return self.to_original(start), self.to_original(end - 1) + 1
+
+def fold(text: str) -> str:
+    """Normalized text only (no offset map); words are separated by single spaces."""
+    return _SPACE_RUNS.sub(" ", text.translate(_table)).strip(" ")
+
+def normalize(text: str) -> Normalized:
+    """Normalize `text` (see fold_char) and keep the offsets back into it."""
+    translated = text.translate(_table)
+
+    # Translation: only irregular characters shift offsets
+    starts, targets = [0], [0]
+    pattern = None if text.isascii() else _table.irregular_pattern()
+    if pattern is not None:
+        shift = 0
+        for match in pattern.finditer(text):
+            position = match.start()
+            size = len(_table[ord(text[position])])
+            current = position + shift
+            for extra in range(1, size):
+                _add_breakpoint(starts, targets, current + extra, position)
+            _add_breakpoint(starts, targets, current + size, position + 1)
+            shift += size - 1
+
+    # Collapsing: runs of spaces become one, leading and trailing ones go
+    collapsed_starts, collapsed_targets = [0], [0]
+    pieces = []
+    previous = shift = 0
+    for match in _EDGE_SPACES.finditer(translated):
+        start, end = match.span()
+        keep = 0 if start == 0 or end == len(translated) else 1
+        pieces.append(translated[previous:start])
+        pieces.append(" " * keep)
+        _add_breakpoint(collapsed_starts, collapsed_targets, start + shift + keep, end)
+        shift += keep - (end - start)
+        previous = end
+    pieces.append(translated[previous:])
+
+    return Normalized("".join(pieces), text, (starts, targets), (collapsed_starts, collapsed_targets))
+
+def cache_key(text: str) -> str:
+    """Digest of the normalized text, so trivially disguised resubmissions share cache entries."""
+    return hashlib.blake2b(fold(text).encode("utf-8"), digest_size=16).hexdigest()
+
+def exact_key(text: str) -> str:
+    """
+    Digest of the text as submitted, for results derived from its exact wording
+    (a rephrasing of one spelling must not be returned for another).
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
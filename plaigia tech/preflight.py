@@ -0,0 +1,142 @@
+from fastapi import HTTPException, status
+from typing import Optional, Dict, Any
+import json
+import logging
+from config import settings
+from redis_pool import Batch, redis_pool
+from metering import UsageWindow, limit_exceeded, tier_for
+import metering
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+
+# An in-progress claim expires on its own (e.g. after a crash) well before the
+# stored response would, so a retry isn't refused with 409 for a whole day
+PENDING_TTL = 300
+
+class Preflight:
+    """
+    Everything a request reads from Redis before doing its work, fetched in
+    one round trip: the usage quota check, the shared result cache and the
+    Idempotency-Key claim.
+    """
+
+    __slots__ = ("usage", "cached", "replay", "result_key", "idempotency_key")
+
+    def __init__(self):
+        self.usage: Optional[UsageWindow] = None
+        self.cached: Optional[Dict[str, Any]] = None
+        self.replay: Optional[Dict[str, Any]] = None
+        self.result_key: Optional[str] = None
+        self.idempotency_key: Optional[str] = None
+
+def result_key(operation: str, cache_key: str) -> str:
+    return f"result:{operation}:{cache_key}"
+
+async def preflight(operation: str, username: Optional[str], is_premium: bool,
+                    cache_key: Optional[str] = None, idempotency_key: Optional[str] = None,
+                    amount: int = 1) -> Preflight:
+    """
+    Check and record quota, look up the cached result for `cache_key` and
+    claim `idempotency_key`, all in one pipeline.
+
+    Raises 429 when the quota is exhausted and 409 while another request with
+    the same idempotency key is still running. When that request has
+    finished, its stored response is returned as `replay` and no quota is used.
+    Idempotency keys are scoped to the user (anonymous requests don't get one).
+    Without Redis only the per-process quota applies.
+    """
+    checks = Preflight()
+    meter = metering.meter
+    tier = tier_for(is_premium)
+    # Unlimited tiers have nothing to check, and their usage isn't recorded
+    metered = bool(username) and not meter.unlimited(tier)
+    if not meter.shared:
+        if metered:
+            checks.usage = meter.run_local(username, tier, amount)
+            if not checks.usage.allowed:
+                raise limit_exceeded(checks.usage, is_premium)
+        return checks
+
+    batch = Batch()
+    claim = stored = usage = member = cached = None
+    if username and idempotency_key:
+        checks.idempotency_key = f"idempotency:{operation}:{username}:{idempotency_key}"
+        claim = batch.add("SET", checks.idempotency_key, PENDING, "NX", "EX", min(PENDING_TTL, settings.IDEMPOTENCY_TTL))
+        stored = batch.add("GET", checks.idempotency_key)
+    if metered:
+        usage, member = meter.add_command(batch, username, tier, amount)
+    if cache_key:
+        checks.result_key = result_key(operation, cache_key)
+        cached = batch.add("GET", checks.result_key)
+    if not batch:
+        return checks
+
+    try:
+        replies = await redis_pool.execute(batch)
+    except Exception as e:
+        # Whether the key was claimed is unknown, so it is left to expire
+        logger.warning(f"Redis preflight failed: {e}. Using the per-process quota only.")
+        checks.result_key = checks.idempotency_key = None
+        if metered:
+            checks.usage = meter.run_local(username, tier, amount)
+            if not checks.usage.allowed:
+                raise limit_exceeded(checks.usage, is_premium)
+        return checks
+
+    if usage is not None:
+        checks.usage = meter.parse(replies[usage], tier)
+    if claim is not None and not replies[claim]:
+        # Someone else holds the key: don't charge this request for it
+        if checks.usage is not None and checks.usage.allowed:
+            undo = Batch()
+            meter.add_refund(undo, username, member, amount)
+            try:
+                await redis_pool.execute(undo)
+            except Exception as e:
+                logger.warning(f"Failed to refund usage for a replayed request: {e}")
+        if replies[stored] in (None, PENDING):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still in progress"
+            )
+        checks.replay = json.loads(replies[stored])
+        return checks
+    if checks.usage is not None and not checks.usage.allowed:
+        if checks.idempotency_key:
+            await release(checks)
+        raise limit_exceeded(checks.usage, is_premium)
+    if cached is not None and replies[cached] is not None:
+        checks.cached = json.loads(replies[cached])
+    return checks
+
+async def postflight(checks: Preflight, response: Dict[str, Any], result: Optional[Dict[str, Any]] = None):
+    """
+    Store the response under the request's idempotency key and a freshly
+    computed result in the shared cache, in one pipeline (meant to run as a
+    background task after the response is sent).
+    """
+    batch = Batch()
+    if checks.idempotency_key:
+        batch.add("SET", checks.idempotency_key, json.dumps(response), "EX", settings.IDEMPOTENCY_TTL)
+    if result is not None and checks.result_key:
+        batch.add("SET", checks.result_key, json.dumps(result), "EX", settings.RESULT_CACHE_TTL)
+    if not batch:
+        return
+    try:
+        await redis_pool.execute(batch)
+    except Exception as e:
+        logger.warning(f"Failed to store response in Redis: {e}")
+
+async def release(checks: Preflight):
+    """Drop the request's idempotency claim (after a failure) so it can be retried."""
+    if not checks.idempotency_key:
+        return
+    batch = Batch()
+    batch.add("DEL", checks.idempotency_key)
+    try:
+        await redis_pool.execute(batch)
+    except Exception as e:
+        logger.warning(f"Failed to release idempotency key: {e}")
@@ -0,0 +1,240 @@
+from collections import Counter
+from typing import Optional, Dict, Any, List
+import asyncio
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+PROFILE_SUFFIX = ".folded"
+
+class StackSampler(threading.Thread):
+    """
+    Samples the call stack of one thread at a fixed interval.
+
+    Stacks are aggregated in the "folded" format (`outer;inner count`) read by
+    flamegraph.pl, speedscope and most other flame graph tools. When sampling
+    an event loop thread, stacks of other requests running concurrently on
+    that loop are included as well.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True, name="stack-sampler")
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.reverse()
+            self.counts[";".join(stack)] += 1
+
+    def stop(self) -> Counter:
+        self._stopped.set()
+        self.join()
+        return self.counts
+
+class Profiler:
+    """
+    Opt-in sampling profiler for selected routes and Celery tasks.
+
+    The active configuration lives in `config.json` inside the profile
+    directory so that every API worker and Celery worker picks it up; each
+    process stats it at most once per `reload_interval` seconds (and re-reads
+    it only when it changed). While nothing is enabled the per-request cost
+    is a monotonic clock read and a comparison.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, reload_interval: float = 1.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.reload_interval = reload_interval
+        self.config_path = os.path.join(directory, "config.json")
+        self.routes: frozenset = frozenset()
+        self.tasks: frozenset = frozenset()
+        self.sample_rate = 0.0
+        self.interval = 0.005
+        self.expires_at = 0.0
+        self.enabled = False
+        self._mtime: Optional[float] = None
+        self._checked = 0.0
+
+    def configure(self, routes: List[str], tasks: List[str], sample_rate: float, interval: float, duration: float) -> Dict[str, Any]:
+        """Enable profiling for all processes sharing the profile directory."""
+        config = {
+            "routes": sorted(set(routes)),
+            "tasks": sorted(set(tasks)),
+            "sample_rate": sample_rate,
+            "interval": interval,
+            "expires_at": time.time() + duration,
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.config_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(config, f)
+        os.replace(tmp_path, self.config_path)
+        self._apply(config)
+        return config
+
+    def disable(self):
+        try:
+            os.remove(self.config_path)
+        except FileNotFoundError:
+            pass
+        self._apply({})
+
+    def current(self) -> Dict[str, Any]:
+        self.maybe_reload(force=True)
+        return {
+            "enabled": self.enabled,
+            "routes": sorted(self.routes),
+            "tasks": sorted(self.tasks),
+            "sample_rate": self.sample_rate,
+            "interval": self.interval,
+            "expires_at": self.expires_at or None,
+        }
+
+    def _apply(self, config: Dict[str, Any]):
+        self.routes = frozenset(config.get("routes", ()))
+        self.tasks = frozenset(config.get("tasks", ()))
+        self.sample_rate = float(config.get("sample_rate", 0.0))
+        self.interval = float(config.get("interval", 0.005))
+        self.expires_at = float(config.get("expires_at", 0.0))
+        self.enabled = bool(self.routes or self.tasks) and self.sample_rate > 0 and self.expires_at > time.time()
+
+    def maybe_reload(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked < self.reload_interval:
+            return
+        self._checked = now
+        try:
+            mtime = os.stat(self.config_path).st_mtime
+        except FileNotFoundError:
+            if self._mtime is not None or self.enabled:
+                self._mtime = None
+                self._apply({})
+            return
+        if mtime != self._mtime:
+            self._mtime = mtime
+            try:
+                with open(self.config_path) as f:
+                    self._apply(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Invalid profiling config: {e}")
+                self._apply({})
+        elif self.enabled and self.expires_at <= time.time():
+            self.enabled = False
+
+    def should_profile(self, kind: str, name: str) -> bool:
+        self.maybe_reload()
+        if not self.enabled:
+            return False
+        targets = self.routes if kind == "route" else self.tasks
+        return name in targets and random.random() < self.sample_rate
+
+    def start(self, interval: Optional[float] = None) -> StackSampler:
+        sampler = StackSampler(threading.get_ident(), interval or self.interval)
+        sampler.start()
+        return sampler
+
+    def write(self, kind: str, name: str, counts: Counter, duration: float) -> Optional[str]:
+        """Write folded stacks to the profile directory and prune old profiles."""
+        if not counts:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9_-]+", "_", name).strip("_") or "root"
+        filename = f"{kind}-{slug}-{int(time.time() * 1000)}-{os.getpid()}-{int(duration * 1000)}ms{PROFILE_SUFFIX}"
+        path = os.path.join(self.directory, filename)
+        with open(path, "w") as f:
+            for stack, count in counts.most_common():
+                f.write(f"{stack} {count}\n")
+        self._prune()
+        return path
+
+    def _prune(self):
+        """Delete the oldest profiles until the directory is within max_bytes."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(PROFILE_SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(PROFILE_SUFFIX):
+                stat = entry.stat()
+                profiles.append({"name": entry.name, "size": stat.st_size, "created_at": stat.st_mtime})
+        return sorted(profiles, key=lambda p: p["created_at"], reverse=True)
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that samples selected requests.
+
+    A request is profiled when its path is enabled in the profiler config and
+    it falls within the sample rate, or when it carries an `X-Profile` header
+    equal to the configured ADMIN_TOKEN.
+    """
+
+    def __init__(self, app, profiler: Profiler, admin_token: str = ""):
+        self.app = app
+        self.profiler = profiler
+        self.admin_token = admin_token.encode() if admin_token else None
+
+    def _forced(self, scope) -> bool:
+        if self.admin_token is None:
+            return False
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                return hmac.compare_digest(value, self.admin_token)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (
+            self.profiler.should_profile("route", scope["path"]) or self._forced(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        sampler = self.profiler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            counts = sampler.stop()
+            duration = time.perf_counter() - start
+            path = await asyncio.to_thread(self.profiler.write, "route", scope["path"], counts, duration)
+            if path:
+                logger.info(f"Wrote profile for {scope['path']} to {path}")
+
+# Process-wide profiler
+profiler = Profiler(settings.PROFILE_DIR, settings.PROFILE_MAX_BYTES)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Local stand-in provider servers for testing latency-aware routing.
+
+Starts one HTTP server per --server spec on consecutive ports from --port,
+each answering POST /check and POST /rephrase like the simulated provider
+after an injected delay (and failing a share of requests with HTTP 503).
+Prints the PROVIDER_BACKENDS setting that routes to them.
+
+A server spec is LATENCY[:ERROR_RATE[:COST]], e.g. 0.2:0.1 for 200 ms with
+10% errors. --degrade makes the first server this slow after that many
+seconds, to watch traffic move away from it.
+
+With --drive N the servers are exercised in-process instead: N plagiarism
+checks are routed across them (at --concurrency) and then sent to a random
+backend for comparison, and each backend's share and latency are printed.
+
+Example:
+    ./provider_standin.py --port 9100 --server 0.05 0.2 0.5:0.2
+    ./provider_standin.py --server 0.05 0.2 0.5:0.2 --drive 500 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import http.server
+import json
+import logging
+import random
+import statistics
+import threading
+import time
+from typing import List, Dict, Any
+
+from providers import SIMULATED_REPHRASING, simulated_result
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+    degrade_at = None
+    degraded_latency = 0.0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        text = json.loads(self.rfile.read(length) or b"{}").get("text", "")
+
+        latency = self.latency
+        if self.degrade_at is not None and time.monotonic() >= self.degrade_at:
+            latency = self.degraded_latency
+        time.sleep(max(0.0, latency * random.uniform(1 - self.jitter, 1 + self.jitter)))
+
+        if self.path == "/check":
+            body = simulated_result(text)
+        elif self.path == "/rephrase":
+            body = {"rephrased": SIMULATED_REPHRASING}
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if random.random() < self.error_rate:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def parse_spec(spec: str) -> Dict[str, float]:
+    parts = [float(part) for part in spec.split(":")]
+    latency, error_rate, cost = (parts + [0.0, 0.0])[:3]
+    return {"latency": latency, "error_rate": error_rate, "cost": cost}
+
+def start_servers(args) -> List[Dict[str, Any]]:
+    """Start a server thread per spec; returns their PROVIDER_BACKENDS entries."""
+    backends = []
+    for i, spec in enumerate(args.server):
+        options = parse_spec(spec)
+        handler = type(f"Handler{i}", (Handler,), {
+            "latency": options["latency"],
+            "jitter": args.jitter,
+            "error_rate": options["error_rate"],
+        })
+        if i == 0 and args.degrade is not None:
+            handler.degrade_at = time.monotonic() + args.degrade
+            handler.degraded_latency = args.degraded_latency
+        port = args.port + i
+        httpd = http.server.ThreadingHTTPServer(("", port), handler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        url = f"http://localhost:{port}"
+        for kind in ("plagiarism", "rephrase"):
+            backends.append({
+                "name": f"standin-{port}-{kind}",
+                "kind": kind,
+                "type": "http",
+                "url": url,
+                "cost": options["cost"],
+                "max_concurrency": args.max_concurrency,
+            })
+        print(f"Stand-in provider at {url} ({options['latency'] * 1000:.0f} ms, "
+              f"{options['error_rate']:.0%} errors, cost {options['cost']:g})")
+    return backends
+
+async def drive(specs: List[Dict[str, Any]], requests: int, concurrency: int) -> Dict[str, Any]:
+    """Route `requests` checks across the stand-ins, then pick backends at random, for comparison."""
+    from providers import Backend, ProviderRouter, ProviderUnavailable
+    from subsystems import subsystems
+
+    # Failovers and benching show up in the per-backend table
+    logging.getLogger("providers").setLevel(logging.ERROR)
+    backends = [Backend(**spec) for spec in specs if spec["kind"] == "plagiarism"]
+    router = ProviderRouter("plagiarism", backends)
+    semaphore = asyncio.Semaphore(concurrency)
+    results: Dict[str, Any] = {}
+
+    async def routed(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await router.call(f"Stand-in check number {i}", cost_limit=float("inf"))
+            except ProviderUnavailable:
+                return None
+            return time.perf_counter() - start
+
+    async def uniform(i: int):
+        async with semaphore:
+            backend = random.choice(backends)
+            start = time.perf_counter()
+            try:
+                await backend.call(f"Stand-in check number {i}")
+            except Exception:
+                return None
+            return time.perf_counter() - start
+
+    for mode, run in (("routed", routed), ("random", uniform)):
+        latencies = await asyncio.gather(*(run(i) for i in range(requests)))
+        ok = sorted(latency for latency in latencies if latency is not None)
+        results[mode] = {
+            "ok": len(ok),
+            "failed": requests - len(ok),
+            "mean_ms": statistics.mean(ok) * 1000 if ok else None,
+            "p95_ms": ok[int(len(ok) * 0.95) - 1] * 1000 if ok else None,
+        }
+    results["backends"] = router.stats()
+    await subsystems.get("http_client").aclose()
+    return results
+
+def main():
+    """Run the stand-in provider servers."""
+    parser = argparse.ArgumentParser(description="Serve stand-in providers with injected latency")
+    parser.add_argument("--port", type=int, default=9100, help="Port of the first server")
+    parser.add_argument("--server", nargs="+", default=["0.05", "0.2", "0.5"],
+                        help="One LATENCY[:ERROR_RATE[:COST]] spec per server")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Latency varies by up to this fraction")
+    parser.add_argument("--max-concurrency", type=int, default=10, help="max_concurrency of each backend")
+    parser.add_argument("--degrade", type=float, help="Slow the first server down after this many seconds")
+    parser.add_argument("--degraded-latency", type=float, default=1.0, help="Latency of the first server once degraded")
+    parser.add_argument("--drive", type=int, metavar="N", help="Route N checks across the servers and report")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent checks with --drive")
+
+    args = parser.parse_args()
+
+    backends = start_servers(args)
+
+    if args.drive:
+        results = asyncio.run(drive(backends, args.drive, args.concurrency))
+        print(f"\n{'mode':<8} {'ok':>6} {'failed':>7} {'mean ms':>9} {'p95 ms':>9}")
+        for mode in ("routed", "random"):
+            r = results[mode]
+            mean = f"{r['mean_ms']:.1f}" if r["mean_ms"] is not None else "-"
+            p95 = f"{r['p95_ms']:.1f}" if r["p95_ms"] is not None else "-"
+            print(f"{mode:<8} {r['ok']:>6} {r['failed']:>7} {mean:>9} {p95:>9}")
+        print(f"\n{'backend':<28} {'calls':>6} {'share':>6} {'latency ms':>11} {'errors':>7} {'healthy':>8}")
+        total = sum(b["calls"] for b in results["backends"]) or 1
+        for b in results["backends"]:
+            latency = f"{b['latency_ms']:.1f}" if b["latency_ms"] is not None else "-"
+            print(f"{b['name']:<28} {b['calls']:>6} {b['calls'] / total:>6.0%} {latency:>11} "
+                  f"{b['error_rate']:>7.0%} {str(b['healthy']):>8}")
+        return
+
+    print(f"\nPROVIDER_BACKENDS='{json.dumps(backends)}'")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\nStand-ins stopped.")
+
+if __name__ == "__main__":
+    main()
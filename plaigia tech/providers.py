@@ -0,0 +1,406 @@
+from typing import Optional, Dict, Any, List, Set
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import httpx
+from pydantic import BaseModel
+from config import settings
+from metrics import observe_upstream
+from subsystems import subsystems
+from tracing import tracer
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+KINDS = ("plagiarism", "rephrase")
+
+# Backend types and what they talk to:
+#   mock       simulated provider (sleeps, then returns a fixed result)
+#   http       local engine or stand-in server: POST {url}/check or {url}/rephrase
+#              with {"text": ...}, answering like the mock (see provider_standin.py)
+#   copyleaks  Copyleaks plagiarism API
+#   openai     OpenAI chat completions (rephrasing)
+TYPES = ("mock", "http", "copyleaks", "openai")
+
+SIMULATED_REPHRASING = "The swift brown fox leaps over the idle dog."
+
+class ProviderUnavailable(Exception):
+    """No backend within the request's cost limit could serve it."""
+
+class ProviderResult(BaseModel):
+    """A plagiarism backend's answer (routes.plagiarism.PlagiarismResult adds local findings)."""
+    percentage: float
+    sources: List[str]
+
+def simulated_result(text: str) -> Dict[str, Any]:
+    """Stand-in provider result until the Copyleaks integration is configured."""
+    return {
+        "percentage": 10.5,
+        "sources": [
+            "https://example.com/source1",
+            "https://example.com/source2"
+        ]
+    }
+
+def max_cost(is_premium: bool) -> float:
+    """Most a request may cost, by tier (premium requests may use pricier backends)."""
+    return settings.PROVIDER_MAX_COST_PREMIUM if is_premium else settings.PROVIDER_MAX_COST_FREE
+
+class Backend:
+    """
+    One provider account or engine, with its cost per request, concurrency
+    limit and the latency/error averages routing decisions are based on.
+
+    Latency is an EWMA over successful calls; the error rate is an EWMA of
+    0 (success) or 1 (failure) over all calls. A backend whose error rate
+    passes PROVIDER_ERROR_THRESHOLD is benched for PROVIDER_COOLDOWN seconds.
+    State is guarded by the owning router's lock.
+    """
+
+    def __init__(self, name: str, kind: str, type: str, url: Optional[str] = None,
+                 api_key: Optional[str] = None, cost: float = 0.0, max_concurrency: int = 10,
+                 timeout: float = 30.0, latency: Optional[float] = None, model: Optional[str] = None):
+        if kind not in KINDS:
+            raise ValueError(f"Provider backend {name!r}: kind must be one of {', '.join(KINDS)}")
+        if type not in TYPES:
+            raise ValueError(f"Provider backend {name!r}: type must be one of {', '.join(TYPES)}")
+        if type == "http" and not url:
+            raise ValueError(f"Provider backend {name!r}: http backends need a url")
+        self.name = name
+        self.kind = kind
+        self.type = type
+        self.url = url.rstrip("/") if url else url
+        self.api_key = api_key
+        self.cost = cost
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.simulated_latency = latency
+        self.model = model or "gpt-3.5-turbo"
+        self.latency: Optional[float] = None
+        self.errors = 0.0
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.last_used = 0.0
+        self.benched_until = 0.0
+        self.last_error: Optional[str] = None
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.benched_until
+
+    def score(self, now: float) -> float:
+        """
+        Expected latency of the next call: the latency average, inflated by
+        the error rate (a failed call costs a retry) and by current load. A
+        backend not measured recently scores 0, so it gets the next request
+        and its average is refreshed.
+        """
+        if self.latency is None or now - self.last_used > settings.PROVIDER_PROBE_INTERVAL:
+            return 0.0
+        return self.latency / max(0.05, 1.0 - self.errors) * (1.0 + self.in_flight / self.max_concurrency)
+
+    def record(self, elapsed: float, ok: bool, now: float, error: Optional[str] = None):
+        alpha = settings.PROVIDER_EWMA_ALPHA
+        self.calls += 1
+        if ok:
+            self.latency = elapsed if self.latency is None else alpha * elapsed + (1 - alpha) * self.latency
+        else:
+            self.failures += 1
+            self.last_error = error
+        self.errors = alpha * (0.0 if ok else 1.0) + (1 - alpha) * self.errors
+        if not ok and self.errors > settings.PROVIDER_ERROR_THRESHOLD and self.healthy(now):
+            self.benched_until = now + settings.PROVIDER_COOLDOWN
+            logger.warning(f"Provider backend {self.name} benched for {settings.PROVIDER_COOLDOWN:g}s "
+                           f"(error rate {self.errors:.0%}, last error: {error})")
+
+    def _mock_latency(self) -> float:
+        return settings.MOCK_PROVIDER_LATENCY if self.simulated_latency is None else self.simulated_latency
+
+    def _request(self, text: str) -> Dict[str, Any]:
+        """URL, headers and JSON body of the provider call."""
+        if self.type == "http":
+            path = "check" if self.kind == "plagiarism" else "rephrase"
+            return {"url": f"{self.url}/{path}", "headers": {}, "json": {"text": text}}
+        if self.type == "copyleaks":
+            return {
+                "url": self.url or "https://api.copyleaks.com/v3/plagiarism/check",
+                "headers": {"Authorization": f"Bearer {self.api_key}"},
+                "json": {"text": text},
+            }
+        return {
+            "url": self.url or "https://api.openai.com/v1/chat/completions",
+            "headers": {"Authorization": f"Bearer {self.api_key}"},
+            "json": {
+                "model": self.model,
+                "messages": [
+                    {"role": "system", "content": "You are a helpful assistant that rephrases text."},
+                    {"role": "user", "content": f"Rephrase the following text while preserving its meaning: {text}"}
+                ],
+                "temperature": 0.7,
+                "max_tokens": 1000
+            },
+        }
+
+    def _parse(self, response: httpx.Response) -> Any:
+        response.raise_for_status()
+        body = response.json()
+        if self.kind == "plagiarism":
+            # Responses skip re-validation (see responses.fast_response), so a
+            # malformed answer is rejected here and fails over to the next backend
+            return ProviderResult.model_validate(body).model_dump()
+        if self.type == "openai":
+            return body["choices"][0]["message"]["content"].strip()
+        return body["rephrased"]
+
+    def _simulated(self, text: str) -> Any:
+        return simulated_result(text) if self.kind == "plagiarism" else SIMULATED_REPHRASING
+
+    async def call(self, text: str) -> Any:
+        if self.type == "mock":
+            await asyncio.sleep(self._mock_latency())
+            return self._simulated(text)
+        request = self._request(text)
+        client = subsystems.get("http_client")
+        response = await client.post(
+            request["url"], headers=tracer.inject(request["headers"]), json=request["json"], timeout=self.timeout
+        )
+        return self._parse(response)
+
+    def call_sync(self, text: str) -> Any:
+        if self.type == "mock":
+            time.sleep(self._mock_latency())
+            return self._simulated(text)
+        request = self._request(text)
+        response = sync_client().post(
+            request["url"], headers=tracer.inject(request["headers"]), json=request["json"], timeout=self.timeout
+        )
+        return self._parse(response)
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "type": self.type,
+            "cost": self.cost,
+            "healthy": self.healthy(now),
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error_rate": round(self.errors, 3),
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "calls": self.calls,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+class ProviderRouter:
+    """
+    Sends each call to the backend with the lowest expected latency among
+    the healthy ones within the request's cost limit, and a free
+    concurrency slot. When every eligible backend is at its limit, the call
+    waits (up to PROVIDER_QUEUE_TIMEOUT) for the first free slot. A failed
+    call is retried on the next best backend, up to PROVIDER_MAX_ATTEMPTS
+    backends. When every backend within the cost limit is benched, the
+    benched ones are tried anyway rather than failing outright.
+
+    Usable from the event loop (`call`) and from worker threads such as
+    Celery tasks (`call_sync`); both share the same averages and limits.
+    """
+
+    def __init__(self, kind: str, backends: List[Backend]):
+        self.kind = kind
+        self.backends = backends
+        self._lock = threading.Lock()
+        self._slots = threading.Condition(self._lock)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._freed: Optional[asyncio.Event] = None
+
+    def _candidates(self, cost_limit: Optional[float], exclude: Set[str], now: float) -> List[Backend]:
+        limit = settings.PROVIDER_MAX_COST_FREE if cost_limit is None else cost_limit
+        affordable = [b for b in self.backends if b.cost <= limit and b.name not in exclude]
+        eligible = [b for b in affordable if b.healthy(now)] or affordable
+        return sorted(eligible, key=lambda b: (b.score(now), b.latency or 0.0, b.cost))
+
+    def _try_acquire(self, cost_limit: Optional[float], exclude: Set[str]) -> Optional[Backend]:
+        """Take a slot on the best backend with one free; raises when there are no candidates at all."""
+        now = time.monotonic()
+        candidates = self._candidates(cost_limit, exclude, now)
+        if not candidates:
+            raise ProviderUnavailable(f"No {self.kind} backend within a cost of {cost_limit}")
+        for backend in candidates:
+            if backend.in_flight < backend.max_concurrency:
+                backend.in_flight += 1
+                backend.last_used = now
+                return backend
+        return None
+
+    def _freed_event(self) -> asyncio.Event:
+        # Created on the running loop (asyncio primitives bind to one on Python 3.9)
+        loop = asyncio.get_running_loop()
+        if self._freed is None or self._loop is not loop:
+            self._loop = loop
+            self._freed = asyncio.Event()
+        return self._freed
+
+    def _wake_async(self):
+        # Runs on the event loop: wake every waiter, then start a fresh event
+        if self._freed is not None:
+            self._freed.set()
+            self._freed = asyncio.Event()
+
+    def _release(self, backend: Backend, elapsed: float, ok: Optional[bool], error: Optional[str] = None):
+        """Free the slot; `ok` None (cancelled call) leaves the averages alone."""
+        with self._lock:
+            backend.in_flight -= 1
+            if ok is not None:
+                backend.record(elapsed, ok, time.monotonic(), error)
+            self._slots.notify_all()
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wake_async)
+
+    async def _acquire(self, cost_limit: Optional[float], exclude: Set[str]) -> Backend:
+        deadline = time.monotonic() + settings.PROVIDER_QUEUE_TIMEOUT
+        while True:
+            freed = self._freed_event()
+            with self._lock:
+                backend = self._try_acquire(cost_limit, exclude)
+            if backend is not None:
+                return backend
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ProviderUnavailable(f"All {self.kind} backends are at their concurrency limit")
+            try:
+                await asyncio.wait_for(freed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    def _acquire_sync(self, cost_limit: Optional[float], exclude: Set[str]) -> Backend:
+        deadline = time.monotonic() + settings.PROVIDER_QUEUE_TIMEOUT
+        with self._slots:
+            while True:
+                backend = self._try_acquire(cost_limit, exclude)
+                if backend is not None:
+                    return backend
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._slots.wait(remaining):
+                    raise ProviderUnavailable(f"All {self.kind} backends are at their concurrency limit")
+
+    async def call(self, text: str, cost_limit: Optional[float] = None) -> Any:
+        """Run the call on the best backend, failing over to the next on errors."""
+        tried: Set[str] = set()
+        error: Optional[Exception] = None
+        while len(tried) < settings.PROVIDER_MAX_ATTEMPTS:
+            try:
+                backend = await self._acquire(cost_limit, tried)
+            except ProviderUnavailable:
+                if error is None:
+                    raise
+                break
+            tried.add(backend.name)
+            start = time.perf_counter()
+            try:
+                with observe_upstream(backend.name), tracer.span("upstream.call", provider=backend.name):
+                    result = await backend.call(text)
+            except asyncio.CancelledError:
+                self._release(backend, 0.0, None)
+                raise
+            except Exception as e:
+                self._release(backend, time.perf_counter() - start, False, str(e))
+                logger.warning(f"Provider backend {backend.name} failed: {e}")
+                error = e
+                continue
+            self._release(backend, time.perf_counter() - start, True)
+            return result
+        raise ProviderUnavailable(f"All {self.kind} backends tried failed; last error: {error}") from error
+
+    def call_sync(self, text: str, cost_limit: Optional[float] = None) -> Any:
+        """Blocking variant of call for worker threads."""
+        tried: Set[str] = set()
+        error: Optional[Exception] = None
+        while len(tried) < settings.PROVIDER_MAX_ATTEMPTS:
+            try:
+                backend = self._acquire_sync(cost_limit, tried)
+            except ProviderUnavailable:
+                if error is None:
+                    raise
+                break
+            tried.add(backend.name)
+            start = time.perf_counter()
+            try:
+                with observe_upstream(backend.name), tracer.span("upstream.call", provider=backend.name):
+                    result = backend.call_sync(text)
+            except Exception as e:
+                self._release(backend, time.perf_counter() - start, False, str(e))
+                logger.warning(f"Provider backend {backend.name} failed: {e}")
+                error = e
+                continue
+            self._release(backend, time.perf_counter() - start, True)
+            return result
+        raise ProviderUnavailable(f"All {self.kind} backends tried failed; last error: {error}") from error
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [backend.stats(now) for backend in self.backends]
+
+_sync_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+
+def sync_client() -> httpx.Client:
+    """Pooled blocking HTTP client for provider calls from worker threads."""
+    global _sync_client
+    if _sync_client is None:
+        with _client_lock:
+            if _sync_client is None:
+                _sync_client = httpx.Client(timeout=30.0)
+    return _sync_client
+
+def default_backends() -> List[Dict[str, Any]]:
+    """The configured API keys, or simulated providers where there is none."""
+    specs = []
+    if settings.COPYLEAKS_API_KEY:
+        specs.append({"name": "copyleaks", "kind": "plagiarism", "type": "copyleaks",
+                      "api_key": settings.COPYLEAKS_API_KEY, "cost": 1.0})
+    else:
+        specs.append({"name": "mock-plagiarism", "kind": "plagiarism", "type": "mock"})
+    if settings.OPENAI_API_KEY:
+        specs.append({"name": "openai", "kind": "rephrase", "type": "openai",
+                      "api_key": settings.OPENAI_API_KEY, "cost": 1.0})
+    else:
+        specs.append({"name": "mock-rephrase", "kind": "rephrase", "type": "mock"})
+    return specs
+
+def load_backends(config: str) -> List[Backend]:
+    """
+    Backends from PROVIDER_BACKENDS: a JSON list of objects (or the path of
+    a JSON file holding one) with name, kind, type and optionally url,
+    api_key_env (environment variable holding the key), cost,
+    max_concurrency, timeout, latency (mock only) and model (openai only).
+    """
+    config = config.strip()
+    if not config:
+        specs = default_backends()
+    else:
+        if not config.startswith("["):
+            with open(config) as f:
+                config = f.read()
+        specs = json.loads(config)
+    backends = []
+    for spec in specs:
+        spec = dict(spec)
+        key_env = spec.pop("api_key_env", None)
+        if key_env:
+            spec["api_key"] = os.getenv(key_env, "")
+        backends.append(Backend(**spec))
+    names = [backend.name for backend in backends]
+    if len(set(names)) != len(names):
+        raise ValueError("Provider backend names must be unique")
+    return backends
+
+_backends = load_backends(settings.PROVIDER_BACKENDS)
+
+# Process-wide routers, one per kind of provider
+plagiarism = ProviderRouter("plagiarism", [b for b in _backends if b.kind == "plagiarism"])
+rephrasing = ProviderRouter("rephrase", [b for b in _backends if b.kind == "rephrase"])
@@ -0,0 +1,206 @@
+from fastapi import HTTPException, Request, status
+from typing import Optional, Dict, List, Tuple, Deque
+from collections import deque
+import asyncio
+import logging
+import os
+import time
+from config import settings
+from auth import fake_users_db, get_bearer_token, get_username_from_token
+from metering import METER_SCRIPT, parse_rate, tier_for
+from redis_pool import Batch
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class LocalWindow:
+    """
+    Sliding-window request count for one client, as seen by this process.
+
+    `events` holds the times of requests admitted here within the window,
+    `pending` how many of them have not been reported to Redis yet, and
+    `remote` how many requests other processes had admitted within the
+    window at the last reconciliation (all expired by `remote_until`).
+    """
+
+    __slots__ = ("limit", "window", "events", "pending", "remote", "reset_at", "remote_until")
+
+    def __init__(self, limit: int, window: int):
+        self.limit = limit
+        self.window = window
+        self.events: Deque[float] = deque()
+        self.pending = 0
+        self.remote = 0
+        self.reset_at = 0.0
+        self.remote_until = 0.0
+
+    def expire(self, now: float):
+        cutoff = now - self.window
+        while self.events and self.events[0] <= cutoff:
+            self.events.popleft()
+        # Unreported requests are the newest; any beyond the window no longer count
+        self.pending = min(self.pending, len(self.events))
+        if self.remote and now >= self.remote_until:
+            self.remote = 0
+
+    def idle(self) -> bool:
+        return not (self.events or self.remote)
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.expire(now)
+        if len(self.events) + self.remote >= self.limit:
+            return False
+        self.events.append(now)
+        self.pending += 1
+        return True
+
+    def retry_after(self) -> float:
+        """Seconds until the oldest request in the window (here or elsewhere) expires."""
+        now = time.monotonic()
+        expiries = [self.reset_at] if self.reset_at > now else []
+        if self.events:
+            expiries.append(self.events[0] + self.window)
+        return max(0.0, min(expiries) - now) if expiries else 0.0
+
+    def reconcile(self, used: int, reset_in: float):
+        """Apply the cluster-wide count for the window, which includes the events reported from here."""
+        now = time.monotonic()
+        self.expire(now)
+        self.remote = max(0, used - (len(self.events) - self.pending))
+        self.reset_at = now + reset_in
+        self.remote_until = now + self.window
+
+class HybridRateLimiter:
+    """
+    Rate limiter that answers every request from in-process sliding windows
+    and reconciles them with Redis in the background.
+
+    Redis keeps the same sliding window per client as usage metering (the
+    metering Lua script, run with no limit). Every `sync_interval` seconds
+    the requests admitted locally are recorded there with one pipelined
+    round trip, and each local window learns how many requests the other
+    processes admitted, which count against its limit until they expire. A
+    shorter interval gives tighter global accuracy at the cost of more Redis
+    traffic; request latency is unaffected either way. While Redis is
+    unavailable, sync is skipped, the windows keep enforcing limits locally
+    and the unreported usage still within its window is sent once it is
+    back. Idle windows are dropped on every sync, reachable or not.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, str],
+        sync_interval: float = 1.0,
+        batch_size: int = 500,
+        key_prefix: str = "ratelimit",
+    ):
+        self.limits: Dict[str, Tuple[int, int]] = {}
+        for tier, rate in limits.items():
+            limit, window = parse_rate(rate)
+            if limit is not None:
+                self.limits[tier] = (limit, window)
+        self.sync_interval = sync_interval
+        self.batch_size = batch_size
+        self.key_prefix = key_prefix
+        self.pool = None
+        self._sha: Optional[str] = None
+        self._windows: Dict[Tuple[str, str], LocalWindow] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _identify(self, request: Request) -> Tuple[str, str]:
+        """Return (client key, tier) for the request."""
+        username = get_username_from_token(get_bearer_token(request.headers.get("authorization")))
+        if username:
+            user_dict = fake_users_db.get(username, {})
+            return f"user:{username}", tier_for(user_dict.get("is_premium", False))
+        host = request.client.host if request.client else "unknown"
+        return f"ip:{host}", "free"
+
+    async def __call__(self, request: Request):
+        client, tier = self._identify(request)
+        if tier not in self.limits:
+            return
+        window = self._windows.get((client, tier))
+        if window is None:
+            window = self._windows[(client, tier)] = LocalWindow(*self.limits[tier])
+        if not window.take():
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers={"Retry-After": str(int(window.retry_after()) + 1)},
+            )
+
+    def _redis_key(self, client: str, tier: str) -> str:
+        return f"{self.key_prefix}:{tier}:{client}"
+
+    async def sync(self):
+        """Record locally admitted requests in Redis and learn the other processes' usage."""
+        now = time.monotonic()
+        # Prune before the availability check, so windows don't pile up during an outage
+        for key, window in list(self._windows.items()):
+            window.expire(now)
+            if window.idle():
+                del self._windows[key]
+        if self.pool is None or not self.pool.available:
+            return
+
+        dirty: List[Tuple[Tuple[str, str], LocalWindow, int]] = []
+        for key, window in self._windows.items():
+            if window.pending or window.remote:
+                # Windows held back by other processes are refreshed until that usage expires
+                dirty.append((key, window, window.pending))
+                window.pending = 0
+
+        for start in range(0, len(dirty), self.batch_size):
+            chunk = dirty[start:start + self.batch_size]
+            batch = Batch()
+            for (client, tier), window, consumed in chunk:
+                batch.add(
+                    "EVALSHA", self._sha, 1, self._redis_key(client, tier),
+                    window.window * 1000, -1, os.urandom(8).hex(), consumed,
+                )
+            try:
+                replies = await self.pool.execute(batch)
+            except Exception as e:
+                # Keep the usage so it is reported once Redis is back
+                for _, window, consumed in chunk:
+                    window.pending += consumed
+                logger.warning(f"Rate limit sync with Redis failed: {e}")
+                continue
+            for (_, window, _), (_, used, reset_ms) in zip(chunk, replies):
+                window.reconcile(int(used), max(0, int(reset_ms)) / 1000)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Rate limit sync failed: {e}", exc_info=True)
+
+    def start(self, pool):
+        """Attach the Redis pool and start background reconciliation."""
+        self.pool = pool
+        self._sha = pool.register_script(METER_SCRIPT)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop reconciliation, flushing outstanding usage to Redis."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        try:
+            await self.sync()
+        except Exception as e:
+            logger.warning(f"Final rate limit sync failed: {e}")
+
+# Shared limiter for API routes
+rate_limiter = HybridRateLimiter(
+    limits={
+        "free": settings.RATE_LIMIT_DEFAULT,
+        "premium": settings.RATE_LIMIT_PREMIUM,
+    },
+    sync_interval=settings.RATE_LIMIT_SYNC_INTERVAL,
+)
@@ -0,0 +1,209 @@
+from typing import Optional, Dict, Any, List, Tuple
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+import time
+import redis
+import redis.asyncio as redis_async
+from redis.asyncio.retry import Retry as AsyncRetry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError, NoScriptError, TimeoutError
+from redis.retry import Retry
+from config import settings
+from metrics import record_redis_round_trip
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class _CountsRoundTrips:
+    """Connection mixin: every packet sent (one command, or a whole pipeline) is one round trip."""
+
+    def send_packed_command(self, command, check_health=True):
+        record_redis_round_trip()
+        return super().send_packed_command(command, check_health)
+
+def _counting(connection_class):
+    return type(connection_class.__name__, (_CountsRoundTrips, connection_class), {})
+
+class Batch:
+    """Redis commands sent together; RedisPool.execute returns their replies in order."""
+
+    def __init__(self):
+        self.commands: List[Tuple[tuple, Dict[str, Any]]] = []
+
+    def __len__(self) -> int:
+        return len(self.commands)
+
+    def add(self, *args, **options) -> int:
+        """Queue a command (e.g. "GET", key); returns the index of its reply."""
+        self.commands.append((args, options))
+        return len(self.commands) - 1
+
+class RedisPool:
+    """
+    The process's Redis access layer, shared by rate limiting, metering,
+    admission control, caches and idempotency keys.
+
+    One bounded connection pool (requests wait up to `pool_timeout` for a
+    free connection rather than opening more), commands retried with
+    exponential backoff on connection errors, and a monitor that pings Redis
+    every `health_check_interval` seconds. While Redis is down the monitor
+    reconnects with exponential backoff and jitter, `available` is False, and
+    callers use their in-process fallbacks instead of waiting on timeouts.
+    Lua scripts registered here are (re)loaded whenever Redis comes back.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        max_connections: int = 50,
+        pool_timeout: float = 1.0,
+        socket_timeout: float = 1.0,
+        health_check_interval: float = 15.0,
+        retry_base: float = 0.1,
+        retry_max: float = 10.0,
+    ):
+        self.url = url
+        self.max_connections = max_connections
+        self.pool_timeout = pool_timeout
+        self.socket_timeout = socket_timeout
+        self.health_check_interval = health_check_interval
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.available = False
+        self.latency: Optional[float] = None
+        self.client: Optional[redis_async.Redis] = None
+        self._scripts: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._sync_client: Optional[redis.Redis] = None
+        self._lock = threading.Lock()
+
+    def _pool_options(self, retry) -> Dict[str, Any]:
+        # Retries are configured per connection; a client given a pool ignores its own
+        return {
+            "max_connections": self.max_connections,
+            "timeout": self.pool_timeout,
+            "socket_timeout": self.socket_timeout,
+            "socket_connect_timeout": self.socket_timeout,
+            "health_check_interval": self.health_check_interval,
+            "decode_responses": True,
+            "retry": retry(ExponentialBackoff(cap=self.retry_max, base=self.retry_base), 2),
+            "retry_on_error": [ConnectionError, TimeoutError],
+        }
+
+    def register_script(self, source: str) -> str:
+        """Register a Lua script for EVALSHA; returns its SHA1."""
+        sha = hashlib.sha1(source.encode("utf-8")).hexdigest()
+        self._scripts[sha] = source
+        return sha
+
+    async def start(self):
+        """Create the pool, try to connect once, and start the health monitor."""
+        if self.client is None:
+            pool = redis_async.BlockingConnectionPool.from_url(self.url, **self._pool_options(AsyncRetry))
+            pool.connection_class = _counting(pool.connection_class)
+            self.client = redis_async.Redis(connection_pool=pool)
+        await self.check()
+        if self._task is None:
+            self._task = asyncio.create_task(self._monitor())
+
+    async def check(self) -> bool:
+        """Ping Redis, (re)loading scripts after an outage; updates `available`."""
+        try:
+            start = time.perf_counter()
+            await self.client.ping()
+            self.latency = time.perf_counter() - start
+            if not self.available:
+                for source in self._scripts.values():
+                    await self.client.script_load(source)
+                logger.info(f"Connected to Redis ({self.latency * 1000:.1f} ms round trip)")
+            self.available = True
+        except (redis.RedisError, OSError) as e:
+            if self.available or self.latency is None:
+                logger.warning(f"Redis unavailable: {e}. Falling back to per-process state.")
+            self.available = False
+            self.latency = None
+        return self.available
+
+    async def _monitor(self):
+        failures = 0
+        while True:
+            if self.available:
+                failures = 0
+                delay = self.health_check_interval
+            else:
+                failures += 1
+                delay = min(self.retry_max, self.retry_base * 2 ** failures) * random.uniform(0.5, 1.0)
+            await asyncio.sleep(delay)
+            await self.check()
+
+    async def execute(self, batch: Batch) -> List[Any]:
+        """
+        Run a batch of commands in one round trip (a non-transactional
+        pipeline), or one command at a time with REDIS_PIPELINE disabled.
+        A script evicted from Redis (NOSCRIPT) is loaded and its command rerun.
+        """
+        if settings.REDIS_PIPELINE and len(batch) > 1:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for args, options in batch.commands:
+                    pipe.execute_command(*args, **options)
+                replies = await pipe.execute(raise_on_error=False)
+        else:
+            replies = []
+            for args, options in batch.commands:
+                try:
+                    replies.append(await self.client.execute_command(*args, **options))
+                except NoScriptError as e:
+                    replies.append(e)
+        for i, reply in enumerate(replies):
+            if isinstance(reply, NoScriptError):
+                args, options = batch.commands[i]
+                await self.client.script_load(self._scripts[args[1]])
+                replies[i] = await self.client.execute_command(*args, **options)
+            elif isinstance(reply, Exception):
+                raise reply
+        return replies
+
+    def sync_client(self) -> redis.Redis:
+        """Blocking client on its own pool of the same size (Celery tasks and other threads)."""
+        if self._sync_client is None:
+            with self._lock:
+                if self._sync_client is None:
+                    pool = redis.BlockingConnectionPool.from_url(self.url, **self._pool_options(Retry))
+                    pool.connection_class = _counting(pool.connection_class)
+                    self._sync_client = redis.Redis(connection_pool=pool)
+        return self._sync_client
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "latency_ms": round(self.latency * 1000, 2) if self.latency is not None else None,
+            "max_connections": self.max_connections,
+            "pipeline": settings.REDIS_PIPELINE,
+            "scripts": len(self._scripts),
+        }
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.client is not None:
+            await self.client.aclose() if hasattr(self.client, "aclose") else await self.client.close()
+            self.client = None
+        self.available = False
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+# Process-wide Redis access layer, started by the API at startup
+redis_pool = RedisPool(
+    settings.REDIS_URL,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    pool_timeout=settings.REDIS_POOL_TIMEOUT,
+    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+    retry_base=settings.REDIS_RETRY_BASE,
+    retry_max=settings.REDIS_RETRY_MAX,
+)
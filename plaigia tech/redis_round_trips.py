@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Measure Redis round trips per API request.
+
+Drives the app in-process (ASGI transport, simulated providers) against the
+Redis server at --redis-url and reads the per-request round-trip histogram
+(plagiatech_redis_round_trips) from /metrics. Each scenario runs twice: with
+each request's commands sent as one pipeline (REDIS_PIPELINE, the default)
+and one command at a time, to show what pipelining saves.
+
+Scenarios:
+    check     new texts (quota, result cache miss, result stored)
+    cached    texts checked before (served from the shared result cache)
+    retry     repeated Idempotency-Key (stored response replayed)
+    async     queued checks (quota and Idempotency-Key only)
+
+Example:
+    ./redis_round_trips.py --redis-url redis://localhost:6379/0 --requests 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import uuid
+from typing import Dict, Tuple, Any
+
+import httpx
+
+SCENARIOS = ["check", "cached", "retry", "async"]
+
+ROUTES = {
+    "check": "/api/check-plagiarism",
+    "cached": "/api/check-plagiarism",
+    "retry": "/api/check-plagiarism",
+    "async": "/api/check-plagiarism/async",
+}
+
+def round_trip_totals(text: str, route: str) -> Tuple[float, float]:
+    """(sum, count) of the round-trip histogram for one POST route in a /metrics page."""
+    from prometheus_client.parser import text_string_to_metric_families
+    total = count = 0.0
+    for family in text_string_to_metric_families(text):
+        if family.name != "plagiatech_redis_round_trips":
+            continue
+        for sample in family.samples:
+            if sample.labels.get("route") != route or sample.labels.get("method") != "POST":
+                continue
+            if sample.name.endswith("_sum"):
+                total += sample.value
+            elif sample.name.endswith("_count"):
+                count += sample.value
+    return total, count
+
+async def scenario(client: httpx.AsyncClient, name: str, requests: int, headers: Dict[str, str]) -> float:
+    """Run one scenario; returns the mean round trips per request."""
+    seed = uuid.uuid4().hex
+    texts = [f"Round trip measurement {seed} number {i}. " * 8 for i in range(requests)]
+    if name == "cached":
+        # Prime the cache outside the measurement
+        for text in texts:
+            await client.post("/api/check-plagiarism", json={"text": text}, headers=headers)
+    elif name == "retry":
+        keys = [uuid.uuid4().hex for _ in texts]
+        for text, key in zip(texts, keys):
+            await client.post("/api/check-plagiarism", json={"text": text}, headers={**headers, "Idempotency-Key": key})
+
+    route = ROUTES[name]
+    before = round_trip_totals((await client.get("/metrics")).text, route)
+    for i, text in enumerate(texts):
+        if name == "async":
+            response = await client.post("/api/check-plagiarism/async", json={"text": text},
+                                         headers={**headers, "Idempotency-Key": uuid.uuid4().hex})
+        elif name == "retry":
+            response = await client.post("/api/check-plagiarism", json={"text": text},
+                                         headers={**headers, "Idempotency-Key": keys[i]})
+        else:
+            response = await client.post("/api/check-plagiarism", json={"text": text}, headers=headers)
+        response.raise_for_status()
+    after = round_trip_totals((await client.get("/metrics")).text, route)
+    measured = after[1] - before[1]
+    return (after[0] - before[0]) / measured if measured else 0.0
+
+async def run(args) -> Dict[str, Any]:
+    import main
+    from config import settings
+    from load_test import create_users
+
+    results: Dict[str, Any] = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        if not main.redis_pool.available:
+            raise SystemExit(f"Redis is not reachable at {settings.REDIS_URL}")
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver/api") as api:
+            user = (await create_users(api, 1, premium=True))[0]
+        headers = {"Authorization": f"Bearer {user['token']}"}
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            for name in args.scenarios:
+                results[name] = {}
+                for pipelined in (True, False):
+                    settings.REDIS_PIPELINE = pipelined
+                    mode = "pipelined" if pipelined else "sequential"
+                    results[name][mode] = await scenario(client, name, args.requests, headers)
+        settings.REDIS_PIPELINE = True
+    return results
+
+def main():
+    """Run the round-trip measurement."""
+    parser = argparse.ArgumentParser(description="Measure Redis round trips per API request")
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL", "redis://localhost:6379/0"), help="Redis server to use")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario and mode")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS, help="Scenarios to run")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+
+    args = parser.parse_args()
+
+    # Must be set before the app (and its settings) are imported
+    os.environ["REDIS_URL"] = args.redis_url
+    os.environ.setdefault("MOCK_PROVIDER_LATENCY", "0")
+    os.environ.setdefault("CELERY_TASK_ALWAYS_EAGER", "True")
+
+    results = asyncio.run(run(args))
+
+    print(f"\n{'scenario':<10} {'pipelined':>10} {'sequential':>11}   (round trips per request)")
+    for name, modes in results.items():
+        print(f"{name:<10} {modes['pipelined']:>10.2f} {modes['sequential']:>11.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from typing import Any, Optional, Type
+from datetime import date, datetime
+import json
+from config import settings
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the standard library encoder
+    orjson = None
+
+def _default(obj: Any):
+    """Encode the types the JSON encoders don't handle natively."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (or compact stdlib JSON as a fallback)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def fast_response(content: Any, model: Optional[Type[BaseModel]] = None, status_code: int = 200) -> FastJSONResponse:
+    """
+    Return trusted internal data without FastAPI's response_model pass.
+
+    Returning a Response from an endpoint makes FastAPI skip re-validating and
+    re-encoding it against the route's response_model, which stays in place
+    for the OpenAPI schema. With VALIDATE_RESPONSES enabled the content is
+    still checked against `model`, to catch drift while developing.
+    """
+    if settings.VALIDATE_RESPONSES and model is not None:
+        model(**content)
+    return FastJSONResponse(content, status_code=status_code)
@@ -0,0 +1,91 @@
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any
+import logging
+from auth import require_admin
+from profiling import profiler
+from redis_pool import redis_pool
+import providers
+import webhooks
+import asyncio
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+# Models
+class ProfilingRequest(BaseModel):
+    routes: List[str] = Field(default_factory=list, description="Request paths to sample, e.g. /api/check-plagiarism")
+    tasks: List[str] = Field(default_factory=list, description="Celery task names, e.g. check_plagiarism_task")
+    sample_rate: float = Field(0.1, gt=0, le=1)
+    interval: float = Field(0.005, ge=0.001, le=1)
+    duration: float = Field(600, gt=0, le=86400, description="Seconds until profiling switches itself off")
+
+class ProfilingStatus(BaseModel):
+    enabled: bool
+    routes: List[str]
+    tasks: List[str]
+    sample_rate: float
+    interval: float
+    expires_at: Optional[float] = None
+
+# Routes
+@router.get("/profiling", response_model=ProfilingStatus)
+async def get_profiling():
+    """
+    Get the current profiling configuration.
+    """
+    return profiler.current()
+
+@router.put("/profiling", response_model=ProfilingStatus)
+async def enable_profiling(request: ProfilingRequest):
+    """
+    Enable sampling profiling for a fraction of requests to the given routes
+    and runs of the given Celery tasks, for a limited time.
+    """
+    logger.warning(f"Enabling profiling: {request.dict()}")
+    profiler.configure(request.routes, request.tasks, request.sample_rate, request.interval, request.duration)
+    return profiler.current()
+
+@router.delete("/profiling", response_model=ProfilingStatus)
+async def disable_profiling():
+    """
+    Disable profiling in all processes.
+    """
+    logger.warning("Disabling profiling")
+    profiler.disable()
+    return profiler.current()
+
+@router.get("/profiling/profiles", response_model=List[Dict[str, Any]])
+async def list_profiles():
+    """
+    List recorded profiles (folded stacks, newest first).
+    """
+    return profiler.list_profiles()
+
+@router.get("/redis", response_model=Dict[str, Any])
+async def get_redis_status():
+    """
+    Get the state of this process's shared Redis connection pool.
+    """
+    return redis_pool.stats()
+
+@router.get("/providers", response_model=Dict[str, List[Dict[str, Any]]])
+async def get_providers():
+    """
+    Get this process's provider backends with their latency and error
+    averages, load and health, by kind.
+    """
+    return {
+        "plagiarism": providers.plagiarism.stats(),
+        "rephrase": providers.rephrasing.stats(),
+    }
+
+@router.get("/webhooks/deliveries", response_model=List[Dict[str, Any]])
+async def list_webhook_deliveries(limit: int = Query(100, ge=1, le=1000)):
+    """
+    List recent webhook delivery attempts (newest first).
+    """
+    store = await asyncio.to_thread(webhooks.get_store)
+    return await asyncio.to_thread(store.recent, limit)
@@ -0,0 +1,200 @@
+from fastapi import APIRouter, HTTPException, Depends, Request, status
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List, Optional, Dict, Any
+import asyncio
+import logging
+import time
+from config import settings
+from auth import get_current_user, UserInDB
+from metering import limit_exceeded, tier_for
+from body_limit import text_body_limit
+from frames import CODECS, FRAMES_JSON, FRAMES_MSGPACK, FrameDecoder, FrameError, encode_frame, media_type_for
+import detection
+import metering
+import providers
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["bulk"])
+
+FRAME_CONTENT = {"content": {FRAMES_MSGPACK: {}, FRAMES_JSON: {}}}
+
+def document_text(document: Any) -> str:
+    """The text of one document frame, validated like TextInput."""
+    if not isinstance(document, dict) or not isinstance(document.get("text"), str):
+        raise ValueError("Document must be an object with a text field")
+    text = document["text"]
+    if not text or len(text) > settings.MAX_TEXT_LENGTH:
+        raise ValueError(f"Text must be between 1 and {settings.MAX_TEXT_LENGTH} characters")
+    if text.isspace():
+        raise ValueError("Text cannot be empty")
+    return text
+
+def result_frame(index: int, document: Any, payload: Dict[str, Any], duplicate_of: Optional[int] = None) -> Dict[str, Any]:
+    frame = {"index": index}
+    if isinstance(document, dict) and "id" in document:
+        frame["id"] = document["id"]
+    if duplicate_of is not None:
+        frame["duplicate_of"] = duplicate_of
+    frame.update(payload)
+    return frame
+
+class BulkBatch:
+    """
+    The documents of one bulk request, deduplicated and metered as they are
+    decoded, with each new text handed to the detection engine straight away
+    so checks run while the rest of the body is still arriving.
+    """
+
+    def __init__(self, user: Optional[UserInDB], media_type: str):
+        self.user = user
+        self.media_type = media_type
+        self.documents: List[Any] = []
+        self.positions: Dict[str, int] = {}
+        # Document indexes of each unique text, by the order it was first seen
+        self.members: List[List[int]] = []
+        self.invalid: List[Dict[str, Any]] = []
+        # Usage recorded for each unique text, until its check succeeds
+        self.charged: Dict[int, str] = {}
+        self._texts: asyncio.Queue = asyncio.Queue()
+        self._results: asyncio.Queue = asyncio.Queue()
+
+    async def read(self, request: Request):
+        """Decode document frames as the body streams in, queueing new texts for checking."""
+        decoder = FrameDecoder(self.media_type, max_frame_size=text_body_limit(settings.MAX_TEXT_LENGTH))
+        try:
+            async for chunk in request.stream():
+                await self.add(decoder.feed(chunk))
+            decoder.finish()
+        except FrameError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        self._texts.put_nowait(None)
+
+    async def add(self, documents: List[Any]):
+        """Deduplicate and meter one chunk's documents (one round trip for all its new texts)."""
+        if len(self.documents) + len(documents) > settings.BULK_MAX_DOCUMENTS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Too many documents (max {settings.BULK_MAX_DOCUMENTS} per request)"
+            )
+        new: List[str] = []
+        for document in documents:
+            index = len(self.documents)
+            self.documents.append(document)
+            try:
+                text = document_text(document)
+            except ValueError as e:
+                self.invalid.append(result_frame(index, document, {"error": str(e)}))
+                continue
+            position = self.positions.get(text)
+            if position is None:
+                position = self.positions[text] = len(self.members)
+                self.members.append([])
+                new.append(text)
+            self.members[position].append(index)
+        if not new:
+            return
+        if self.user:
+            usage, events = await metering.meter.charge(self.user.username, tier_for(self.user.is_premium), len(new))
+            if not usage.allowed:
+                raise limit_exceeded(usage, self.user.is_premium)
+            first = len(self.members) - len(new)
+            self.charged.update((first + i, event) for i, event in enumerate(events))
+        for text in new:
+            self._texts.put_nowait(text)
+
+    async def _queued_texts(self) -> AsyncIterator[str]:
+        while True:
+            text = await self._texts.get()
+            if text is None:
+                return
+            yield text
+
+    async def check(self, cost_limit: float):
+        """Check texts as they are queued, collecting the outcomes for results()."""
+        try:
+            async for item in detection.check_many(self._queued_texts(), settings.BULK_CONCURRENCY, cost_limit):
+                self._results.put_nowait(item)
+        finally:
+            self._results.put_nowait(None)
+
+    async def refund(self):
+        """Give back the usage of texts that weren't checked successfully."""
+        if self.user and self.charged:
+            events, self.charged = list(self.charged.values()), {}
+            await metering.meter.refund(self.user.username, events)
+
+    async def results(self, checking: asyncio.Task, started: float) -> AsyncIterator[bytes]:
+        """Result frames as checks finish, then the summary frame."""
+        failed = 0
+        try:
+            if self.invalid:
+                yield b"".join(encode_frame(frame, self.media_type) for frame in self.invalid)
+            while True:
+                item = await self._results.get()
+                if item is None:
+                    break
+                position, result, error = item
+                if error is not None:
+                    failed += len(self.members[position])
+                    payload = {"error": f"Error checking plagiarism: {error}"}
+                else:
+                    self.charged.pop(position, None)
+                    payload = result
+                first = self.members[position][0]
+                yield b"".join(
+                    encode_frame(
+                        result_frame(index, self.documents[index], payload, None if index == first else first),
+                        self.media_type,
+                    )
+                    for index in self.members[position]
+                )
+            yield encode_frame({
+                "done": True,
+                "documents": len(self.documents),
+                "unique": len(self.members),
+                "invalid": len(self.invalid),
+                "failed": failed,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            }, self.media_type)
+        finally:
+            checking.cancel()
+            await self.refund()
+
+@router.post("/check-plagiarism/bulk", responses={200: FRAME_CONTENT})
+async def check_plagiarism_bulk(
+    request: Request,
+    current_user: Optional[UserInDB] = Depends(get_current_user)
+):
+    """
+    Check a batch of documents for plagiarism in one request.
+
+    The body is a stream of length-prefixed frames (4-byte big-endian length,
+    then a MessagePack or JSON object `{"id": ..., "text": ...}`), with the
+    Content-Type naming the encoding. Checks start as documents arrive, and
+    results come back in the same format as each check finishes:
+    `{"index", "id", "percentage", "sources"}`, or `{"index", "id", "error"}`,
+    then a final `{"done": true, ...}` summary frame. Identical texts in a
+    batch are checked (and metered) once, and failed checks are refunded.
+    """
+    media_type = media_type_for(request.headers.get("content-type", ""))
+    if not media_type:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Send documents as {' or '.join(CODECS)}"
+        )
+
+    started = time.perf_counter()
+    batch = BulkBatch(current_user, media_type)
+    cost_limit = providers.max_cost(bool(current_user and current_user.is_premium))
+    checking = asyncio.create_task(batch.check(cost_limit))
+    try:
+        await batch.read(request)
+    except Exception:
+        checking.cancel()
+        await batch.refund()
+        raise
+    logger.info(f"Bulk check of {len(batch.documents)} documents ({len(batch.members)} unique)")
+
+    return StreamingResponse(batch.results(checking, started), media_type=media_type)
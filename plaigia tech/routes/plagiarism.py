@@ -1,13 +1,25 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, status
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Header, Query, Response, status
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, validator
-from typing import List, Optional, Dict, Any
-import httpx
+from typing import List, Optional, Dict, Any, Set, Tuple
 import asyncio
 import logging
-from celery_worker import check_plagiarism_task
+import uuid
 from config import settings
-from auth import get_current_user, UserInDB, fake_users_db
+from auth import get_current_user, UserInDB
+from body_limit import text_body, text_body_openapi
+from preflight import Preflight, preflight, postflight, release
+from history import history_store
+from tracing import tracer
+from subsystems import subsystems
+from responses import fast_response
+from metrics import record_cache
+from webhooks import validate_callback_url
+from submissions import fingerprints, submission_index
+import detection
+import normalize
+import providers
+import simhash
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -20,133 +32,330 @@ class TextInput(BaseModel):
     
     @validator('text')
     def text_must_not_be_empty(cls, v):
-        if not v.strip():
+        # Length is already enforced by the field; isspace() avoids copying v
+        if v.isspace():
             raise ValueError('Text cannot be empty')
         return v
 
-class PlagiarismResult(BaseModel):
-    percentage: float
-    sources: List[str]
+class AsyncCheckInput(TextInput):
+    callback_url: Optional[str] = Field(
+        None, max_length=2048,
+        description="URL that receives a signed webhook with the result when the check finishes",
+    )
+    
+    @validator('callback_url')
+    def callback_url_must_be_allowed(cls, v):
+        return validate_callback_url(v) if v else v
+
+class NearDuplicate(BaseModel):
+    distance: int
+    matched_at: float
+    changes: Optional[List[Dict[str, Any]]] = None
+
+class SubmissionMatch(BaseModel):
+    submission_id: str
+    overlap: float
+    submitted_at: float
+
+class PlagiarismResult(providers.ProviderResult):
+    near_duplicate: Optional[NearDuplicate] = None
+    submission_id: Optional[str] = None
+    submission_matches: Optional[List[SubmissionMatch]] = None
 
 class PlagiarismTask(BaseModel):
     task_id: str
     status: str
 
+class Snippet(BaseModel):
+    source: str
+    title: Optional[str] = None
+    length: int
+    start: int
+    end: int
+    context_start: int
+    context_end: int
+    before: str
+    match: str
+    after: str
+
+# Large text bodies skip JSON-to-model validation (see body_limit.text_body)
+read_text_input = text_body(TextInput, settings.MAX_TEXT_LENGTH)
+read_async_input = text_body(AsyncCheckInput, settings.MAX_TEXT_LENGTH)
+
 # In-memory task storage (use Redis in production)
 task_store: Dict[str, Dict[str, Any]] = {}
 
+def find_submissions(text: str, username: Optional[str]) -> Tuple[Set[int], List[Dict[str, Any]]]:
+    """Fingerprint a submission and search earlier ones (runs in a worker thread)."""
+    values = fingerprints(text)
+    return values, submission_index.search(
+        values, username, settings.SUBMISSION_MIN_OVERLAP, settings.SUBMISSION_MAX_MATCHES
+    )
+
+async def attach_submissions(result: Dict[str, Any], search: asyncio.Future, text: str,
+                             username: Optional[str], background_tasks: BackgroundTasks) -> Dict[str, Any]:
+    """Add matching earlier submissions to a result and index this one after the response."""
+    with tracer.span("submissions.search"):
+        values, matches = await search
+    submission_id = uuid.uuid4().hex
+    background_tasks.add_task(submission_index.add, submission_id, username, text, values)
+    return {**result, "submission_id": submission_id, "submission_matches": matches}
+
+def respond(result: Dict[str, Any], checks: Preflight, background_tasks: BackgroundTasks,
+            fresh: Optional[Dict[str, Any]] = None):
+    """Return a check result, storing it for idempotent replays (and `fresh` in the result cache) afterwards."""
+    background_tasks.add_task(postflight, checks, result, fresh)
+    return fast_response(result, PlagiarismResult)
+
 # Routes
-@router.post("/check-plagiarism", response_model=PlagiarismResult)
+@router.post("/check-plagiarism", response_model=PlagiarismResult, openapi_extra=text_body_openapi(TextInput))
 async def check_plagiarism(
-    input: TextInput,
     background_tasks: BackgroundTasks,
-    current_user: Optional[UserInDB] = Depends(get_current_user)
+    input: TextInput = Depends(read_text_input),
+    current_user: Optional[UserInDB] = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, max_length=255)
 ):
     """
     Check text for plagiarism using external API.
     
-    Returns percentage of plagiarism and list of sources.
+    Returns percentage of plagiarism and list of sources. Retrying with the
+    same Idempotency-Key header returns the first response without using
+    quota again.
     """
+    search = None
+    checks = None
     try:
-        # Validate input
-        if len(input.text) > settings.MAX_TEXT_LENGTH:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, 
-                detail=f"Text too long (max {settings.MAX_TEXT_LENGTH} characters)"
+        # Quota, the shared result cache and the idempotency key in one round trip
+        username = current_user.username if current_user else None
+        with tracer.span("redis.preflight"):
+            checks = await preflight(
+                "plagiarism", username, bool(current_user and current_user.is_premium),
+                normalize.cache_key(input.text), idempotency_key,
             )
-        
-        # Check user limits if authenticated
-        if current_user:
-            # In production, check user's usage count against their tier limit
-            user_dict = fake_users_db.get(current_user.username, {})
-            usage_count = user_dict.get("usage_count", 0)
-            is_premium = user_dict.get("is_premium", False)
-            
-            if not is_premium and usage_count >= 10:  # Free tier limit
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail="Free tier limit reached. Please upgrade to premium."
-                )
-            
-            # Increment usage count
-            user_dict["usage_count"] = usage_count + 1
+        if checks.replay is not None:
+            logger.info("Replaying the stored response for an Idempotency-Key")
+            return fast_response(checks.replay, PlagiarismResult)
         
         # For demonstration, we'll use direct API call
         # In production, use Celery for async processing
-        # task = check_plagiarism_task.delay(input.text)
+        # task = subsystems.get("celery").check_plagiarism_task.delay(input.text)
         # task_id = task.id
         # task_store[task_id] = {"status": "processing"}
         # return {"task_id": task_id, "status": "processing"}
         
-        # Simulate API call to Copyleaks
-        logger.info("Checking text for plagiarism")
+        # Earlier submissions (including ones made moments ago) are searched
+        # while the check runs
+        if settings.SUBMISSION_INDEX_ENABLED:
+            search = asyncio.ensure_future(asyncio.to_thread(find_submissions, input.text, username))
         
-        # In production, use actual API with proper authentication
-        # api_key = settings.COPYLEAKS_API_KEY
+        # The same text (after normalization) was checked before, by any process
+        if checks.result_key:
+            record_cache("result", checks.cached is not None)
+        if checks.cached is not None:
+            result = checks.cached
+            if search is not None:
+                result = await attach_submissions(result, search, input.text, username, background_tasks)
+            if current_user:
+                history_store.append(current_user.username, "plagiarism", input.text, result)
+            return respond(result, checks, background_tasks)
         
-        # Simulating API call for now
-        # In production, replace with actual API call
-        # async with httpx.AsyncClient() as client:
-        #     response = await client.post(
-        #         "https://api.copyleaks.com/v3/plagiarism/check",
-        #         headers={"Authorization": f"Bearer {api_key}"},
-        #         json={"text": input.text}
-        #     )
-        #     if response.status_code != 200:
-        #         raise HTTPException(
-        #             status_code=response.status_code,
-        #             detail=f"Plagiarism API error: {response.text}"
-        #         )
-        #     result = response.json()
+        # Resubmissions of an already checked text reuse its result
+        fingerprint = None
+        if settings.SIMHASH_ENABLED:
+            with tracer.span("simhash.lookup"):
+                fingerprint, match = await asyncio.to_thread(simhash.find, input.text, simhash.near_duplicates)
+            if fingerprint is not None:
+                record_cache("near_duplicate", match is not None)
+            if match is not None:
+                entry, distance = match
+                near_duplicate = {"distance": distance, "matched_at": entry.created_at}
+                # Only show what changed against the user's own earlier submission
+                if current_user and entry.username == current_user.username:
+                    near_duplicate["changes"] = await asyncio.to_thread(simhash.word_diff, entry.text, input.text)
+                result = {**entry.result, "near_duplicate": near_duplicate}
+                logger.info(f"Near-duplicate of a checked submission (distance {distance})")
+                if search is not None:
+                    result = await attach_submissions(result, search, input.text, username, background_tasks)
+                if current_user:
+                    history_store.append(current_user.username, "plagiarism", input.text, result)
+                return respond(result, checks, background_tasks)
         
-        # Simulated result
-        await asyncio.sleep(1)  # Simulate API delay
-        result = {
-            "percentage": 10.5, 
-            "sources": [
-                "https://example.com/source1", 
-                "https://example.com/source2"
-            ]
-        }
+        logger.info("Checking text for plagiarism")
+        detected = await detection.check_text(input.text, providers.max_cost(bool(current_user and current_user.is_premium)))
         
-        logger.info(f"Plagiarism check completed: {result['percentage']}%")
-        return result
+        logger.info(f"Plagiarism check completed: {detected['percentage']}%")
+        if fingerprint is not None:
+            simhash.near_duplicates.add(fingerprint, username, input.text, detected)
+        result = detected
+        if search is not None:
+            result = await attach_submissions(result, search, input.text, username, background_tasks)
+        if current_user:
+            history_store.append(current_user.username, "plagiarism", input.text, result)
+        return respond(result, checks, background_tasks, fresh=detected)
         
     except HTTPException as e:
         logger.error(f"HTTP error in plagiarism check: {e.detail}")
+        if checks is not None:
+            await release(checks)
         raise e
+    except providers.ProviderUnavailable as e:
+        logger.error(f"No plagiarism provider available: {e}")
+        if checks is not None:
+            await release(checks)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Plagiarism providers are temporarily unavailable"
+        )
     except Exception as e:
         logger.error(f"Error checking plagiarism: {str(e)}", exc_info=True)
+        if checks is not None:
+            await release(checks)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error checking plagiarism: {str(e)}"
         )
+    finally:
+        if search is not None and not search.done():
+            search.cancel()
+
+@router.delete("/check-plagiarism/submissions/{submission_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def withdraw_submission(
+    submission_id: str,
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """
+    Withdraw one of your checked submissions, so later checks no longer
+    match against it. The id is returned as `submission_id` by
+    POST /check-plagiarism.
+    """
+    if not await asyncio.to_thread(submission_index.withdraw, submission_id, current_user.username):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Submission not found"
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.post("/check-plagiarism/async", response_model=PlagiarismTask, status_code=status.HTTP_202_ACCEPTED,
+             openapi_extra=text_body_openapi(AsyncCheckInput))
+async def submit_plagiarism_check(
+    background_tasks: BackgroundTasks,
+    input: AsyncCheckInput = Depends(read_async_input),
+    current_user: Optional[UserInDB] = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, max_length=255)
+):
+    """
+    Queue a plagiarism check to run in the background.
+    
+    With a callback_url the result is POSTed there as a signed webhook when
+    the check finishes, so there is no need to poll
+    GET /check-plagiarism/{task_id}. Retrying with the same Idempotency-Key
+    header returns the first task instead of queueing another.
+    """
+    username = current_user.username if current_user else None
+    with tracer.span("redis.preflight"):
+        checks = await preflight(
+            "plagiarism-async", username, bool(current_user and current_user.is_premium),
+            idempotency_key=idempotency_key,
+        )
+    if checks.replay is not None:
+        return fast_response(checks.replay, PlagiarismTask, status_code=status.HTTP_202_ACCEPTED)
+    
+    try:
+        celery = await asyncio.to_thread(subsystems.get, "celery")
+        task = await asyncio.to_thread(
+            celery.check_plagiarism_task.delay, input.text, callback_url=input.callback_url,
+            cost_limit=providers.max_cost(bool(current_user and current_user.is_premium)),
+        )
+    except Exception:
+        await release(checks)
+        raise
+    
+    # Eager mode (local testing) has already run the task
+    task_status = "processing"
+    if task.ready():
+        if task.successful():
+            task_status = "completed"
+            task_store[task.id] = {"status": task_status, "result": task.result}
+        else:
+            task_status = "failed"
+            task_store[task.id] = {"status": task_status, "error": str(task.result)}
+    
+    logger.info(f"Queued plagiarism check {task.id} (callback: {bool(input.callback_url)})")
+    response = {"task_id": task.id, "status": task_status}
+    background_tasks.add_task(postflight, checks, response)
+    return fast_response(response, PlagiarismTask, status_code=status.HTTP_202_ACCEPTED)
+
+@router.get("/snippet", response_model=Snippet)
+async def get_snippet(
+    source: str = Query(..., max_length=2048, description="Source URL from a plagiarism result"),
+    start: int = Query(..., ge=0, description="Start of the matched span (character offset)"),
+    end: int = Query(..., ge=0, description="End of the matched span (exclusive)"),
+    context: int = Query(200, ge=0, le=settings.SNIPPET_MAX_CONTEXT, description="Characters of context either side"),
+    current_user: Optional[UserInDB] = Depends(get_current_user)
+):
+    """
+    Get a matched span of a source document with its surrounding context,
+    from the local reference corpus (no need to re-fetch the source).
+    """
+    if end < start or end - start > settings.MAX_TEXT_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Span must satisfy start <= end and be at most {settings.MAX_TEXT_LENGTH} characters"
+        )
+    try:
+        store = await asyncio.to_thread(subsystems.get, "source_store")
+    except Exception as e:
+        logger.error(f"Reference corpus unavailable: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The reference corpus is temporarily unavailable"
+        )
+    snippet = await asyncio.to_thread(store.snippet, source, start, end, context)
+    if snippet is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Source not found in the reference corpus"
+        )
+    return fast_response(snippet, Snippet)
+
+def celery_task_info(task_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Status of a plagiarism check from the Celery result backend, or None if
+    the backend has no record of it (Celery calls that PENDING, but queued
+    checks are recorded as QUEUED, so it means unknown or expired).
+    """
+    task = subsystems.get("celery").check_plagiarism_task.AsyncResult(task_id)
+    if task.state == "PENDING":
+        return None
+    if task.state == "SUCCESS":
+        return {"status": "completed", "result": task.result}
+    if task.state == "FAILURE":
+        return {"status": "failed", "error": str(task.info)}
+    return {"status": "processing"}
 
 @router.get("/check-plagiarism/{task_id}", response_model=PlagiarismResult)
 async def get_plagiarism_result(task_id: str):
     """
     Get the result of an asynchronous plagiarism check task.
-    """
-    # In production, check Celery task status
-    # task = check_plagiarism_task.AsyncResult(task_id)
-    # if task.state == 'PENDING':
-    #     return JSONResponse({"task_id": task_id, "status": "processing"})
-    # elif task.state == 'SUCCESS':
-    #     return task.result
-    # else:
-    #     raise HTTPException(
-    #         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-    #         detail=f"Task failed: {task.info}"
-    #     )
     
-    # For demonstration
-    if task_id not in task_store:
+    Unknown task ids, and checks whose results have expired, return 404.
+    """
+    task_info = task_store.get(task_id)
+    if task_info is None:
+        try:
+            task_info = await asyncio.to_thread(celery_task_info, task_id)
+        except Exception as e:
+            logger.error(f"Error reading task {task_id} status: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Task status is temporarily unavailable"
+            )
+    if task_info is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found"
         )
     
-    task_info = task_store[task_id]
     if task_info["status"] == "processing":
         return JSONResponse({"task_id": task_id, "status": "processing"})
     elif task_info["status"] == "completed":
@@ -1,13 +1,20 @@
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, status
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, validator
+from collections import OrderedDict
 from typing import Optional, Dict, Any
-import httpx
-import asyncio
 import logging
-from celery_worker import rephrase_text_task
 from config import settings
-from auth import get_current_user, UserInDB, fake_users_db
+from auth import get_current_user, UserInDB
+from body_limit import text_body, text_body_openapi
+from metering import enforce_usage_limit
+from history import history_store
+from metrics import record_cache
+from tracing import tracer
+from subsystems import subsystems
+from responses import fast_response
+import normalize
+import providers
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -20,7 +27,8 @@ class TextInput(BaseModel):
     
     @validator('text')
     def text_must_not_be_empty(cls, v):
-        if not v.strip():
+        # Length is already enforced by the field; isspace() avoids copying v
+        if v.isspace():
             raise ValueError('Text cannot be empty')
         return v
 
@@ -32,14 +40,35 @@ class RephraseTask(BaseModel):
     task_id: str
     status: str
 
+# Large text bodies skip JSON-to-model validation (see body_limit.text_body)
+read_text_input = text_body(TextInput, settings.MAX_TEXT_LENGTH)
+
 # In-memory task storage (use Redis in production)
 task_store: Dict[str, Dict[str, Any]] = {}
 
+# Recent rephrasings by a digest of the exact text: the output follows the
+# input's wording, so only identical resubmissions skip the model call
+rephrase_cache: "OrderedDict[str, str]" = OrderedDict()
+
+def cached_rephrasing(key: str) -> Optional[str]:
+    rephrased = rephrase_cache.get(key)
+    if rephrased is not None:
+        rephrase_cache.move_to_end(key)
+    record_cache("rephrase", rephrased is not None)
+    return rephrased
+
+def cache_rephrasing(key: str, rephrased: str):
+    if settings.REPHRASE_CACHE_ENTRIES <= 0:
+        return
+    rephrase_cache[key] = rephrased
+    while len(rephrase_cache) > settings.REPHRASE_CACHE_ENTRIES:
+        rephrase_cache.popitem(last=False)
+
 # Routes
-@router.post("/rephrase", response_model=RephraseResult)
+@router.post("/rephrase", response_model=RephraseResult, openapi_extra=text_body_openapi(TextInput))
 async def rephrase_text(
-    input: TextInput,
     background_tasks: BackgroundTasks,
+    input: TextInput = Depends(read_text_input),
     current_user: Optional[UserInDB] = Depends(get_current_user)
 ):
     """
@@ -48,76 +77,47 @@ async def rephrase_text(
     Returns original text and rephrased version.
     """
     try:
-        # Validate input
-        if len(input.text) > settings.MAX_TEXT_LENGTH:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, 
-                detail=f"Text too long (max {settings.MAX_TEXT_LENGTH} characters)"
-            )
-        
-        # Check user limits if authenticated
+        # Check and record usage against the user's tier limit
         if current_user:
-            # In production, check user's usage count against their tier limit
-            user_dict = fake_users_db.get(current_user.username, {})
-            usage_count = user_dict.get("usage_count", 0)
-            is_premium = user_dict.get("is_premium", False)
-            
-            if not is_premium and usage_count >= 10:  # Free tier limit
-                raise HTTPException(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    detail="Free tier limit reached. Please upgrade to premium."
-                )
-            
-            # Increment usage count
-            user_dict["usage_count"] = usage_count + 1
+            with tracer.span("usage.meter"):
+                await enforce_usage_limit(current_user.username, current_user.is_premium)
         
         # For demonstration, we'll use direct API call
         # In production, use Celery for async processing
-        # task = rephrase_text_task.delay(input.text)
+        # task = subsystems.get("celery").rephrase_text_task.delay(input.text)
         # task_id = task.id
         # task_store[task_id] = {"status": "processing"}
         # return {"task_id": task_id, "status": "processing"}
         
-        # Simulate API call to OpenAI or Hugging Face
-        logger.info("Rephrasing text")
-        
-        # In production, use actual API with proper authentication
-        # api_key = settings.OPENAI_API_KEY
+        with tracer.span("cache.lookup", cache="rephrase"):
+            cache_key = normalize.exact_key(input.text)
+            rephrased = cached_rephrasing(cache_key)
+        if rephrased is not None:
+            logger.info("Rephrasing served from cache")
+            if current_user:
+                history_store.append(current_user.username, "rephrase", input.text, {}, output=rephrased)
+            return fast_response({"original": input.text, "rephrased": rephrased}, RephraseResult)
         
-        # Simulating API call for now
-        # In production, replace with actual API call
-        # async with httpx.AsyncClient() as client:
-        #     response = await client.post(
-        #         "https://api.openai.com/v1/chat/completions",
-        #         headers={"Authorization": f"Bearer {api_key}"},
-        #         json={
-        #             "model": "gpt-3.5-turbo",
-        #             "messages": [
-        #                 {"role": "system", "content": "You are a helpful assistant that rephrases text."},
-        #                 {"role": "user", "content": f"Rephrase the following text while preserving its meaning: {input.text}"}
-        #             ],
-        #             "temperature": 0.7,
-        #             "max_tokens": 1000
-        #         }
-        #     )
-        #     if response.status_code != 200:
-        #         raise HTTPException(
-        #             status_code=response.status_code,
-        #             detail=f"OpenAI API error: {response.text}"
-        #         )
-        #     result = response.json()
-        #     rephrased = result["choices"][0]["message"]["content"].strip()
-        
-        # Simulated result
-        await asyncio.sleep(1)  # Simulate API delay
-        rephrased = "The swift brown fox leaps over the idle dog."
+        logger.info("Rephrasing text")
+        rephrased = await providers.rephrasing.call(
+            input.text, providers.max_cost(bool(current_user and current_user.is_premium))
+        )
+        cache_rephrasing(cache_key, rephrased)
         
         logger.info("Text rephrasing completed")
-        return {"original": input.text, "rephrased": rephrased}
+        if current_user:
+            history_store.append(current_user.username, "rephrase", input.text, {}, output=rephrased)
+        return fast_response({"original": input.text, "rephrased": rephrased}, RephraseResult)
         
     except HTTPException as e:
         logger.error(f"HTTP error in text rephrasing: {e.detail}")
         raise e
+    except providers.ProviderUnavailable as e:
+        logger.error(f"No rephrasing provider available: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Rephrasing providers are temporarily unavailable"
+        )
     except Exception as e:
         logger.error(f"Error rephrasing text: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -131,7 +131,7 @@ async def get_rephrase_result(task_id: str):
     Get the result of an asynchronous text rephrasing task.
     """
     # In production, check Celery task status
-    # task = rephrase_text_task.AsyncResult(task_id)
+    # task = subsystems.get("celery").rephrase_text_task.AsyncResult(task_id)
     # if task.state == 'PENDING':
     #     return JSONResponse({"task_id": task_id, "status": "processing"})
     # elif task.state == 'SUCCESS':
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Request
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Query
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, EmailStr, validator
@@ -10,6 +10,9 @@ from auth import (
     authenticate_user, create_access_token, UserInDB
 )
 from config import settings
+from metering import meter_for_user
+from history import history_store
+from responses import fast_response
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -43,10 +46,17 @@ class Token(BaseModel):
     token_type: str
     expires_in: int
 
+class HistoryPage(BaseModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+
 class UsageStats(BaseModel):
     total_checks: int
-    remaining_free_checks: int
+    remaining_free_checks: Optional[int] = None
     is_premium: bool
+    limit: Optional[int] = None
+    window_seconds: int
+    reset_in: float
 
 # Routes
 @router.post("/register", response_model=User, status_code=status.HTTP_201_CREATED)
@@ -118,16 +128,21 @@ async def read_users_me(current_user: UserInDB = Depends(get_current_user)):
 @router.get("/usage", response_model=UsageStats)
 async def get_usage_stats(current_user: UserInDB = Depends(get_current_user)):
     """
-    Get usage statistics for the current user.
+    Get usage statistics for the current user's sliding usage window.
+
+    A null remaining_free_checks means the user's tier is unlimited (its
+    usage isn't recorded, so total_checks stays 0).
     """
-    usage_count = current_user.usage_count
-    remaining = max(0, 10 - usage_count) if not current_user.is_premium else float('inf')
+    usage = await meter_for_user(current_user.username, current_user.is_premium)
     
-    return {
-        "total_checks": usage_count,
-        "remaining_free_checks": remaining,
-        "is_premium": current_user.is_premium
-    }
+    return fast_response({
+        "total_checks": usage.used,
+        "remaining_free_checks": usage.remaining,
+        "is_premium": current_user.is_premium,
+        "limit": usage.limit,
+        "window_seconds": usage.window_seconds,
+        "reset_in": usage.reset_in,
+    }, UsageStats)
 
 @router.post("/premium")
 async def upgrade_to_premium(current_user: UserInDB = Depends(get_current_user)):
@@ -143,26 +158,33 @@ async def upgrade_to_premium(current_user: UserInDB = Depends(get_current_user))
     logger.info(f"User {current_user.username} upgraded to premium successfully")
     return {"message": "Upgraded to premium successfully"}
 
-@router.get("/history", response_model=List[Dict[str, Any]])
-async def get_user_history(current_user: UserInDB = Depends(get_current_user)):
+@router.get("/history", response_model=HistoryPage)
+async def get_user_history(
+    current_user: UserInDB = Depends(get_current_user),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    type: Optional[str] = Query(None, pattern="^(plagiarism|rephrase)$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
     """
     Get history of user's plagiarism checks and rephrasing requests.
+    
+    Newest entries come first. Pass `next_cursor` from a response as `cursor`
+    to fetch the following page; `type`, `since` and `until` filter entries.
     """
-    # In production, retrieve from database
-    # For demonstration, return mock data
     logger.info(f"User {current_user.username} accessed their history")
     
-    return [
-        {
-            "type": "plagiarism",
-            "text": "Sample text for plagiarism check",
-            "result": {"percentage": 10.5, "sources": ["https://example.com/source1"]},
-            "timestamp": datetime.utcnow().isoformat()
-        },
-        {
-            "type": "rephrase",
-            "original": "Sample text for rephrasing",
-            "rephrased": "Rephrased sample text",
-            "timestamp": datetime.utcnow().isoformat()
-        }
-    ]
+    try:
+        items, next_cursor = await history_store.page(
+            current_user.username,
+            limit=limit,
+            cursor=cursor,
+            type=type,
+            since=since.timestamp() if since else None,
+            until=until.timestamp() if until else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return fast_response({"items": items, "next_cursor": next_cursor}, HistoryPage)
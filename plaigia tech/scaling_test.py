@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Measure throughput scaling and per-worker memory of the pre-forked server.
+
+For each worker count, starts `gunicorn -c gunicorn.conf.py main:app`, reads
+every worker's memory from /proc/<pid>/smaps_rollup (Linux only), then drives
+the server from several client processes and reports requests per second.
+Shared vs. private memory shows how much of the preloaded app stays shared
+copy-on-write; PSS is each worker's fair share of the total.
+
+Example:
+    ./scaling_test.py --workers 1 2 4 8 --duration 15 --output scaling.json
+    ./scaling_test.py --workers 4 --no-preload     # compare without preloading
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List, Any
+
+import httpx
+
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+def worker_pids(master_pid: int) -> List[int]:
+    """PIDs of the direct children of the gunicorn master."""
+    try:
+        with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+            return [int(pid) for pid in f.read().split()]
+    except FileNotFoundError:
+        return []
+
+def memory_kb(pid: int) -> Dict[str, int]:
+    """Memory totals of one process, in kB, from smaps_rollup."""
+    usage = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in SMAPS_FIELDS:
+                usage[key] = int(value.split()[0])
+    usage["Shared"] = usage.get("Shared_Clean", 0) + usage.get("Shared_Dirty", 0)
+    usage["Private"] = usage.get("Private_Clean", 0) + usage.get("Private_Dirty", 0)
+    return usage
+
+def start_server(workers: int, port: int, preload: bool) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(workers),
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        GUNICORN_PRELOAD=str(preload),
+        GUNICORN_LOG_LEVEL="warning",
+        # Recycling would skew memory and throughput during the measurement
+        GUNICORN_MAX_REQUESTS="0",
+        MOCK_PROVIDER_LATENCY="0",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+        env=env,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+
+def wait_ready(url: str, master: subprocess.Popen, workers: int, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if master.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {master.returncode}")
+        if len(worker_pids(master.pid)) >= workers:
+            try:
+                if httpx.get(f"{url}/health", timeout=1.0).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become ready in time")
+
+async def drive(url: str, path: str, concurrency: int, duration: float) -> Dict[str, int]:
+    counts = {"ok": 0, "errors": 0}
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=10.0) as client:
+        async def worker():
+            while time.monotonic() < deadline:
+                try:
+                    response = await client.get(path)
+                    counts["ok" if response.status_code < 400 else "errors"] += 1
+                except httpx.HTTPError:
+                    counts["errors"] += 1
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return counts
+
+def client_process(url: str, path: str, concurrency: int, duration: float, results):
+    results.put(asyncio.run(drive(url, path, concurrency, duration)))
+
+def measure_throughput(url: str, path: str, clients: int, concurrency: int, duration: float) -> Dict[str, Any]:
+    """Drive the server from separate processes so the client is not the bottleneck."""
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=client_process, args=(url, path, concurrency, duration, results))
+        for _ in range(clients)
+    ]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    totals = {"ok": 0, "errors": 0}
+    for _ in processes:
+        counts = results.get()
+        totals["ok"] += counts["ok"]
+        totals["errors"] += counts["errors"]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+    return {**totals, "requests_per_s": totals["ok"] / elapsed}
+
+def run(workers: int, args) -> Dict[str, Any]:
+    url = f"http://127.0.0.1:{args.port}"
+    master = start_server(workers, args.port, not args.no_preload)
+    try:
+        wait_ready(url, master, workers)
+        # Warm up every worker before measuring
+        measure_throughput(url, args.path, args.clients, args.concurrency, args.warmup)
+        pids = worker_pids(master.pid)
+        memory = {pid: memory_kb(pid) for pid in pids}
+        throughput = measure_throughput(url, args.path, args.clients, args.concurrency, args.duration)
+        memory_after = {pid: memory_kb(pid) for pid in worker_pids(master.pid)}
+        master_memory = memory_kb(master.pid)
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=60)
+
+    def average(snapshot, field):
+        return sum(usage[field] for usage in snapshot.values()) / max(1, len(snapshot))
+
+    return {
+        "workers": workers,
+        **throughput,
+        "master_rss_kb": master_memory["Rss"],
+        "worker_rss_kb": average(memory_after, "Rss"),
+        "worker_pss_kb": average(memory_after, "Pss"),
+        "worker_shared_kb": average(memory_after, "Shared"),
+        "worker_private_kb": average(memory_after, "Private"),
+        "worker_private_idle_kb": average(memory, "Private"),
+        "total_pss_kb": sum(usage["Pss"] for usage in memory_after.values()),
+    }
+
+def main():
+    """Run the scaling measurement."""
+    parser = argparse.ArgumentParser(description="Measure multi-worker throughput scaling and memory sharing")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to measure")
+    parser.add_argument("--port", type=int, default=8099, help="Port for the server under test")
+    parser.add_argument("--path", default="/health", help="Path to request")
+    parser.add_argument("--clients", type=int, default=max(1, multiprocessing.cpu_count() // 2), help="Client processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent requests per client process")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per worker count")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Warm-up seconds per worker count")
+    parser.add_argument("--no-preload", action="store_true", help="Import the app in each worker instead of the master")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        print("This script needs Linux /proc/<pid>/smaps_rollup")
+        sys.exit(1)
+
+    results = []
+    for workers in args.workers:
+        print(f"Measuring {workers} worker(s)...")
+        results.append(run(workers, args))
+
+    base = results[0]["requests_per_s"] / results[0]["workers"] if results[0]["requests_per_s"] else 0
+    print(f"\n{'workers':>7} {'req/s':>9} {'speedup':>8} {'eff.':>6} {'RSS MB':>8} {'PSS MB':>8} {'shared MB':>10} {'private MB':>11} {'errors':>7}")
+    for result in results:
+        speedup = result["requests_per_s"] / (base or 1)
+        result["efficiency"] = speedup / result["workers"]
+        print(
+            f"{result['workers']:>7} {result['requests_per_s']:>9.0f} {speedup:>8.2f} {result['efficiency']:>6.0%} "
+            f"{result['worker_rss_kb'] / 1024:>8.1f} {result['worker_pss_kb'] / 1024:>8.1f} "
+            f"{result['worker_shared_kb'] / 1024:>10.1f} {result['worker_private_kb'] / 1024:>11.1f} {result['errors']:>7}"
+        )
+
+    if args.output:
+        report = {"preload": not args.no_preload, "path": args.path, "cpus": multiprocessing.cpu_count(), "results": results}
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -2,24 +2,61 @@
 """
 Simple HTTP server to serve the static frontend files during development.
 This allows testing the frontend integration with the backend API.
+
+When the frontend has been built with build_static.py, the build is served
+with the same caching headers, ETags and precompressed variants as the API's
+/static mount; otherwise files are served from this directory as-is.
 """
 
 import http.server
-import socketserver
 import os
 import webbrowser
 from urllib.parse import urlparse
+from static_files import StaticManifest
 
 # Configuration
 PORT = 3000
 DIRECTORY = "."
+BUILD_DIRECTORY = "dist"
 
 class Handler(http.server.SimpleHTTPRequestHandler):
     """Custom request handler that serves files from the static directory."""
-    
+
+    # Keep-alive, so a page and its assets share one connection
+    protocol_version = "HTTP/1.1"
+    manifest = None
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=DIRECTORY, **kwargs)
-    
+
+    def do_GET(self):
+        if not self.send_built(include_body=True):
+            super().do_GET()
+
+    def do_HEAD(self):
+        if not self.send_built(include_body=False):
+            super().do_HEAD()
+
+    def send_built(self, include_body: bool) -> bool:
+        """Serve the request from the build; returns False if there is no build."""
+        if self.manifest is None:
+            return False
+        response = self.manifest.resolve(
+            urlparse(self.path).path,
+            accept_encoding=self.headers.get("Accept-Encoding", ""),
+            if_none_match=self.headers.get("If-None-Match", ""),
+        )
+        if response is None:
+            self.send_error(404, "File not found")
+            return True
+        self.send_response(response.status)
+        for name, value in response.headers:
+            self.send_header(name, value)
+        self.end_headers()
+        if include_body and response.path is not None:
+            self.wfile.write(self.manifest.read(response.path))
+        return True
+
     def log_message(self, format, *args):
         """Override to provide more informative logging."""
         path = urlparse(self.path).path
@@ -29,20 +66,24 @@ def main():
     """Start the server and open the browser."""
     # Change to the script's directory
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
-    
+
     # Ensure the static directory exists
     if not os.path.isdir(DIRECTORY):
         print(f"Error: '{DIRECTORY}' directory not found.")
         return
-    
-    # Create the server
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
+
+    if StaticManifest.exists(BUILD_DIRECTORY):
+        Handler.manifest = StaticManifest(BUILD_DIRECTORY)
+        print(f"Serving the built frontend from '{BUILD_DIRECTORY}'")
+
+    # Create the server (one thread per connection, so a slow client can't block others)
+    with http.server.ThreadingHTTPServer(("", PORT), Handler) as httpd:
         print(f"Serving frontend at http://localhost:{PORT}")
         print(f"Press Ctrl+C to stop the server")
-        
+
         # Open browser
         webbrowser.open(f"http://localhost:{PORT}/index.html")
-        
+
         # Serve until interrupted
         try:
             httpd.serve_forever()
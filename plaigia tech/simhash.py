@@ -0,0 +1,230 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import combinations
+from typing import Optional, Dict, Any, List, Tuple
+import difflib
+import hashlib
+import re
+import sys
+import threading
+import time
+import zlib
+from config import settings
+from normalize import Normalized, fold, normalize
+
+FINGERPRINT_BITS = 64
+MASK64 = (1 << FINGERPRINT_BITS) - 1
+
+# Features are overlapping word 3-grams
+SHINGLE_WORDS = 3
+
+WORD_PATTERN = re.compile(r"[^ ]+")
+
+# bytes.translate deletion tables: all byte values with bit k set. Counting one
+# bit position over every shingle hash is then a slice and a translate, in C.
+_WITH_BIT = [bytes(value for value in range(256) if value >> bit & 1) for bit in range(8)]
+
+# Word hashes are reused across documents (the vocabulary is small next to the text)
+_word_hashes: Dict[str, int] = {}
+WORD_CACHE_SIZE = 200_000
+
+if hasattr(int, "bit_count"):
+    def popcount(value: int) -> int:
+        return value.bit_count()
+else:
+    def popcount(value: int) -> int:
+        return bin(value).count("1")
+
+def tokenize(text: str) -> List[str]:
+    """Normalized words (see normalize.py): case, punctuation and homoglyph changes don't alter them."""
+    return fold(text).split()
+
+def _word_hash(word: str) -> int:
+    value = _word_hashes.get(word)
+    if value is None:
+        if len(_word_hashes) >= WORD_CACHE_SIZE:
+            _word_hashes.clear()
+        value = _word_hashes[word] = int.from_bytes(
+            hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little"
+        )
+    return value
+
+def shingle_hashes(tokens: List[str], size: int = SHINGLE_WORDS) -> array:
+    """64-bit hashes of the word `size`-grams (of the words themselves for very short texts)."""
+    hashes = [_word_hash(word) for word in tokens]
+    if len(hashes) >= size:
+        # Rotate by position so "a b c" and "c b a" hash differently
+        combined = hashes[size - 1:]
+        for offset in range(1, size):
+            rotated = [(h << offset | h >> (FINGERPRINT_BITS - offset)) & MASK64 for h in hashes[size - 1 - offset:len(hashes) - offset]]
+            combined = [a ^ b for a, b in zip(combined, rotated)]
+        hashes = combined
+    return array("Q", hashes)
+
+def fingerprint(tokens: List[str]) -> int:
+    """64-bit SimHash: bit i is set when most shingle hashes have bit i set."""
+    hashes = shingle_hashes(tokens)
+    if sys.byteorder != "little":
+        hashes.byteswap()
+    count = len(hashes)
+    data = hashes.tobytes()
+    value = 0
+    for byte in range(8):
+        column = data[byte::8]
+        for bit in range(8):
+            ones = count - len(column.translate(None, _WITH_BIT[bit]))
+            if ones * 2 > count:
+                value |= 1 << (byte * 8 + bit)
+    return value
+
+def find(text: str, index: "SimHashIndex") -> Tuple[Optional[int], Optional[Tuple["Entry", int]]]:
+    """Fingerprint `text` and look it up; (None, None) when it is too short to fingerprint reliably."""
+    tokens = tokenize(text)
+    if len(tokens) < settings.SIMHASH_MIN_WORDS:
+        return None, None
+    value = fingerprint(tokens)
+    return value, index.lookup(value)
+
+def _words(normalized: Normalized) -> List[Tuple[str, int, int]]:
+    return [(match.group(), match.start(), match.end()) for match in WORD_PATTERN.finditer(normalized.text)]
+
+def _original(normalized: Normalized, words: List[Tuple[str, int, int]], first: int, last: int) -> Tuple[int, int]:
+    """Span of the original text covering normalized words [first, last)."""
+    if first == last:
+        position = words[first][1] if first < len(words) else len(normalized.text)
+        return normalized.original_span(position, position)
+    return normalized.original_span(words[first][1], words[last - 1][2])
+
+def word_diff(previous: str, current: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    Word-level changes from `previous` to `current`, compared after
+    normalization; `start`/`end` locate each change in `current` as submitted.
+    """
+    before, after = normalize(previous), normalize(current)
+    a, b = _words(before), _words(after)
+    changes = []
+    matcher = difflib.SequenceMatcher(None, [w[0] for w in a], [w[0] for w in b], autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        if len(changes) == limit:
+            changes.append({"op": "truncated"})
+            break
+        previous_start, previous_end = _original(before, a, i1, i2)
+        start, end = _original(after, b, j1, j2)
+        changes.append({
+            "op": tag,
+            "start": start,
+            "end": end,
+            "previous": previous[previous_start:previous_end],
+            "current": current[start:end],
+        })
+    return changes
+
+class Entry:
+    __slots__ = ("fingerprint", "username", "result", "compressed_text", "created_at")
+
+    def __init__(self, fingerprint: int, username: Optional[str], result: Dict[str, Any], text: str):
+        self.fingerprint = fingerprint
+        self.username = username
+        self.result = result
+        self.compressed_text = zlib.compress(text.encode("utf-8"), 1)
+        self.created_at = time.time()
+
+    @property
+    def text(self) -> str:
+        return zlib.decompress(self.compressed_text).decode("utf-8")
+
+class SimHashIndex:
+    """
+    Near-duplicate index over 64-bit SimHash fingerprints of checked submissions.
+
+    Uses permuted tables (Manku et al.): the fingerprint is split into
+    `max_distance + 2` blocks (at least 3), and there is one table per choice
+    of 2 blocks.
+    A fingerprint within `max_distance` bits of the query differs in at most
+    `max_distance` blocks, so in at least one table its 2 key blocks equal
+    the query's. Each table is a sorted array of (key bits, entry id) packed
+    into one uint64, the id taking the bits the widest key leaves, so a
+    lookup is a binary search per table plus a popcount per candidate, and a
+    table costs 8 bytes per entry. The oldest entries are evicted beyond
+    `max_entries`.
+    """
+
+    def __init__(self, max_distance: int = 3, max_entries: int = 20000):
+        if max_distance < 0:
+            raise ValueError("max_distance must not be negative")
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        # Two blocks would make a key of all 64 bits, leaving none for the id
+        blocks = max(max_distance + 2, 3)
+        bounds = [FINGERPRINT_BITS * i // blocks for i in range(blocks + 1)]
+        spans = list(zip(bounds, bounds[1:]))
+        # Per table: (shift, width) of its two key blocks
+        self.layouts = [((a_lo, a_hi - a_lo), (b_lo, b_hi - b_lo)) for (a_lo, a_hi), (b_lo, b_hi) in combinations(spans, 2)]
+        self.id_bits = FINGERPRINT_BITS - max(a_width + b_width for (_, a_width), (_, b_width) in self.layouts)
+        if max_entries > 1 << self.id_bits:
+            raise ValueError(f"At most {1 << self.id_bits} entries fit a distance-{max_distance} index")
+        self._tables = [array("Q") for _ in self.layouts]
+        self._entries: "OrderedDict[int, Entry]" = OrderedDict()
+        self._next_id = 0
+        self._id_mask = (1 << self.id_bits) - 1
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _keys(self, value: int) -> List[int]:
+        """Key of `value` in each table, shifted above the entry id bits."""
+        return [
+            ((value >> a_shift & ((1 << a_width) - 1)) << b_width | (value >> b_shift & ((1 << b_width) - 1))) << self.id_bits
+            for (a_shift, a_width), (b_shift, b_width) in self.layouts
+        ]
+
+    def add(self, value: int, username: Optional[str], text: str, result: Dict[str, Any]):
+        entry = Entry(value, username, result, text)
+        with self._lock:
+            entry_id = self._next_id & self._id_mask
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            for key, table in zip(self._keys(value), self._tables):
+                # Ids only grow, so the new composite sorts last within its key
+                table.insert(bisect_right(table, key | entry_id), key | entry_id)
+            while len(self._entries) > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        entry_id, entry = self._entries.popitem(last=False)
+        for key, table in zip(self._keys(entry.fingerprint), self._tables):
+            del table[bisect_left(table, key | entry_id)]
+
+    def lookup(self, value: int) -> Optional[Tuple[Entry, int]]:
+        """Most similar (then most recent) entry within max_distance bits, with its distance."""
+        best: Optional[Tuple[Entry, int]] = None
+        best_id = -1
+        step = 1 << self.id_bits
+        with self._lock:
+            for key, table in zip(self._keys(value), self._tables):
+                for position in range(bisect_left(table, key), bisect_left(table, key + step)):
+                    entry_id = table[position] & self._id_mask
+                    entry = self._entries[entry_id]
+                    distance = popcount(entry.fingerprint ^ value)
+                    if distance <= self.max_distance and (
+                        best is None or distance < best[1] or (distance == best[1] and entry_id > best_id)
+                    ):
+                        best, best_id = (entry, distance), entry_id
+        return best
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "tables": len(self._tables),
+                "table_bytes": sum(table.itemsize * len(table) for table in self._tables),
+                "text_bytes": sum(len(entry.compressed_text) for entry in self._entries.values()),
+                "max_distance": self.max_distance,
+            }
+
+# Process-wide index of checked submissions
+near_duplicates = SimHashIndex(settings.SIMHASH_MAX_DISTANCE, settings.SIMHASH_MAX_ENTRIES)
@@ -0,0 +1,210 @@
+from array import array
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+import zlib
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (
+    id INTEGER PRIMARY KEY,
+    digest BLOB NOT NULL UNIQUE,
+    offset INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    url TEXT PRIMARY KEY,
+    title TEXT,
+    digest BLOB NOT NULL,
+    chars INTEGER NOT NULL,
+    block_chars INTEGER NOT NULL,
+    blocks BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+DATA_FILE = "blocks.dat"
+INDEX_FILE = "index.db"
+
+def block_digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+class SourceStore:
+    """
+    Local store of the reference corpus that plagiarism sources point to.
+
+    Documents are cut into blocks of `block_chars` characters; each block is
+    zlib-compressed and appended to one data file, stored once per content
+    digest, so mirrored or boilerplate-heavy sources share blocks. A SQLite
+    index maps each source URL to its block ids. Snippets are cut from a
+    read-only mmap of the data file, decompressing only the blocks that cover
+    the requested span, with a small LRU cache of decompressed blocks.
+
+    Any number of processes can read; documents should be added by one
+    process at a time (see ingest_sources.py). The data file is only opened
+    for appending by the first add(), so readers never hold it writable.
+    """
+
+    def __init__(self, directory: str, block_chars: int = 16384, cache_blocks: int = 256):
+        self.directory = directory
+        self.block_chars = block_chars
+        self.cache_blocks = cache_blocks
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, INDEX_FILE), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._data_path = os.path.join(directory, DATA_FILE)
+        self._writer = None
+        self._map: Optional[mmap.mmap] = None
+        self._view: Optional[memoryview] = None
+        self._cache: "OrderedDict[int, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, url: str, text: str, title: Optional[str] = None) -> Dict[str, Any]:
+        """Store (or replace) a source document; returns how many blocks were new."""
+        digest = block_digest(text.encode("utf-8"))
+        with self._lock:
+            row = self._conn.execute("SELECT digest FROM documents WHERE url = ?", (url,)).fetchone()
+            if row is not None and row[0] == digest:
+                return {"url": url, "blocks": 0, "new_blocks": 0, "unchanged": True}
+            block_ids = array("I")
+            new_blocks = 0
+            self._conn.execute("BEGIN")
+            try:
+                for start in range(0, len(text), self.block_chars):
+                    data = text[start:start + self.block_chars].encode("utf-8")
+                    data_digest = block_digest(data)
+                    found = self._conn.execute("SELECT id FROM blocks WHERE digest = ?", (data_digest,)).fetchone()
+                    if found is None:
+                        if self._writer is None:
+                            self._writer = open(self._data_path, "ab")
+                        compressed = zlib.compress(data, 6)
+                        offset = self._writer.tell()
+                        self._writer.write(compressed)
+                        cursor = self._conn.execute(
+                            "INSERT INTO blocks (digest, offset, size) VALUES (?, ?, ?)",
+                            (data_digest, offset, len(compressed)),
+                        )
+                        block_ids.append(cursor.lastrowid)
+                        new_blocks += 1
+                    else:
+                        block_ids.append(found[0])
+                # Blocks must be on disk before the index points at them
+                if self._writer is not None:
+                    self._writer.flush()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO documents (url, title, digest, chars, block_chars, blocks) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, title, digest, len(text), self.block_chars, block_ids.tobytes()),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return {"url": url, "blocks": len(block_ids), "new_blocks": new_blocks, "unchanged": False}
+
+    def _mapped(self, end: int) -> memoryview:
+        """View of the data file covering at least `end` bytes, remapped after appends."""
+        if self._view is None or len(self._view) < end:
+            if self._writer is not None:
+                self._writer.flush()
+            if self._view is not None:
+                self._view.release()
+                self._map.close()
+            with open(self._data_path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._map)
+        return self._view
+
+    def _block(self, block_id: int) -> str:
+        text = self._cache.get(block_id)
+        if text is not None:
+            self._cache.move_to_end(block_id)
+            return text
+        offset, size = self._conn.execute("SELECT offset, size FROM blocks WHERE id = ?", (block_id,)).fetchone()
+        view = self._mapped(offset + size)
+        # zlib reads straight from the mapped pages; nothing else is loaded
+        text = zlib.decompress(view[offset:offset + size]).decode("utf-8")
+        if self.cache_blocks:
+            self._cache[block_id] = text
+            if len(self._cache) > self.cache_blocks:
+                self._cache.popitem(last=False)
+        return text
+
+    def document(self, url: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT title, chars, block_chars, blocks FROM documents WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        title, chars, block_chars, blocks = row
+        return {"url": url, "title": title, "chars": chars, "block_chars": block_chars, "blocks": array("I", blocks)}
+
+    def _extract(self, document: Dict[str, Any], start: int, end: int) -> str:
+        block_chars = document["block_chars"]
+        first, last = start // block_chars, (max(end, start + 1) - 1) // block_chars
+        text = "".join(self._block(document["blocks"][i]) for i in range(first, last + 1))
+        base = first * block_chars
+        return text[start - base:end - base]
+
+    def extract(self, url: str, start: int, end: int) -> Optional[str]:
+        """Characters [start, end) of a source, or None if the source is unknown."""
+        with self._lock:
+            document = self.document(url)
+            if document is None:
+                return None
+            start, end = max(0, start), min(end, document["chars"])
+            return self._extract(document, start, end) if start < end else ""
+
+    def snippet(self, url: str, start: int, end: int, context: int) -> Optional[Dict[str, Any]]:
+        """A matched span of a source with up to `context` characters either side."""
+        with self._lock:
+            document = self.document(url)
+            if document is None:
+                return None
+            chars = document["chars"]
+            start = min(max(0, start), chars)
+            end = min(max(start, end), chars)
+            context_start, context_end = max(0, start - context), min(chars, end + context)
+            text = self._extract(document, context_start, context_end) if context_start < context_end else ""
+        return {
+            "source": url,
+            "title": document["title"],
+            "length": chars,
+            "start": start,
+            "end": end,
+            "context_start": context_start,
+            "context_end": context_end,
+            "before": text[:start - context_start],
+            "match": text[start - context_start:end - context_start],
+            "after": text[end - context_start:],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            documents, chars = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(chars), 0) FROM documents").fetchone()
+            blocks, stored = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blocks").fetchone()
+            referenced = sum(
+                len(blocks_blob) // 4
+                for (blocks_blob,) in self._conn.execute("SELECT blocks FROM documents")
+            )
+        return {
+            "documents": documents,
+            "chars": chars,
+            "blocks": blocks,
+            "block_references": referenced,
+            "stored_bytes": stored,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._view is not None:
+                self._view.release()
+                self._map.close()
+                self._view = self._map = None
+            if self._writer is not None:
+                self._writer.close()
+            self._conn.close()
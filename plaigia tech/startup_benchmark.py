@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the API.
+
+Starts fresh interpreters that import `main`, run the app's startup phase and
+wait for subsystem warm-up to finish, and reports the median of each phase.
+Exits non-zero when a median exceeds its budget, so it can guard CI against
+imports and initialization creeping back into module load.
+
+Example:
+    ./startup_benchmark.py --runs 5 --import-budget 1.0 --ready-budget 2.5
+    ./startup_benchmark.py --top 15     # also list the slowest imports
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Any
+
+# Run in a fresh interpreter; prints phase timings as JSON
+PROBE = r"""
+import time
+start = time.perf_counter()
+import asyncio, json
+import main
+imported = time.perf_counter()
+
+async def boot():
+    async with main.app.router.lifespan_context(main.app):
+        started = time.perf_counter()
+        await main.app.state.warm_up
+        ready = time.perf_counter()
+        return started, ready, main.subsystems.ready
+
+started, ready, warmed = asyncio.run(boot())
+print(json.dumps({
+    "import_s": imported - start,
+    "startup_s": started - imported,
+    "ready_s": ready - start,
+    "ready": warmed,
+}))
+"""
+
+def probe_env() -> Dict[str, str]:
+    # Keep the probe offline and quiet: no Redis retries, no trace export
+    return dict(os.environ, TRACING_ENABLED="False", DEBUG="False")
+
+def run_probe() -> Dict[str, Any]:
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        capture_output=True, text=True, env=probe_env(),
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Startup probe failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def slowest_imports(limit: int) -> List[Dict[str, Any]]:
+    """Modules with the highest cumulative import time, from -X importtime."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True, text=True, env=probe_env(),
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    imports = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append({"module": name.strip(), "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    return sorted(imports, key=lambda entry: entry["cumulative_ms"], reverse=True)[:limit]
+
+def main():
+    """Run the cold-start benchmark."""
+    parser = argparse.ArgumentParser(description="Measure API import and startup time against a budget")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreter runs")
+    parser.add_argument("--import-budget", type=float, default=1.0, help="Max median seconds to import main")
+    parser.add_argument("--ready-budget", type=float, default=2.5, help="Max median seconds until warm-up finishes")
+    parser.add_argument("--top", type=int, default=0, help="List the N slowest imports")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+
+    args = parser.parse_args()
+
+    runs = [run_probe() for _ in range(args.runs)]
+    report = {
+        "runs": args.runs,
+        "import_s": statistics.median(run["import_s"] for run in runs),
+        "startup_s": statistics.median(run["startup_s"] for run in runs),
+        "ready_s": statistics.median(run["ready_s"] for run in runs),
+        "ready": all(run["ready"] for run in runs),
+        "budgets": {"import_s": args.import_budget, "ready_s": args.ready_budget},
+    }
+
+    print(f"Import main:     {report['import_s'] * 1000:8.1f} ms (budget {args.import_budget * 1000:.0f} ms)")
+    print(f"Startup event:   {report['startup_s'] * 1000:8.1f} ms")
+    print(f"Ready (warm):    {report['ready_s'] * 1000:8.1f} ms (budget {args.ready_budget * 1000:.0f} ms)")
+
+    if args.top:
+        report["slowest_imports"] = slowest_imports(args.top)
+        print("\nSlowest imports (cumulative):")
+        for entry in report["slowest_imports"]:
+            print(f"  {entry['cumulative_ms']:8.1f} ms  {entry['module']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+    failures = []
+    if report["import_s"] > args.import_budget:
+        failures.append("import time")
+    if report["ready_s"] > args.ready_budget:
+        failures.append("time to ready")
+    if not report["ready"]:
+        failures.append("warm-up (a subsystem failed to initialize)")
+    if failures:
+        print(f"\nOver budget: {', '.join(failures)}")
+        sys.exit(1)
+    print("\nWithin budget")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+from typing import Dict, List, Optional, Tuple
+import json
+import mimetypes
+import os
+from content_encoding import negotiate
+
+MANIFEST = "manifest.json"
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Precompressed variants, in server preference order
+PRECOMPRESSED = ["br", "gzip"]
+
+ETAG_SUFFIXES = {"br": "-br", "gzip": "-gz"}
+
+class StaticResponse:
+    """Status, headers and (unless 304/HEAD) the file to send for a static request."""
+
+    __slots__ = ("status", "headers", "path")
+
+    def __init__(self, status: int, headers: List[Tuple[str, str]], path: Optional[str] = None):
+        self.status = status
+        self.headers = headers
+        self.path = path
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+class StaticManifest:
+    """
+    Serves a directory built by build_static.py.
+
+    Every file has a strong ETag per representation; hashed assets are cached
+    as immutable and pages are revalidated, answering 304 when the client's
+    copy is current. Precompressed .br/.gz variants are picked by
+    Accept-Encoding, so nothing is compressed per request.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST)) as f:
+            self.files: Dict[str, dict] = json.load(f)["files"]
+        self._cache: Dict[str, bytes] = {}
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.isfile(os.path.join(directory, MANIFEST))
+
+    def resolve(self, path: str, accept_encoding: str = "", if_none_match: str = "") -> Optional[StaticResponse]:
+        """Response for a request path (relative to the mount), or None if unknown."""
+        name = path.lstrip("/") or "index.html"
+        if name.endswith("/"):
+            name += "index.html"
+        entry = self.files.get(name)
+        if entry is None:
+            return None
+
+        encoding = None
+        if entry["encodings"] and accept_encoding:
+            encoding = negotiate(accept_encoding, [e for e in PRECOMPRESSED if e in entry["encodings"]])
+        etag = f'"{entry["etag"]}{ETAG_SUFFIXES.get(encoding, "")}"'
+
+        headers = [
+            ("etag", etag),
+            ("cache-control", IMMUTABLE_CACHE_CONTROL if entry["immutable"] else REVALIDATE_CACHE_CONTROL),
+        ]
+        if entry["encodings"]:
+            headers.append(("vary", "Accept-Encoding"))
+        if if_none_match and etag_matches(if_none_match, etag):
+            return StaticResponse(304, headers)
+
+        content_type, _ = mimetypes.guess_type(name)
+        content_type = content_type or "application/octet-stream"
+        if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+            content_type += "; charset=utf-8"
+        headers.append(("content-type", content_type))
+        if encoding:
+            variant = entry["encodings"][encoding]
+            headers += [("content-encoding", encoding), ("content-length", str(variant["size"]))]
+            return StaticResponse(200, headers, variant["path"])
+        headers.append(("content-length", str(entry["size"])))
+        return StaticResponse(200, headers, name)
+
+    def read(self, path: str) -> bytes:
+        """File contents, kept in memory after the first read (assets are small and immutable)."""
+        data = self._cache.get(path)
+        if data is None:
+            with open(os.path.join(self.directory, path), "rb") as f:
+                data = self._cache[path] = f.read()
+        return data
+
+class CachedStaticFiles:
+    """ASGI app serving a built static directory with caching headers."""
+
+    def __init__(self, directory: str):
+        self.manifest = StaticManifest(directory)
+
+    async def __call__(self, scope, receive, send):
+        assert scope["type"] == "http"
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+
+        if scope["method"] not in ("GET", "HEAD"):
+            await self._send(send, 405, [("allow", "GET, HEAD")], b"Method Not Allowed")
+            return
+
+        request_headers = {}
+        for name, value in scope["headers"]:
+            if name in (b"accept-encoding", b"if-none-match"):
+                request_headers[name] = value.decode("latin-1")
+        response = self.manifest.resolve(
+            path,
+            accept_encoding=request_headers.get(b"accept-encoding", ""),
+            if_none_match=request_headers.get(b"if-none-match", ""),
+        )
+        if response is None:
+            await self._send(send, 404, [("content-type", "text/plain; charset=utf-8")], b"Not Found")
+            return
+
+        body = b""
+        if response.path is not None and scope["method"] == "GET":
+            body = self.manifest.read(response.path)
+        await send({
+            "type": "http.response.start",
+            "status": response.status,
+            "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in response.headers],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _send(send, status: int, headers: List[Tuple[str, str]], body: bytes):
+        headers = headers + [("content-length", str(len(body)))]
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,405 @@
+from array import array
+from collections import Counter
+from itertools import chain
+from typing import Optional, Dict, Any, List, Set, Tuple
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from config import settings
+import normalize
+import simhash
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY,
+    submission_id TEXT NOT NULL UNIQUE,
+    username TEXT,
+    text_key TEXT NOT NULL UNIQUE,
+    created_at REAL NOT NULL,
+    fingerprints BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    fingerprint INTEGER NOT NULL,
+    submission INTEGER NOT NULL,
+    PRIMARY KEY (fingerprint, submission)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tombstones (
+    submission_id TEXT PRIMARY KEY,
+    deleted_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Fingerprints are winnowed word 5-grams: the minimum hash of every window of
+# 4 consecutive shingles, so any shared run of 8 or more words shares one
+SHINGLE_WORDS = 5
+WINNOW_WINDOW = 4
+
+# SQLite integers are signed 64-bit
+FINGERPRINT_MASK = (1 << 63) - 1
+
+# Fingerprints in more indexed submissions than this (delta and persistent
+# together) are boilerplate, not evidence
+MAX_POSTINGS = 1000
+
+# Host parameters per SQLite IN (...) query
+QUERY_CHUNK = 500
+
+def fingerprints(text: str) -> Set[int]:
+    """Winnowed shingle hashes of the normalized text."""
+    hashes = [h & FINGERPRINT_MASK for h in simhash.shingle_hashes(simhash.tokenize(text), SHINGLE_WORDS)]
+    if len(hashes) <= WINNOW_WINDOW:
+        return set(hashes)
+    return {min(hashes[i:i + WINNOW_WINDOW]) for i in range(len(hashes) - WINNOW_WINDOW + 1)}
+
+class Submission:
+    __slots__ = ("submission_id", "username", "text_key", "created_at", "fingerprints")
+
+    def __init__(self, submission_id: str, username: Optional[str], text_key: str, created_at: float,
+                 fingerprints: Set[int]):
+        self.submission_id = submission_id
+        self.username = username
+        self.text_key = text_key
+        self.created_at = created_at
+        self.fingerprints = fingerprints
+
+class DeltaIndex:
+    """
+    In-memory inverted index of submissions not yet flushed to disk.
+
+    Inserting appends to one posting list per fingerprint and a query looks up
+    one posting list per fingerprint, so neither depends on how many
+    submissions the delta holds.
+    """
+
+    def __init__(self):
+        self.postings: Dict[int, List[int]] = {}
+        self.documents: Dict[int, Submission] = {}
+        self.keys: Dict[str, int] = {}
+        self.ids: Dict[str, int] = {}
+        self._next_slot = 0
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, submission: Submission) -> bool:
+        if submission.text_key in self.keys:
+            return False
+        slot = self._next_slot
+        self._next_slot += 1
+        self.documents[slot] = submission
+        self.keys[submission.text_key] = slot
+        self.ids[submission.submission_id] = slot
+        for value in submission.fingerprints:
+            self.postings.setdefault(value, []).append(slot)
+        return True
+
+    def remove(self, submission_id: str) -> Optional[Submission]:
+        slot = self.ids.pop(submission_id, None)
+        if slot is None:
+            return None
+        submission = self.documents.pop(slot)
+        del self.keys[submission.text_key]
+        for value in submission.fingerprints:
+            slots = self.postings[value]
+            slots.remove(slot)
+            if not slots:
+                del self.postings[value]
+        return submission
+
+    def lookup(self, values: Set[int]) -> Dict[int, List[int]]:
+        """Posting lists of those of `values` that any submission holds."""
+        postings = self.postings
+        return {value: postings[value] for value in values if value in postings}
+
+    def count(self, found: Dict[int, List[int]], evidence: Set[int]) -> Dict[str, Tuple[Submission, int]]:
+        """Submissions sharing fingerprints in `evidence`, from posting lists found by lookup()."""
+        counts = Counter(chain.from_iterable(slots for value, slots in found.items() if value in evidence))
+        return {
+            self.documents[slot].submission_id: (self.documents[slot], shared)
+            for slot, shared in counts.items()
+        }
+
+class SubmissionIndex:
+    """
+    Index of checked submissions, so copying between students is found.
+
+    New submissions go into a write-optimized in-memory delta and are
+    searchable by the next check in this process. Every `flush_interval`
+    seconds (or once the delta holds `delta_max` submissions) the delta is
+    frozen, still searchable, and merged into a persistent SQLite index in one
+    transaction, skipping texts that are already indexed. Withdrawn
+    submissions leave a tombstone, so a delta flushed later by another process
+    cannot bring them back.
+
+    The delta belongs to one process: a submission checked by another worker
+    is only found once that worker has flushed it, up to `flush_interval`
+    seconds later. Fingerprints held by more than MAX_POSTINGS submissions,
+    counted over the deltas and the persistent index together, are ignored
+    in both, so a match scores the same before and after its flush.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 30.0, delta_max: int = 5000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.delta_max = delta_max
+        self._delta = DeltaIndex()
+        self._flushing: Optional[DeltaIndex] = None
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._full: Optional[asyncio.Event] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened on first use, not at import: a connection must not be shared
+        # with processes forked from a preloading Gunicorn master. Callers hold _db_lock.
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def add(self, submission_id: str, username: Optional[str], text: str, values: Optional[Set[int]] = None):
+        """Make a checked submission searchable (run off the request path)."""
+        if values is None:
+            values = fingerprints(text)
+        if values:
+            self.insert(Submission(submission_id, username, normalize.cache_key(text), time.time(), values))
+
+    def insert(self, submission: Submission):
+        with self._lock:
+            self._delta.add(submission)
+            full = len(self._delta) >= self.delta_max
+        if full and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._full.set)
+
+    def search(self, values: Set[int], username: Optional[str], min_overlap: float, limit: int) -> List[Dict[str, Any]]:
+        """Other users' submissions sharing at least `min_overlap` of these fingerprints (see fingerprints())."""
+        if not values:
+            return []
+        needed = min_overlap * len(values)
+        with self._db_lock:
+            sizes = self._persistent_sizes(values)
+        matches: Dict[str, Tuple[Submission, int]] = {}
+        with self._lock:
+            deltas = [delta for delta in (self._delta, self._flushing) if delta is not None]
+            found = [delta.lookup(values) for delta in deltas]
+            for postings in found:
+                for value, slots in postings.items():
+                    sizes[value] = sizes.get(value, 0) + len(slots)
+            evidence = values
+            if sizes and max(sizes.values()) > MAX_POSTINGS:
+                evidence = {value for value in values if sizes.get(value, 0) <= MAX_POSTINGS}
+            for delta, postings in zip(deltas, found):
+                matches.update(delta.count(postings, evidence))
+        for submission_id, found in self._search_persistent(evidence, needed).items():
+            if submission_id not in matches:
+                matches[submission_id] = found
+
+        results = [
+            {
+                "submission_id": submission.submission_id,
+                "overlap": round(shared / len(values), 4),
+                "submitted_at": submission.created_at,
+            }
+            for submission, shared in matches.values()
+            if shared >= needed and (username is None or submission.username != username)
+        ]
+        results.sort(key=lambda match: match["overlap"], reverse=True)
+        return results[:limit]
+
+    def _persistent_sizes(self, values: Set[int]) -> Dict[int, int]:
+        """Number of persistent submissions holding each of `values` (caller holds _db_lock)."""
+        sizes: Dict[int, int] = {}
+        ordered = list(values)
+        conn = self._connection()
+        for i in range(0, len(ordered), QUERY_CHUNK):
+            chunk = ordered[i:i + QUERY_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            sizes.update(dict(conn.execute(
+                f"SELECT fingerprint, COUNT(*) FROM postings WHERE fingerprint IN ({placeholders}) GROUP BY fingerprint",
+                chunk,
+            )))
+        return sizes
+
+    def _search_persistent(self, values: Set[int], needed: float) -> Dict[str, Tuple[Submission, int]]:
+        counts: Counter = Counter()
+        ordered = list(values)
+        with self._db_lock:
+            conn = self._connection()
+            for i in range(0, len(ordered), QUERY_CHUNK):
+                chunk = ordered[i:i + QUERY_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                counts.update(dict(conn.execute(
+                    f"SELECT submission, COUNT(*) FROM postings WHERE fingerprint IN ({placeholders}) GROUP BY submission",
+                    chunk,
+                )))
+            candidates = [row_id for row_id, shared in counts.items() if shared >= needed]
+            found = {}
+            for i in range(0, len(candidates), QUERY_CHUNK):
+                chunk = candidates[i:i + QUERY_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                for row_id, submission_id, username, text_key, created_at in conn.execute(
+                    f"SELECT id, submission_id, username, text_key, created_at FROM submissions WHERE id IN ({placeholders})",
+                    chunk,
+                ):
+                    found[submission_id] = (Submission(submission_id, username, text_key, created_at, set()), counts[row_id])
+        return found
+
+    def withdraw(self, submission_id: str, username: str) -> bool:
+        """Remove one of `username`'s submissions from the index; False if there is none."""
+        with self._lock:
+            for delta in (self._delta, self._flushing):
+                if delta is None:
+                    continue
+                slot = delta.ids.get(submission_id)
+                if slot is not None and delta.documents[slot].username == username:
+                    delta.remove(submission_id)
+                    found = True
+                    break
+            else:
+                found = False
+        with self._db_lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT id, username, fingerprints FROM submissions WHERE submission_id = ?", (submission_id,)
+            ).fetchone()
+            if row is not None and row[1] != username:
+                return False
+            if row is None and not found:
+                return False
+            # A withdrawal during a flush waits for it here, then removes the new row
+            conn.execute("BEGIN")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO tombstones (submission_id, deleted_at) VALUES (?, ?)",
+                    (submission_id, time.time()),
+                )
+                if row is not None:
+                    self._delete_row(row[0], row[2])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def _delete_row(self, row_id: int, blob: bytes):
+        conn = self._connection()
+        conn.executemany(
+            "DELETE FROM postings WHERE fingerprint = ? AND submission = ?",
+            [(value, row_id) for value in array("q", blob)],
+        )
+        conn.execute("DELETE FROM submissions WHERE id = ?", (row_id,))
+
+    def flush(self) -> Dict[str, int]:
+        """Merge the delta into the persistent index."""
+        with self._lock:
+            if self._flushing is not None or not self._delta.documents:
+                return {"flushed": 0, "duplicates": 0, "withdrawn": 0}
+            self._flushing, self._delta = self._delta, DeltaIndex()
+            pending = list(self._flushing.documents.values())
+
+        flushed = duplicates = withdrawn = 0
+        try:
+            with self._db_lock:
+                conn = self._connection()
+                conn.execute("BEGIN")
+                try:
+                    for submission in pending:
+                        if conn.execute(
+                            "SELECT 1 FROM tombstones WHERE submission_id = ?", (submission.submission_id,)
+                        ).fetchone():
+                            withdrawn += 1
+                            continue
+                        values = array("q", submission.fingerprints)
+                        cursor = conn.execute(
+                            "INSERT OR IGNORE INTO submissions (submission_id, username, text_key, created_at, fingerprints) "
+                            "VALUES (?, ?, ?, ?, ?)",
+                            (submission.submission_id, submission.username, submission.text_key,
+                             submission.created_at, values.tobytes()),
+                        )
+                        if cursor.rowcount == 0:
+                            # The same text is indexed already (from another delta or process)
+                            duplicates += 1
+                            continue
+                        conn.executemany(
+                            "INSERT OR IGNORE INTO postings (fingerprint, submission) VALUES (?, ?)",
+                            [(value, cursor.lastrowid) for value in values],
+                        )
+                        flushed += 1
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+        except Exception:
+            # Keep the submissions searchable; they are retried with the next flush
+            with self._lock:
+                for submission in self._flushing.documents.values():
+                    self._delta.add(submission)
+                self._flushing = None
+            raise
+        with self._lock:
+            self._flushing = None
+        logger.info(f"Flushed {flushed} submissions ({duplicates} duplicates, {withdrawn} withdrawn)")
+        return {"flushed": flushed, "duplicates": duplicates, "withdrawn": withdrawn}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            delta = len(self._delta)
+            flushing = len(self._flushing) if self._flushing is not None else 0
+        with self._db_lock:
+            conn = self._connection()
+            persistent = conn.execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+            tombstones = conn.execute("SELECT COUNT(*) FROM tombstones").fetchone()[0]
+        return {"delta": delta, "flushing": flushing, "persistent": persistent, "tombstones": tombstones}
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"Failed to flush submission index: {e}", exc_info=True)
+
+    def start(self):
+        """Open this process's connection and start the flusher (called in each worker)."""
+        with self._db_lock:
+            self._connection()
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._full = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher after a final flush, and close the connection."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self._loop = None
+        await asyncio.to_thread(self.flush)
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# Process-wide index of checked submissions
+submission_index = SubmissionIndex(
+    settings.SUBMISSION_INDEX_PATH,
+    flush_interval=settings.SUBMISSION_FLUSH_INTERVAL,
+    delta_max=settings.SUBMISSION_DELTA_MAX,
+)
@@ -0,0 +1,167 @@
+from typing import Callable, Optional, Dict, Any, List
+import asyncio
+import importlib
+import logging
+import threading
+import time
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class Subsystem:
+    """
+    A heavy dependency that is built on first use or during warm-up.
+
+    Readiness waits for `required` ones only; an optional one that fails to
+    build leaves just the features using it unavailable.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], close: Optional[Callable[[Any], Any]] = None,
+                 warm: bool = True, required: bool = True):
+        self.name = name
+        self.factory = factory
+        self.close = close
+        self.warm = warm
+        self.required = required
+        self.state = "pending"
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.instance: Any = None
+
+class SubsystemRegistry:
+    """
+    Registry of lazily initialized subsystems (Celery client, provider clients,
+    indexes, models).
+
+    Nothing is built at import time. `get` builds a subsystem the first time it
+    is needed; `warm_up` builds every subsystem marked `warm` in a background
+    thread after startup, and `ready` reports when that has finished so
+    readiness checks can hold traffic until the process is warm. Subsystems
+    that fail to warm up are retried in the background with exponential
+    backoff (from `retry_base` up to `retry_max` seconds) until they load.
+    """
+
+    def __init__(self, retry_base: float = 1.0, retry_max: float = 60.0):
+        self._subsystems: Dict[str, Subsystem] = {}
+        self._lock = threading.RLock()
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.warmed_up = False
+        self.warm_up_seconds: Optional[float] = None
+        self._retry: Optional[asyncio.Task] = None
+
+    def register(self, name: str, factory: Callable[[], Any], close: Optional[Callable[[Any], Any]] = None,
+                 warm: bool = True, required: bool = True):
+        self._subsystems[name] = Subsystem(name, factory, close, warm, required)
+
+    def get(self, name: str) -> Any:
+        subsystem = self._subsystems[name]
+        if subsystem.state == "ready":
+            return subsystem.instance
+        with self._lock:
+            if subsystem.state != "ready":
+                self._load(subsystem)
+        return subsystem.instance
+
+    def _load(self, subsystem: Subsystem):
+        subsystem.state = "loading"
+        start = time.perf_counter()
+        try:
+            subsystem.instance = subsystem.factory()
+        except Exception as e:
+            subsystem.state = "failed"
+            subsystem.error = str(e)
+            logger.error(f"Failed to initialize {subsystem.name}: {e}")
+            raise
+        subsystem.load_seconds = time.perf_counter() - start
+        subsystem.error = None
+        subsystem.state = "ready"
+        logger.info(f"Initialized {subsystem.name} in {subsystem.load_seconds * 1000:.1f}ms")
+
+    async def _build(self, subsystem: Subsystem):
+        """Build a subsystem off the event loop; failures are recorded on it, not raised."""
+        try:
+            await asyncio.to_thread(self.get, subsystem.name)
+        except Exception:
+            pass
+
+    def _failed(self) -> List[Subsystem]:
+        return [s for s in self._subsystems.values() if s.warm and s.state == "failed"]
+
+    async def warm_up(self):
+        """Build all warm subsystems, then keep retrying any that failed in the background."""
+        start = time.perf_counter()
+        for subsystem in self._subsystems.values():
+            if subsystem.warm and subsystem.state != "ready":
+                await self._build(subsystem)
+        self.warm_up_seconds = time.perf_counter() - start
+        self.warmed_up = True
+        logger.info(f"Warm-up finished in {self.warm_up_seconds * 1000:.1f}ms")
+        if self._failed() and self._retry is None:
+            self._retry = asyncio.create_task(self._retry_failed())
+
+    async def _retry_failed(self):
+        attempt = 0
+        try:
+            while self._failed():
+                await asyncio.sleep(min(self.retry_max, self.retry_base * 2 ** attempt))
+                attempt += 1
+                # Some may have been built on demand in the meantime
+                for subsystem in self._failed():
+                    logger.info(f"Retrying initialization of {subsystem.name} (attempt {attempt + 1})")
+                    await self._build(subsystem)
+        finally:
+            self._retry = None
+
+    @property
+    def ready(self) -> bool:
+        return self.warmed_up and not any(
+            s.warm and s.required and s.state != "ready" for s in self._subsystems.values()
+        )
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "warm_up_seconds": self.warm_up_seconds,
+            "subsystems": {
+                s.name: {"state": s.state, "required": s.required, "load_seconds": s.load_seconds, "error": s.error}
+                for s in self._subsystems.values()
+            },
+        }
+
+    async def close(self):
+        if self._retry is not None:
+            self._retry.cancel()
+            self._retry = None
+        for subsystem in self._subsystems.values():
+            if subsystem.state == "ready" and subsystem.close is not None:
+                try:
+                    result = subsystem.close(subsystem.instance)
+                    if asyncio.iscoroutine(result):
+                        await result
+                except Exception as e:
+                    logger.warning(f"Error closing {subsystem.name}: {e}")
+                subsystem.state = "pending"
+                subsystem.instance = None
+
+def _http_client():
+    import httpx
+    return httpx.AsyncClient(timeout=30.0)
+
+def _source_store():
+    from config import settings
+    from source_store import SourceStore
+    return SourceStore(settings.SOURCE_STORE_DIR, settings.SOURCE_BLOCK_CHARS, settings.SOURCE_BLOCK_CACHE)
+
+# Process-wide registry
+subsystems = SubsystemRegistry()
+
+# Celery app and task definitions, used to enqueue background tasks
+subsystems.register("celery", lambda: importlib.import_module("celery_worker"))
+
+# Shared pooled HTTP client for upstream providers
+subsystems.register("http_client", _http_client, close=lambda client: client.aclose())
+
+# Reference corpus for match snippets (index and mmap of compressed blocks);
+# only the snippet endpoint needs it, so it doesn't hold up readiness
+subsystems.register("source_store", _source_store, close=lambda store: store.close(), required=False)
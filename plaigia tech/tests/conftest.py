@@ -0,0 +1,32 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app reads its settings at import time: keep tests off the real data
+# directory, Redis and simulated provider delays
+_data = tempfile.mkdtemp(prefix="plagiatech-tests-")
+os.environ.update({
+    "HISTORY_DB_PATH": os.path.join(_data, "history.db"),
+    "SUBMISSION_INDEX_PATH": os.path.join(_data, "submissions.db"),
+    "SOURCE_STORE_DIR": os.path.join(_data, "sources"),
+    "PROFILE_DIR": os.path.join(_data, "profiles"),
+    "TRACE_EXPORT_PATH": os.path.join(_data, "traces.jsonl"),
+    "REDIS_URL": "redis://localhost:1/0",
+    "MOCK_PROVIDER_LATENCY": "0",
+    "CELERY_TASK_ALWAYS_EAGER": "True",
+    "ADMIN_TOKEN": "test-admin-token",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+async def fake_redis_pool():
+    """A RedisPool backed by an in-memory fakeredis server, with scripts loaded."""
+    import fakeredis
+    from redis_pool import RedisPool
+
+    pool = RedisPool("redis://fake")
+    pool.client = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    yield pool
+    await pool.client.aclose()
@@ -0,0 +1,76 @@
+import asyncio
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from admission import AdmissionController, AdmissionMiddleware
+
+def controller(**options) -> AdmissionController:
+    defaults = {"max_in_flight": 4, "max_queue_depth": 100, "low_priority_share": 0.5, "max_wait": 0.05}
+    return AdmissionController(**{**defaults, **options})
+
+async def test_low_priority_shed_before_high_priority():
+    admission = controller()
+    assert await admission.acquire(False)
+    assert await admission.acquire(False)
+    assert not await admission.acquire(False)
+    assert await admission.acquire(True)
+    assert await admission.acquire(True)
+    assert admission.in_flight == 4
+
+async def test_high_priority_waits_for_a_released_slot():
+    admission = controller(max_in_flight=1, max_wait=1.0)
+    assert await admission.acquire(True)
+    waiting = asyncio.ensure_future(admission.acquire(True))
+    await asyncio.sleep(0)
+    admission.release()
+    assert await waiting
+    # The slot was handed over, not freed
+    assert admission.in_flight == 1
+
+async def test_high_priority_shed_after_max_wait():
+    admission = controller(max_in_flight=1)
+    assert await admission.acquire(True)
+    assert not await admission.acquire(True)
+    assert not admission._waiters
+
+async def test_queue_depth_sheds_low_priority_first():
+    admission = controller()
+    admission.queue_depth = 60
+    assert not await admission.acquire(False)
+    assert await admission.acquire(True)
+    admission.queue_depth = 100
+    assert not await admission.acquire(True)
+
+def test_retry_after_scales_with_load():
+    admission = controller(retry_after=10)
+    assert admission.retry_after_seconds() == 1
+    admission.in_flight = 4
+    assert admission.retry_after_seconds() == 10
+
+def test_middleware_rejects_with_503_and_retry_after():
+    admission = controller(max_in_flight=0, max_wait=0)
+    app = Starlette(routes=[
+        Route("/api/check", lambda request: PlainTextResponse("checked")),
+        Route("/api/token", lambda request: PlainTextResponse("token")),
+        Route("/health", lambda request: PlainTextResponse("healthy")),
+    ])
+    app.add_middleware(AdmissionMiddleware, controller=admission, protected_paths={"/api/token"})
+    client = TestClient(app)
+
+    response = client.get("/api/check")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert client.get("/api/token").text == "token"
+    assert client.get("/health").text == "healthy"
+
+def test_middleware_releases_slots():
+    admission = controller()
+    app = Starlette(routes=[Route("/api/check", lambda request: PlainTextResponse("checked"))])
+    app.add_middleware(AdmissionMiddleware, controller=admission)
+    client = TestClient(app)
+    for _ in range(5):
+        assert client.get("/api/check").status_code == 200
+    assert admission.in_flight == 0
@@ -0,0 +1,92 @@
+import json
+from typing import Optional
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel, Field, validator
+
+from body_limit import BodyLimitMiddleware, text_body, text_body_limit
+
+class TextInput(BaseModel):
+    text: str = Field(..., min_length=1, max_length=20)
+
+class TextWithOption(TextInput):
+    language: Optional[str] = Field(None, max_length=2)
+
+    @validator("language")
+    def language_must_be_lowercase(cls, v):
+        if v and not v.islower():
+            raise ValueError("Language must be lowercase")
+        return v
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(BodyLimitMiddleware, limits={"/text": text_body_limit(20)}, default_limit=64)
+
+    @app.post("/text")
+    async def text(input: TextInput = Depends(text_body(TextInput, 20))):
+        return {"text": input.text}
+
+    @app.post("/option")
+    async def option(input: TextWithOption = Depends(text_body(TextWithOption, 20))):
+        return {"text": input.text, "language": input.language}
+
+    return TestClient(app)
+
+def test_content_length_over_limit_rejected_before_reading(client):
+    response = client.post("/option", content=b"x" * 65)
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Request body too large (max 64 bytes)"}
+
+def test_streamed_body_over_limit_rejected(client):
+    def chunks():
+        for _ in range(10):
+            yield b"x" * 10
+    response = client.post("/option", content=chunks())
+    assert response.status_code == 413
+
+def test_text_limit_allows_escaped_characters(client):
+    text = "\U0001f600" * 20
+    response = client.post("/text", content=json.dumps({"text": text}))
+    assert response.status_code == 200
+    assert response.json() == {"text": text}
+
+def test_plain_text_body(client):
+    response = client.post("/text", content="Just the text".encode("utf-8"), headers={"Content-Type": "text/plain; charset=utf-8"})
+    assert response.status_code == 200
+    assert response.json() == {"text": "Just the text"}
+
+@pytest.mark.parametrize("body, loc, type", [
+    ({"text": ""}, ["body", "text"], "value_error"),
+    ({"text": "   \n"}, ["body", "text"], "value_error"),
+    ({"text": "x" * 21}, ["body", "text"], "string_too_long"),
+    ({"text": 5}, ["body", "text"], "string_type"),
+    ({}, ["body", "text"], "missing"),
+    (["text"], ["body"], "dict_type"),
+])
+def test_invalid_text_is_422(client, body, loc, type):
+    response = client.post("/text", json=body)
+    assert response.status_code == 422
+    error = response.json()["detail"][0]
+    assert (error["loc"], error["type"]) == (loc, type)
+
+def test_invalid_json_and_encoding_are_422(client):
+    assert client.post("/text", content=b'{"text": ').status_code == 422
+    response = client.post("/text", content=b"\xff\xfe", headers={"Content-Type": "text/plain"})
+    assert response.status_code == 422
+
+def test_other_fields_validated_by_the_model(client):
+    response = client.post("/option", json={"text": "Some text", "language": "en"})
+    assert response.json() == {"text": "Some text", "language": "en"}
+    response = client.post("/option", json={"text": "Some text", "language": "EN"})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "language"]
+
+def test_routes_document_both_body_types():
+    import main
+
+    body = main.app.openapi()["paths"]["/api/check-plagiarism"]["post"]["requestBody"]
+    assert set(body["content"]) == {"application/json", "text/plain"}
+    assert body["content"]["application/json"]["schema"]["properties"]["text"]["maxLength"] > 0
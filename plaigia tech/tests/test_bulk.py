@@ -0,0 +1,82 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import detection
+import metering
+from auth import UserInDB, get_current_user
+from frames import FRAMES_JSON, FrameDecoder, encode_frame
+from metering import UsageMeter
+from routes import bulk
+
+async def fake_check(text, cost_limit=None):
+    if text.startswith("fail"):
+        raise RuntimeError("provider down")
+    return {"percentage": 0.0, "sources": []}
+
+async def test_check_many_starts_before_input_ends(monkeypatch):
+    checked = []
+
+    async def check_text(text, cost_limit=None):
+        checked.append(text)
+        return {}
+
+    monkeypatch.setattr(detection, "check_text", check_text)
+    arrived = asyncio.Event()
+
+    async def texts():
+        yield "first"
+        await arrived.wait()
+        yield "second"
+
+    results = detection.check_many(texts(), concurrency=2)
+    assert await results.__anext__() == (0, {}, None)
+    assert checked == ["first"]
+    arrived.set()
+    assert [item async for item in results] == [(1, {}, None)]
+
+@pytest.fixture
+def meter(monkeypatch):
+    meter = UsageMeter()
+    meter.limits = {"free": (5, 60), "premium": (None, 86400)}
+    monkeypatch.setattr(metering, "meter", meter)
+    monkeypatch.setattr(detection, "check_text", fake_check)
+    return meter
+
+def client_for(is_premium: bool) -> TestClient:
+    app = FastAPI()
+    app.include_router(bulk.router)
+    user = UserInDB(email="amy@example.com", username="amy", hashed_password="-", id=1,
+                    is_premium=is_premium, created_at=datetime.now())
+    app.dependency_overrides[get_current_user] = lambda: user
+    return TestClient(app)
+
+def post(client: TestClient, texts):
+    body = b"".join(encode_frame({"id": i, "text": text}, FRAMES_JSON) for i, text in enumerate(texts))
+    response = client.post("/check-plagiarism/bulk", content=body, headers={"Content-Type": FRAMES_JSON})
+    if response.status_code != 200:
+        return response, []
+    return response, FrameDecoder(FRAMES_JSON, max_frame_size=1 << 20).feed(response.content)
+
+def test_failed_checks_refunded(meter):
+    response, frames = post(client_for(False), ["one", "fail two", "one", ""])
+    assert response.status_code == 200
+    assert frames[-1]["unique"] == 2
+    assert frames[-1]["invalid"] == 1
+    assert frames[-1]["failed"] == 1
+    duplicate = next(frame for frame in frames if frame.get("index") == 2)
+    assert duplicate["duplicate_of"] == 0
+    assert meter.run_local("amy", "free", 0).used == 1
+
+def test_over_quota_is_429_and_nothing_charged(meter):
+    response, _ = post(client_for(False), [f"text {i}" for i in range(6)])
+    assert response.status_code == 429
+    assert meter.run_local("amy", "free", 0).used == 0
+
+def test_unlimited_tier_not_recorded(meter):
+    response, frames = post(client_for(True), [f"text {i}" for i in range(20)])
+    assert frames[-1]["unique"] == 20
+    assert not meter._local
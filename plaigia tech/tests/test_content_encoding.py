@@ -0,0 +1,114 @@
+import gzip
+import json
+
+import pytest
+from pydantic import BaseModel
+from starlette.testclient import TestClient
+
+import responses
+from config import settings
+from content_encoding import CompressionMiddleware, negotiate
+from responses import dumps, fast_response
+
+BODY = json.dumps({"text": "word " * 400}).encode()
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip", "gzip"),
+    ("gzip, br", "br"),
+    ("gzip;q=1.0, br;q=0.5", "gzip"),
+    ("*", "br"),
+    ("*;q=0.5, gzip", "gzip"),
+    ("br;q=0, *", "gzip"),
+    ("gzip;q=0", None),
+    ("*;q=0", None),
+    ("identity", None),
+    ("GZIP;q=0.8", "gzip"),
+    ("gzip;q=oops, br;q=0.1", "br"),
+])
+def test_negotiate(accept_encoding, expected):
+    assert negotiate(accept_encoding, ["br", "gzip"]) == expected
+
+def raw_app(body: bytes, headers=(), status: int = 200, chunks=None):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": status, "headers": list(headers)})
+        if chunks is None:
+            await send({"type": "http.response.body", "body": body})
+            return
+        for chunk in chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    return app
+
+def client_for(app, minimum_size: int = 1000) -> TestClient:
+    middleware = CompressionMiddleware(app, minimum_size=minimum_size)
+    middleware.available = ["gzip"]
+    return TestClient(middleware)
+
+JSON_HEADERS = [(b"content-type", b"application/json"), (b"etag", b'"v1"'), (b"vary", b"Origin")]
+
+def test_compresses_and_weakens_etag():
+    response = client_for(raw_app(BODY, JSON_HEADERS)).get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == 'W/"v1"'
+    assert response.headers["vary"] == "Origin, Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(BODY)
+    assert response.content == BODY
+
+def test_weak_etag_kept_as_is():
+    headers = [(b"content-type", b"application/json"), (b"etag", b'W/"v1"')]
+    response = client_for(raw_app(BODY, headers)).get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["etag"] == 'W/"v1"'
+
+@pytest.mark.parametrize("body, headers, status", [
+    (b'{"small": true}', JSON_HEADERS, 200),
+    (BODY, [(b"content-type", b"image/png"), (b"etag", b'"v1"')], 200),
+    (gzip.compress(BODY), [(b"content-type", b"application/json"), (b"content-encoding", b"gzip"), (b"etag", b'"v1"')], 200),
+    (BODY, JSON_HEADERS, 206),
+])
+async def test_passthrough_keeps_response(body, headers, status):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    middleware = CompressionMiddleware(raw_app(body, headers, status))
+    scope = {"type": "http", "path": "/", "headers": [(b"accept-encoding", b"gzip")]}
+    await middleware(scope, None, send)
+    assert messages[0]["headers"] == headers
+    assert messages[1]["body"] == body
+
+def test_no_accepted_encoding_passes_through():
+    response = client_for(raw_app(BODY, JSON_HEADERS)).get("/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"v1"'
+
+def test_streamed_body_compressed_per_chunk():
+    chunks = [b'{"n": %d}\n' % i for i in range(5)]
+    app = raw_app(b"", [(b"content-type", b"application/json"), (b"content-length", b"50")], chunks=chunks)
+    response = client_for(app).get("/", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.content == b"".join(chunks)
+
+class Item(BaseModel):
+    name: str
+    count: int
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_compact_with_extra_types(monkeypatch, use_orjson):
+    if use_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(responses, "orjson", None)
+    content = {"item": Item(name="é", count=1), "tags": {"a"}, "pair": (1, 2)}
+    assert json.loads(dumps(content)) == {"item": {"name": "é", "count": 1}, "tags": ["a"], "pair": [1, 2]}
+    assert b" " not in dumps({"a": [1, 2]})
+    with pytest.raises(TypeError):
+        dumps({"bad": object()})
+
+def test_fast_response_validates_only_when_enabled(monkeypatch):
+    response = fast_response({"name": "x"}, Item, status_code=201)
+    assert (response.status_code, json.loads(response.body)) == (201, {"name": "x"})
+    monkeypatch.setattr(settings, "VALIDATE_RESPONSES", True)
+    with pytest.raises(ValueError):
+        fast_response({"name": "x"}, Item)
@@ -0,0 +1,33 @@
+import pytest
+
+from frames import FRAMES_JSON, HEADER, FrameDecoder, FrameError, encode_frame, media_type_for
+
+def test_frames_decoded_across_chunk_boundaries():
+    stream = b"".join(encode_frame({"id": i, "text": f"document {i}"}, FRAMES_JSON) for i in range(3))
+    decoder = FrameDecoder(FRAMES_JSON, max_frame_size=1024)
+    documents = []
+    # One byte at a time splits every header and payload
+    for i in range(len(stream)):
+        documents += decoder.feed(stream[i:i + 1])
+    decoder.finish()
+    assert documents == [{"id": i, "text": f"document {i}"} for i in range(3)]
+
+def test_oversized_frame_rejected_from_its_header():
+    decoder = FrameDecoder(FRAMES_JSON, max_frame_size=10)
+    with pytest.raises(FrameError):
+        decoder.feed(HEADER.pack(11))
+
+def test_undecodable_frame():
+    decoder = FrameDecoder(FRAMES_JSON, max_frame_size=10)
+    with pytest.raises(FrameError):
+        decoder.feed(HEADER.pack(3) + b"{{{")
+
+def test_truncated_stream():
+    decoder = FrameDecoder(FRAMES_JSON, max_frame_size=1024)
+    assert decoder.feed(encode_frame({"text": "cut short"}, FRAMES_JSON)[:-2]) == []
+    with pytest.raises(FrameError):
+        decoder.finish()
+
+def test_media_type_for():
+    assert media_type_for("application/vnd.plagiatech.frames+json; charset=utf-8") == FRAMES_JSON
+    assert media_type_for("application/json") == ""
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from history import HistoryStore, decode_cursor, encode_cursor
+
+async def test_connection_opened_on_start_not_at_construction(tmp_path):
+    path = str(tmp_path / "history.db")
+    store = HistoryStore(path)
+    assert not os.path.exists(path)
+    store.start()
+    assert os.path.exists(path)
+    await store.stop()
+    assert store._conn is None
+
+async def filled_store(tmp_path, entries) -> HistoryStore:
+    store = HistoryStore(str(tmp_path / "history.db"))
+    store.start()
+    for entry in entries:
+        store.append(*entry)
+    # Flushes the queue
+    await store.stop()
+    return store
+
+async def test_pages_newest_first_with_cursor(tmp_path):
+    store = await filled_store(tmp_path, [
+        ("amy", "plagiarism", f"text {i}", {"percentage": i}) for i in range(5)
+    ])
+    items, cursor = await store.page("amy", limit=2)
+    assert [item["text"] for item in items] == ["text 4", "text 3"]
+    items, cursor = await store.page("amy", limit=2, cursor=cursor)
+    assert [item["text"] for item in items] == ["text 2", "text 1"]
+    items, cursor = await store.page("amy", limit=2, cursor=cursor)
+    assert [item["result"] for item in items] == [{"percentage": 0}]
+    assert cursor is None
+
+async def test_page_filters_by_user_and_type(tmp_path):
+    store = await filled_store(tmp_path, [
+        ("amy", "plagiarism", "checked", {}),
+        ("amy", "rephrase", "original", {}, "rephrased"),
+        ("bob", "plagiarism", "not amy's", {}),
+    ])
+    items, _ = await store.page("amy", type="rephrase")
+    assert items == [{
+        "id": 2, "type": "rephrase", "original": "original", "rephrased": "rephrased",
+        "timestamp": items[0]["timestamp"],
+    }]
+    items, _ = await store.page("amy")
+    assert len(items) == 2
+
+async def test_bodies_stored_once(tmp_path):
+    store = await filled_store(tmp_path, [("amy", "plagiarism", "same text", {}) for _ in range(3)])
+    with store._lock:
+        assert store._connection().execute("SELECT COUNT(*) FROM bodies").fetchone()[0] == 1
+    items, _ = await store.page("amy")
+    assert [item["text"] for item in items] == ["same text"] * 3
+
+async def test_invalid_cursor(tmp_path):
+    store = await filled_store(tmp_path, [])
+    with pytest.raises(ValueError):
+        await store.page("amy", cursor="not-a-cursor!")
+    assert decode_cursor(encode_cursor(12345)) == 12345
@@ -0,0 +1,98 @@
+import pytest
+from fastapi import HTTPException
+
+import metering
+from metering import UsageMeter, enforce_usage_limit, parse_rate
+
+def test_parse_rate():
+    assert parse_rate("10/day") == (10, 86400)
+    assert parse_rate(" 5/minutes ") == (5, 60)
+    assert parse_rate("unlimited") == (None, 86400)
+    assert parse_rate("") == (None, 86400)
+    with pytest.raises(ValueError):
+        parse_rate("10 per day")
+
+def test_local_window_enforces_limit():
+    meter = UsageMeter()
+    meter.limits = {"free": (3, 60)}
+    assert [meter.run_local("amy", "free", 1).allowed for _ in range(4)] == [True, True, True, False]
+    usage = meter.run_local("amy", "free", 0)
+    assert usage.used == 3
+    assert usage.remaining == 0
+    assert 0 < usage.reset_in <= 60
+
+def test_local_window_records_nothing_when_amount_does_not_fit():
+    meter = UsageMeter()
+    meter.limits = {"free": (3, 60)}
+    meter.run_local("amy", "free", 2)
+    assert not meter.run_local("amy", "free", 2).allowed
+    assert meter.run_local("amy", "free", 0).used == 2
+
+def test_local_window_slides(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(metering.time, "monotonic", lambda: now[0])
+    meter = UsageMeter()
+    meter.limits = {"free": (2, 60)}
+    meter.run_local("amy", "free", 1)
+    now[0] += 30
+    meter.run_local("amy", "free", 1)
+    assert not meter.run_local("amy", "free", 1).allowed
+    # The first event leaves the window; the second is still in it
+    now[0] += 31
+    usage = meter.run_local("amy", "free", 1)
+    assert usage.allowed
+    assert usage.used == 2
+
+def test_local_window_unlimited():
+    meter = UsageMeter()
+    meter.limits = {"premium": (None, 86400)}
+    usage = meter.run_local("amy", "premium", 1000)
+    assert usage.allowed
+    assert usage.remaining is None
+
+async def test_redis_window_is_shared(fake_redis_pool):
+    first = UsageMeter(fake_redis_pool)
+    second = UsageMeter(fake_redis_pool)
+    for meter in (first, second):
+        meter.limits = {"free": (3, 60)}
+    await fake_redis_pool.check()
+    assert first.shared
+
+    assert (await first.consume("amy", "free", 2)).allowed
+    usage = await second.consume("amy", "free", 1)
+    assert usage.allowed
+    assert usage.used == 3
+    assert not (await first.consume("amy", "free", 1)).allowed
+    assert (await second.peek("amy", "free")).used == 3
+    assert (await second.consume("bob", "free", 1)).used == 1
+
+async def test_redis_window_refund(fake_redis_pool):
+    from redis_pool import Batch
+
+    meter = UsageMeter(fake_redis_pool)
+    meter.limits = {"free": (3, 60)}
+    await fake_redis_pool.check()
+    batch = Batch()
+    index, member = meter.add_command(batch, "amy", "free", 2)
+    meter.parse((await fake_redis_pool.execute(batch))[index], "free")
+    refund = Batch()
+    meter.add_refund(refund, "amy", member, 2)
+    await fake_redis_pool.execute(refund)
+    assert (await meter.peek("amy", "free")).used == 0
+
+async def test_redis_script_reloaded_after_flush(fake_redis_pool):
+    meter = UsageMeter(fake_redis_pool)
+    meter.limits = {"free": (3, 60)}
+    await fake_redis_pool.check()
+    await fake_redis_pool.client.script_flush()
+    assert (await meter.consume("amy", "free", 1)).used == 1
+
+async def test_enforce_usage_limit_raises_429(monkeypatch):
+    meter = UsageMeter()
+    meter.limits = {"free": (1, 60), "premium": (None, 86400)}
+    monkeypatch.setattr(metering, "meter", meter)
+    await enforce_usage_limit("amy", False)
+    with pytest.raises(HTTPException) as exc:
+        await enforce_usage_limit("amy", False)
+    assert exc.value.status_code == 429
+    assert int(exc.value.headers["Retry-After"]) >= 1
@@ -0,0 +1,50 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import metrics
+from metrics import MetricsMiddleware, clear_multiprocess_dir, render_metrics
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/api/items/{item_id}")
+    def item(item_id: str):
+        metrics.record_redis_round_trip()
+        metrics.record_redis_round_trip()
+        return {"id": item_id}
+
+    return app
+
+def sample(body: str, prefix: str) -> float:
+    for line in body.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+def test_requests_recorded_by_route_template():
+    client = TestClient(make_app())
+    latency = 'plagiatech_http_request_duration_seconds_count{method="GET",route="/api/items/{item_id}",status="200"}'
+    trips = 'plagiatech_redis_round_trips_sum{method="GET",route="/api/items/{item_id}"}'
+    before = render_metrics()[0].decode()
+
+    response = client.get("/api/items/a")
+    assert "x-process-time" in response.headers
+    client.get("/api/items/b")
+    client.get("/missing")
+
+    body, content_type = render_metrics()
+    body = body.decode()
+    assert content_type.startswith("text/plain")
+    assert sample(body, latency) - sample(before, latency) == 2
+    assert sample(body, trips) - sample(before, trips) == 4
+    assert 'route="unmatched",status="404"' in body
+    assert sample(body, "plagiatech_http_requests_in_flight ") == 0
+
+def test_stale_multiprocess_files_cleared(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    (tmp_path / "counter_123.db").write_bytes(b"stale")
+    (tmp_path / "gauge_livesum_123.db").write_bytes(b"stale")
+    (tmp_path / "README").write_text("kept")
+    clear_multiprocess_dir()
+    assert [path.name for path in tmp_path.iterdir()] == ["README"]
@@ -0,0 +1,48 @@
+import random
+import re
+
+import pytest
+
+from normalize import cache_key, exact_key, fold, normalize
+
+def test_fold():
+    assert fold("  Héllo,   WORLD!! ") == "hello world"
+    # Cyrillic lookalikes, a zero-width space and a ligature
+    assert fold("Рlаgi​аrism ﬁnd") == "plagiarism find"
+    assert fold("Straße") == "strasse"
+
+def test_normalized_text_matches_fold():
+    text = "  The ﬁrst​  STRAẞE, café…  naïve\n\tend "
+    assert normalize(text).text == fold(text)
+
+@pytest.mark.parametrize("text, word, original", [
+    ("Hello,   WORLD!", "world", "WORLD"),
+    ("a​b​c  dé", "de", "dé"),
+    ("ﬁne ﬁsh", "fish", "ﬁsh"),
+    ("Große  Straße  ist", "ist", "ist"),
+])
+def test_spans_map_back_to_original(text, word, original):
+    normalized = normalize(text)
+    start = normalized.text.index(word)
+    span = normalized.original_span(start, start + len(word))
+    assert text[span[0]:span[1]] == original
+
+def test_every_word_maps_back_to_its_source():
+    rng = random.Random(5)
+    pieces = ["word", "Ｗｉｄｅ", "ß", "ﬁ", "é", "é", "​", " ", "  ", ",", "Ω", "х", "ǅ"]
+    for _ in range(200):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(1, 30)))
+        normalized = normalize(text)
+        for match in re.finditer(r"[^ ]+", normalized.text):
+            start, end = normalized.original_span(*match.span())
+            assert fold(text[start:end]) == match.group(), (text, match.group())
+
+def test_empty_span_and_end_of_text():
+    normalized = normalize("ab  cd")
+    assert normalized.original_span(3, 3) == (4, 4)
+    assert normalized.to_original(len(normalized)) == 6
+
+def test_cache_keys():
+    assert cache_key("Hello World") == cache_key("hello,  world!")
+    assert exact_key("Hello World") != exact_key("hello,  world!")
+    assert exact_key("Hello World") == exact_key("Hello World")
@@ -0,0 +1,72 @@
+import pytest
+from fastapi import HTTPException
+
+import metering
+import preflight
+from metering import UsageMeter
+from preflight import postflight, release
+
+@pytest.fixture
+async def pool(fake_redis_pool, monkeypatch):
+    meter = UsageMeter(fake_redis_pool)
+    meter.limits = {"free": (3, 60), "premium": (None, 86400)}
+    monkeypatch.setattr(metering, "meter", meter)
+    monkeypatch.setattr(preflight, "redis_pool", fake_redis_pool)
+    await fake_redis_pool.check()
+    return fake_redis_pool
+
+async def used(pool, username: str = "amy") -> int:
+    return await pool.client.zcard(f"usage:{username}")
+
+async def test_idempotent_retry_replays_response_without_quota(pool):
+    checks = await preflight.preflight("check", "amy", False, idempotency_key="k1")
+    assert checks.replay is None
+    assert checks.usage.used == 1
+
+    # A retry while the first request is still running
+    with pytest.raises(HTTPException) as exc:
+        await preflight.preflight("check", "amy", False, idempotency_key="k1")
+    assert exc.value.status_code == 409
+    assert await used(pool) == 1
+
+    await postflight(checks, {"task_id": "t1"})
+    replay = await preflight.preflight("check", "amy", False, idempotency_key="k1")
+    assert replay.replay == {"task_id": "t1"}
+    assert await used(pool) == 1
+    # Keys are per user
+    assert (await preflight.preflight("check", "bob", False, idempotency_key="k1")).replay is None
+
+async def test_released_key_can_be_retried(pool):
+    checks = await preflight.preflight("check", "amy", False, idempotency_key="k1")
+    await release(checks)
+    assert (await preflight.preflight("check", "amy", False, idempotency_key="k1")).replay is None
+
+async def test_result_cache_shared_through_redis(pool):
+    checks = await preflight.preflight("check", "amy", False, cache_key="abc")
+    assert checks.cached is None
+    await postflight(checks, {}, {"percentage": 12.5})
+    assert (await preflight.preflight("check", "bob", False, cache_key="abc")).cached == {"percentage": 12.5}
+
+async def test_quota_exceeded_releases_claim(pool):
+    for _ in range(3):
+        await preflight.preflight("check", "amy", False)
+    with pytest.raises(HTTPException) as exc:
+        await preflight.preflight("check", "amy", False, idempotency_key="k2")
+    assert exc.value.status_code == 429
+    assert not await pool.client.exists("idempotency:check:amy:k2")
+
+async def test_unlimited_tier_not_recorded(pool):
+    checks = await preflight.preflight("check", "amy", True, idempotency_key="k3")
+    assert checks.usage is None
+    assert checks.idempotency_key is not None
+    assert await used(pool) == 0
+
+async def test_local_quota_without_redis(fake_redis_pool, monkeypatch):
+    meter = UsageMeter(fake_redis_pool)
+    meter.limits = {"free": (1, 60), "premium": (None, 86400)}
+    monkeypatch.setattr(metering, "meter", meter)
+    assert not fake_redis_pool.available
+    checks = await preflight.preflight("check", "amy", False, idempotency_key="k1")
+    assert checks.idempotency_key is None
+    with pytest.raises(HTTPException):
+        await preflight.preflight("check", "amy", False)
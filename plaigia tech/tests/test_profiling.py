@@ -0,0 +1,36 @@
+import profiling
+from profiling import Profiler, ProfilingMiddleware
+
+def scope(headers=()):
+    return {"type": "http", "path": "/api/rephrase", "headers": list(headers)}
+
+def test_forced_only_with_admin_token(tmp_path):
+    middleware = ProfilingMiddleware(None, Profiler(str(tmp_path), 1024), admin_token="secret")
+    assert middleware._forced(scope([(b"x-profile", b"secret")]))
+    assert not middleware._forced(scope([(b"x-profile", b"secreT")]))
+    assert not middleware._forced(scope([(b"x-profile", b"")]))
+    assert not middleware._forced(scope())
+
+def test_never_forced_without_admin_token(tmp_path):
+    middleware = ProfilingMiddleware(None, Profiler(str(tmp_path), 1024))
+    assert not middleware._forced(scope([(b"x-profile", b"")]))
+
+def test_config_checked_at_most_once_per_interval(tmp_path, monkeypatch):
+    profiler = Profiler(str(tmp_path), 1024, reload_interval=60)
+    stats = []
+    real_stat = profiling.os.stat
+    monkeypatch.setattr(profiling.os, "stat", lambda path: stats.append(path) or real_stat(path))
+    for _ in range(100):
+        assert not profiler.should_profile("route", "/api/rephrase")
+    assert len(stats) == 1
+
+def test_configure_enables_sampled_routes(tmp_path):
+    profiler = Profiler(str(tmp_path), 1024)
+    profiler.configure(["/api/rephrase"], [], sample_rate=1.0, interval=0.001, duration=60)
+    assert profiler.should_profile("route", "/api/rephrase")
+    assert not profiler.should_profile("route", "/api/check-plagiarism")
+    # Other processes pick the config up from the shared directory
+    other = Profiler(str(tmp_path), 1024)
+    assert other.should_profile("route", "/api/rephrase")
+    profiler.disable()
+    assert not Profiler(str(tmp_path), 1024).should_profile("route", "/api/rephrase")
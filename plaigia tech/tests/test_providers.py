@@ -0,0 +1,78 @@
+import time
+
+import httpx
+import pytest
+
+import providers
+from providers import Backend, ProviderRouter, ProviderUnavailable
+
+def http_backend(name: str, cost: float = 0.0) -> Backend:
+    return Backend(name=name, kind="plagiarism", type="http", url=f"http://{name}", cost=cost)
+
+@pytest.fixture
+def answers(monkeypatch):
+    """Per-host JSON answers of the stand-in http backends (a status code for failures)."""
+    answers = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        answer = answers[request.url.host]
+        if isinstance(answer, int):
+            return httpx.Response(answer)
+        return httpx.Response(200, json=answer)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(providers.subsystems, "get", lambda name: client)
+    return answers
+
+def measured(backend: Backend, latency: float) -> Backend:
+    backend.latency = latency
+    backend.last_used = time.monotonic()
+    return backend
+
+async def test_fastest_backend_chosen(answers):
+    answers.update({"slow": {"percentage": 1, "sources": []}, "fast": {"percentage": 2, "sources": []}})
+    router = ProviderRouter("plagiarism", [measured(http_backend("slow"), 0.5), measured(http_backend("fast"), 0.1)])
+    assert await router.call("text") == {"percentage": 2.0, "sources": []}
+
+async def test_malformed_answer_fails_over(answers):
+    answers.update({
+        "broken": {"percentage": "lots", "sources": "<script>"},
+        "good": {"percentage": 5, "sources": ["https://example.com/a"], "internal": "dropped"},
+    })
+    broken = measured(http_backend("broken"), 0.1)
+    router = ProviderRouter("plagiarism", [broken, measured(http_backend("good"), 0.2)])
+    assert await router.call("text") == {"percentage": 5.0, "sources": ["https://example.com/a"]}
+    assert broken.failures == 1
+
+async def test_all_attempts_failing_raises(answers):
+    answers.update({"a": 503, "b": 503})
+    router = ProviderRouter("plagiarism", [http_backend("a"), http_backend("b")])
+    with pytest.raises(ProviderUnavailable):
+        await router.call("text")
+
+async def test_cost_limit(answers):
+    answers.update({"cheap": {"percentage": 1, "sources": []}, "pricey": {"percentage": 2, "sources": []}})
+    router = ProviderRouter("plagiarism", [measured(http_backend("cheap", cost=0.5), 1.0),
+                                           measured(http_backend("pricey", cost=5.0), 0.1)])
+    assert (await router.call("text", cost_limit=1.0))["percentage"] == 1.0
+    assert (await router.call("text", cost_limit=10.0))["percentage"] == 2.0
+    with pytest.raises(ProviderUnavailable):
+        await router.call("text", cost_limit=0.1)
+
+def test_failing_backend_benched():
+    backend = http_backend("flaky")
+    now = time.monotonic()
+    for _ in range(4):
+        backend.record(0.1, False, now, "HTTP 503")
+    assert not backend.healthy(now)
+    router = ProviderRouter("plagiarism", [backend, measured(http_backend("steady"), 1.0)])
+    assert router._candidates(None, set(), now)[0].name == "steady"
+    # With nothing else left, a benched backend is still tried
+    assert [b.name for b in router._candidates(None, {"steady"}, now)] == ["flaky"]
+
+def test_full_backend_skipped():
+    busy, idle = measured(http_backend("busy"), 0.1), measured(http_backend("idle"), 1.0)
+    busy.in_flight = busy.max_concurrency
+    router = ProviderRouter("plagiarism", [busy, idle])
+    assert router._try_acquire(None, set()) is idle
+    assert idle.in_flight == 1
@@ -0,0 +1,117 @@
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import rate_limit
+from rate_limit import HybridRateLimiter, LocalWindow
+
+def anonymous_request(host: str = "10.0.0.1") -> Request:
+    return Request({"type": "http", "headers": [], "client": (host, 1234)})
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+def test_window_enforces_limit(clock):
+    window = LocalWindow(limit=3, window=60)
+    assert [window.take() for _ in range(4)] == [True, True, True, False]
+    assert window.pending == 3
+    assert window.retry_after() == 60
+
+def test_window_slides_instead_of_resetting(clock):
+    window = LocalWindow(limit=2, window=60)
+    window.take()
+    clock[0] += 59
+    window.take()
+    # A fixed window would start over here; the sliding one only frees the first slot
+    clock[0] += 2
+    assert window.take()
+    assert not window.take()
+    assert window.retry_after() == pytest.approx(58)
+
+def test_reconcile_counts_other_processes(clock):
+    window = LocalWindow(limit=5, window=60)
+    window.take()
+    window.pending = 0
+    # Redis saw 4 requests: the one from here and 3 elsewhere
+    window.reconcile(used=4, reset_in=30)
+    assert window.remote == 3
+    assert window.take()
+    assert not window.take()
+    assert window.retry_after() == pytest.approx(30)
+
+async def test_limiter_raises_429(clock):
+    limiter = HybridRateLimiter({"free": "2/minute"})
+    await limiter(anonymous_request())
+    await limiter(anonymous_request())
+    with pytest.raises(HTTPException) as exc:
+        await limiter(anonymous_request())
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == "61"
+    await limiter(anonymous_request("10.0.0.2"))
+
+async def test_unlimited_tier_is_not_tracked():
+    limiter = HybridRateLimiter({"free": "unlimited"})
+    for _ in range(10):
+        await limiter(anonymous_request())
+    assert not limiter._windows
+
+async def test_sync_shares_usage_between_processes(fake_redis_pool):
+    first = HybridRateLimiter({"free": "5/minute"})
+    second = HybridRateLimiter({"free": "5/minute"})
+    first.pool = second.pool = fake_redis_pool
+    first._sha = second._sha = fake_redis_pool.register_script(rate_limit.METER_SCRIPT)
+    await fake_redis_pool.check()
+
+    for _ in range(3):
+        await first(anonymous_request())
+    await first.sync()
+    await second(anonymous_request())
+    await second.sync()
+
+    window = second._windows[("ip:10.0.0.1", "free")]
+    assert window.remote == 3
+    assert window.pending == 0
+    await second(anonymous_request())
+    with pytest.raises(HTTPException):
+        await second(anonymous_request())
+
+async def test_sync_skipped_while_redis_unavailable(fake_redis_pool):
+    limiter = HybridRateLimiter({"free": "5/minute"})
+    limiter.pool = fake_redis_pool
+    limiter._sha = fake_redis_pool.register_script(rate_limit.METER_SCRIPT)
+    await limiter(anonymous_request())
+    assert not fake_redis_pool.available
+    await limiter.sync()
+    assert limiter._windows[("ip:10.0.0.1", "free")].pending == 1
+    assert await fake_redis_pool.client.dbsize() == 0
+
+    await fake_redis_pool.check()
+    await limiter.sync()
+    assert limiter._windows[("ip:10.0.0.1", "free")].pending == 0
+    assert await fake_redis_pool.client.zcard("ratelimit:free:ip:10.0.0.1") == 1
+
+async def test_idle_windows_pruned_while_redis_unavailable(clock, fake_redis_pool):
+    limiter = HybridRateLimiter({"free": "5/minute"})
+    limiter.pool = fake_redis_pool
+    for i in range(100):
+        await limiter(anonymous_request(f"10.0.1.{i}"))
+    assert not fake_redis_pool.available
+
+    clock[0] += 30
+    await limiter.sync()
+    assert len(limiter._windows) == 100
+    # Reconciled just before the outage: others admitted 3 in the last minute
+    window = limiter._windows[("ip:10.0.1.0", "free")]
+    window.reconcile(used=4, reset_in=30)
+    clock[0] += 31
+    await limiter.sync()
+    # Only the window still held back by other processes' usage is kept...
+    assert list(limiter._windows) == [("ip:10.0.1.0", "free")]
+    assert window.pending == 0
+    # ...until that usage has expired too
+    clock[0] += 30
+    await limiter.sync()
+    assert not limiter._windows
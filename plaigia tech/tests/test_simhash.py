@@ -0,0 +1,79 @@
+import random
+import pytest
+
+from corpus import make_corpus
+from simhash import SimHashIndex, fingerprint, popcount, tokenize, word_diff
+
+def flip(value: int, bits) -> int:
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+def test_fingerprint_ignores_case_punctuation_and_homoglyphs():
+    text = make_corpus(1, 200)[0]
+    edited = text.upper().replace(".", "!").replace("A", "А")
+    assert fingerprint(tokenize(edited)) == fingerprint(tokenize(text))
+
+def test_small_edit_moves_fingerprint_a_few_bits():
+    text = make_corpus(1, 400)[0]
+    words = text.split()
+    words[200] = "substituted"
+    distance = popcount(fingerprint(tokenize(text)) ^ fingerprint(tokenize(" ".join(words))))
+    other = make_corpus(2, 400)[1]
+    assert distance <= 3
+    assert popcount(fingerprint(tokenize(text)) ^ fingerprint(tokenize(other))) > 10
+
+def test_word_order_matters():
+    assert fingerprint(tokenize("one two three four")) != fingerprint(tokenize("four three two one"))
+
+def test_lookup_finds_every_entry_within_distance():
+    rng = random.Random(3)
+    index = SimHashIndex(max_distance=3)
+    values = [rng.getrandbits(64) for _ in range(200)]
+    for i, value in enumerate(values):
+        index.add(value, None, f"text {i}", {"i": i})
+    for value in values[:50]:
+        query = flip(value, rng.sample(range(64), rng.randint(0, 3)))
+        entry, distance = index.lookup(query)
+        assert entry.fingerprint == value
+        assert distance == popcount(value ^ query)
+    assert index.lookup(flip(values[0], range(0, 64, 8))) is None
+
+@pytest.mark.parametrize("max_distance", range(0, 7))
+def test_every_distance_builds_and_queries(max_distance):
+    rng = random.Random(max_distance)
+    index = SimHashIndex(max_distance=max_distance)
+    assert index.id_bits >= 20
+    values = [0, (1 << 64) - 1] + [rng.getrandbits(64) for _ in range(50)]
+    for i, value in enumerate(values):
+        index.add(value, None, f"text {i}", {"i": i})
+    for value in values:
+        query = flip(value, rng.sample(range(64), max_distance))
+        entry, distance = index.lookup(query)
+        assert (entry.fingerprint, distance) == (value, max_distance)
+
+def test_negative_distance_rejected():
+    with pytest.raises(ValueError):
+        SimHashIndex(max_distance=-1)
+
+def test_lookup_prefers_closest_then_newest():
+    index = SimHashIndex(max_distance=3)
+    index.add(flip(0, [1, 2]), None, "older, further", {"n": 1})
+    index.add(flip(0, [5]), None, "closer", {"n": 2})
+    index.add(flip(0, [9]), None, "newer, as close", {"n": 3})
+    entry, distance = index.lookup(0)
+    assert (entry.result, distance, entry.text) == ({"n": 3}, 1, "newer, as close")
+
+def test_oldest_entries_evicted():
+    index = SimHashIndex(max_distance=3, max_entries=2)
+    for value in (0, (1 << 32) - 1, (1 << 64) - 1):
+        index.add(value, None, "text", {})
+    assert len(index) == 2
+    assert index.lookup(0) is None
+    assert index.lookup((1 << 64) - 1)[1] == 0
+    assert index.stats()["table_bytes"] == 2 * 8 * len(index.layouts)
+
+def test_word_diff_locates_changes_in_submitted_text():
+    current = "The QUICK brown fox jumps over the lazy cat."
+    changes = word_diff("the quick brown fox jumps over the lazy dog", current)
+    assert changes == [{"op": "replace", "start": 40, "end": 43, "previous": "dog", "current": "cat"}]
@@ -0,0 +1,23 @@
+from source_store import SourceStore
+
+def test_reader_sees_documents_without_opening_data_file_for_writing(tmp_path):
+    writer = SourceStore(str(tmp_path), block_chars=8)
+    writer.add("https://example.com/a", "0123456789abcdefghij", "A")
+    writer.close()
+
+    reader = SourceStore(str(tmp_path), block_chars=8)
+    assert reader._writer is None
+    # Spans several blocks
+    assert reader.extract("https://example.com/a", 6, 18) == "6789abcdefgh"
+    snippet = reader.snippet("https://example.com/a", 10, 12, context=3)
+    assert (snippet["before"], snippet["match"], snippet["after"]) == ("789", "ab", "cde")
+    assert reader.extract("https://example.com/missing", 0, 5) is None
+    reader.close()
+
+def test_repeated_blocks_stored_once(tmp_path):
+    store = SourceStore(str(tmp_path), block_chars=4)
+    assert store.add("https://example.com/a", "abcdabcdabcd")["new_blocks"] == 1
+    assert store.add("https://example.com/b", "abcdwxyz")["new_blocks"] == 1
+    assert store.add("https://example.com/b", "abcdwxyz")["unchanged"]
+    assert store.stats()["blocks"] == 2
+    store.close()
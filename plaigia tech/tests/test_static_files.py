@@ -0,0 +1,94 @@
+import gzip
+import os
+
+import pytest
+from starlette.testclient import TestClient
+
+import build_static
+from static_files import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, CachedStaticFiles, StaticManifest
+
+STYLESHEET = "body { color: #222; }\n" * 40
+SCRIPT = "console.log('checking');\n" * 40
+PAGE = '<link href="/css/app.css"><script src="./frontend.js"></script>' + "<p>Plagiarism check</p>\n" * 20
+
+@pytest.fixture
+def dist(tmp_path, monkeypatch):
+    # Only .gz variants, whether or not brotli is installed
+    monkeypatch.setattr(build_static, "brotli", None)
+    source = tmp_path / "static"
+    (source / "css").mkdir(parents=True)
+    (source / "css" / "app.css").write_text(STYLESHEET)
+    (source / "frontend.js").write_text(SCRIPT)
+    (source / "index.html").write_text(PAGE)
+    output = str(tmp_path / "dist")
+    manifest = build_static.build(str(source), output)
+    return output, manifest
+
+@pytest.fixture
+def client(dist):
+    return TestClient(CachedStaticFiles(dist[0]))
+
+def test_build_hashes_assets_and_rewrites_pages(dist):
+    output, manifest = dist
+    css = manifest["assets"]["css/app.css"]
+    assert css.startswith("css/app.") and css.endswith(".css")
+    page = manifest["files"]["index.html"]
+    assert not page["immutable"] and manifest["files"][css]["immutable"]
+    with open(os.path.join(output, "index.html")) as f:
+        html = f.read()
+    assert f'href="{css}"' in html and f'src="{manifest["assets"]["frontend.js"]}"' in html
+
+def test_nested_variants_recorded_relative_to_output(dist):
+    output, manifest = dist
+    css = manifest["assets"]["css/app.css"]
+    variant = manifest["files"][css]["encodings"]["gzip"]
+    assert variant["path"] == css + ".gz"
+    data = StaticManifest(output).read(variant["path"])
+    assert len(data) == variant["size"]
+    assert gzip.decompress(data).decode() == STYLESHEET
+
+def test_hashed_assets_immutable_pages_revalidated(client, dist):
+    css = dist[1]["assets"]["css/app.css"]
+    assert client.get(f"/{css}").headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    response = client.get("/")
+    assert response.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+    assert response.headers["content-type"] == "text/html; charset=utf-8"
+
+@pytest.mark.parametrize("accept_encoding, encoding", [
+    ("gzip", "gzip"),
+    ("br;q=1, *;q=0.5", "gzip"),
+    ("gzip;q=0", None),
+    ("identity", None),
+])
+def test_variant_selected_by_accept_encoding(client, dist, accept_encoding, encoding):
+    css = dist[1]["assets"]["css/app.css"]
+    response = client.get(f"/{css}", headers={"Accept-Encoding": accept_encoding})
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding") == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.text == STYLESHEET
+
+def test_etag_per_representation_and_304(client):
+    plain = client.get("/index.html", headers={"Accept-Encoding": "identity"}).headers["etag"]
+    gzipped = client.get("/index.html", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    assert plain != gzipped and gzipped.endswith('-gz"')
+
+    response = client.get("/index.html", headers={"Accept-Encoding": "gzip", "If-None-Match": gzipped})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == gzipped
+    # The other representation's ETag does not validate this one
+    response = client.get("/index.html", headers={"Accept-Encoding": "gzip", "If-None-Match": plain})
+    assert response.status_code == 200
+
+def test_head_sends_headers_without_body(client, dist):
+    response = client.head("/index.html", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["content-length"] == str(dist[1]["files"]["index.html"]["size"])
+
+def test_unknown_path_and_method(client):
+    assert client.get("/missing.js").status_code == 404
+    response = client.post("/index.html")
+    assert response.status_code == 405
+    assert response.headers["allow"] == "GET, HEAD"
@@ -0,0 +1,71 @@
+import os
+
+import submissions
+from corpus import make_corpus
+from submissions import Submission, SubmissionIndex, fingerprints
+
+def make_index(tmp_path) -> SubmissionIndex:
+    return SubmissionIndex(str(tmp_path / "submissions.db"))
+
+def test_connection_opened_on_start_not_at_construction(tmp_path):
+    index = make_index(tmp_path)
+    assert not os.path.exists(index.path)
+    assert index._conn is None
+
+def test_copied_text_found_before_and_after_flush(tmp_path):
+    index = make_index(tmp_path)
+    original = make_corpus(1, 300)[0]
+    copied = original + " " + make_corpus(1, 100, seed=9)[0]
+    index.add("amy-1", "amy", original)
+    values = fingerprints(copied)
+    before = index.search(values, "bob", 0.1, 5)
+    assert [match["submission_id"] for match in before] == ["amy-1"]
+    assert before[0]["overlap"] > 0.5
+    # The author's own submissions are not matches
+    assert index.search(values, "amy", 0.1, 5) == []
+
+    assert index.flush()["flushed"] == 1
+    assert index.stats()["persistent"] == 1
+    assert index.search(values, "bob", 0.1, 5) == before
+
+def test_boilerplate_ignored_the_same_way_before_and_after_flush(tmp_path, monkeypatch):
+    monkeypatch.setattr(submissions, "MAX_POSTINGS", 2)
+    index = make_index(tmp_path)
+    # Fingerprint 1 is shared by every submission, 2 to 5 only by the first
+    index.insert(Submission("first", "amy", "first", 0.0, {1, 2, 3, 4, 5}))
+    index.flush()
+    index.insert(Submission("second", "amy", "second", 0.0, {1, 6}))
+    index.insert(Submission("third", "amy", "third", 0.0, {1, 7}))
+    query = {1, 2, 3, 8}
+    before = index.search(query, "bob", 0.1, 5)
+    assert [(match["submission_id"], match["overlap"]) for match in before] == [("first", 0.5)]
+    index.flush()
+    assert index.search(query, "bob", 0.1, 5) == before
+
+def test_withdrawn_submission_not_matched_or_flushed(tmp_path):
+    index = make_index(tmp_path)
+    index.insert(Submission("amy-1", "amy", "key-1", 0.0, {1, 2, 3}))
+    assert not index.withdraw("amy-1", "bob")
+    assert index.withdraw("amy-1", "amy")
+    assert index._delta.postings == {}
+    assert index.search({1, 2, 3}, "bob", 0.1, 5) == []
+    # Another process's delta can't bring it back
+    other = make_index(tmp_path)
+    other.insert(Submission("amy-1", "amy", "key-1", 0.0, {1, 2, 3}))
+    assert other.flush() == {"flushed": 0, "duplicates": 0, "withdrawn": 1}
+
+def test_same_text_indexed_once(tmp_path):
+    index = make_index(tmp_path)
+    text = make_corpus(1, 100)[0]
+    index.add("amy-1", "amy", text)
+    index.add("amy-2", "amy", text.upper())
+    assert index.stats()["delta"] == 1
+
+async def test_start_and_stop(tmp_path):
+    index = make_index(tmp_path)
+    index.start()
+    assert os.path.exists(index.path)
+    index.add("amy-1", "amy", make_corpus(1, 100)[0])
+    await index.stop()
+    assert index._conn is None
+    assert index.stats()["persistent"] == 1
@@ -0,0 +1,53 @@
+import asyncio
+
+from subsystems import SubsystemRegistry
+
+class Flaky:
+    """Factory that fails the first `failures` times it is called."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("not yet")
+        return object()
+
+async def test_ready_after_warm_up():
+    registry = SubsystemRegistry()
+    registry.register("client", object)
+    registry.register("lazy", object, warm=False)
+    assert not registry.ready
+    await registry.warm_up()
+    assert registry.ready
+    assert registry.status()["subsystems"]["lazy"]["state"] == "pending"
+
+async def test_failed_warm_up_retried_in_background():
+    registry = SubsystemRegistry(retry_base=0.01)
+    factory = Flaky(failures=2)
+    registry.register("client", factory)
+    await registry.warm_up()
+    assert not registry.ready
+    assert registry.status()["subsystems"]["client"]["error"] == "not yet"
+    for _ in range(100):
+        if registry.ready:
+            break
+        await asyncio.sleep(0.01)
+    assert registry.ready
+    assert factory.calls == 3
+    assert registry.status()["subsystems"]["client"]["error"] is None
+    assert registry._retry is None
+
+async def test_optional_subsystem_does_not_block_readiness():
+    registry = SubsystemRegistry(retry_base=60)
+    registry.register("client", object)
+    registry.register("corpus", Flaky(failures=1), required=False)
+    await registry.warm_up()
+    assert registry.ready
+    assert registry.status()["subsystems"]["corpus"]["state"] == "failed"
+    # Built on demand once it works
+    assert registry.get("corpus") is not None
+    await registry.close()
+    assert registry._retry is None
@@ -0,0 +1,77 @@
+import pytest
+
+from tracing import Tracer, TracingMiddleware, parse_traceparent
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+SAMPLED_PARENT = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+def make_tracer(sample_rate: float) -> Tracer:
+    return Tracer(ListExporter(), sample_rate=sample_rate)
+
+async def app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+async def request(middleware, headers=()):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/api/health", "headers": list(headers)}
+    await middleware(scope, None, send)
+    return dict(messages[0]["headers"])[b"traceparent"].decode()
+
+def test_parse_traceparent():
+    assert parse_traceparent(SAMPLED_PARENT) == (TRACE_ID, "00f067aa0ba902b7", True)
+    assert parse_traceparent(f"00-{TRACE_ID}-00f067aa0ba902b7-00")[2] is False
+    assert parse_traceparent("00-short-00f067aa0ba902b7-01") is None
+    assert parse_traceparent(f"00-{TRACE_ID}-zzzzzzzzzzzzzzzz-01") is None
+
+def test_untrusted_parent_keeps_trace_but_samples_locally():
+    tracer = make_tracer(sample_rate=0.0)
+    span = tracer.start_span("GET", parent=SAMPLED_PARENT, trust_parent=False)
+    assert (span.trace_id, span.parent_id, span.sampled) == (TRACE_ID, "00f067aa0ba902b7", False)
+    tracer = make_tracer(sample_rate=1.0)
+    assert tracer.start_span("GET", parent=f"00-{TRACE_ID}-00f067aa0ba902b7-00", trust_parent=False).sampled
+
+def test_trusted_parent_decides_sampling():
+    tracer = make_tracer(sample_rate=0.0)
+    assert tracer.start_span("celery.task", parent=SAMPLED_PARENT).sampled
+    tracer = make_tracer(sample_rate=1.0)
+    assert not tracer.start_span("celery.task", parent=f"00-{TRACE_ID}-00f067aa0ba902b7-00").sampled
+
+def test_children_and_injected_context_follow_the_root():
+    tracer = make_tracer(sample_rate=1.0)
+    root = tracer.start_span("GET")
+    token = tracer.activate(root)
+    with tracer.span("cache.lookup") as child:
+        assert (child.trace_id, child.parent_id) == (root.trace_id, root.span_id)
+    headers = tracer.inject()
+    tracer.deactivate(token)
+    # A task continuing the injected context records under the same trace
+    task = tracer.start_span("celery.task", parent=headers["traceparent"])
+    assert (task.trace_id, task.parent_id, task.sampled) == (root.trace_id, root.span_id, True)
+    assert tracer.exporter.spans == [child]
+
+@pytest.mark.parametrize("trust_incoming, flag", [(False, "00"), (True, "01")])
+async def test_middleware_continues_incoming_trace(trust_incoming, flag):
+    tracer = make_tracer(sample_rate=0.0)
+    middleware = TracingMiddleware(app, tracer, trust_incoming=trust_incoming)
+    traceparent = await request(middleware, [(b"traceparent", SAMPLED_PARENT.encode())])
+    version, trace_id, span_id, sampled = traceparent.split("-")
+    assert (trace_id, sampled) == (TRACE_ID, flag)
+    assert len(tracer.exporter.spans) == (1 if trust_incoming else 0)
+
+async def test_middleware_samples_new_traces_at_rate():
+    tracer = make_tracer(sample_rate=1.0)
+    traceparent = await request(TracingMiddleware(app, tracer))
+    assert traceparent.endswith("-01") and TRACE_ID not in traceparent
+    assert tracer.exporter.spans[0].attributes["http.status_code"] == 200
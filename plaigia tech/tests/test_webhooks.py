@@ -0,0 +1,82 @@
+import socket
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+import redis
+from fastapi import HTTPException
+
+import webhooks
+from config import settings
+
+@pytest.fixture
+def production(monkeypatch):
+    monkeypatch.setattr(settings, "ENVIRONMENT", "production")
+
+def resolving_to(*addresses):
+    def getaddrinfo(host, port, **kwargs):
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port)) for address in addresses]
+    return getaddrinfo
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1/hook", "http://10.1.2.3/hook", "http://169.254.169.254/latest",
+    "http://[::1]/hook", "http://[::ffff:192.168.0.1]/hook", "http://api.localhost/hook",
+])
+def test_private_literals_rejected(production, url):
+    with pytest.raises(ValueError):
+        webhooks.validate_callback_url(url)
+
+def test_delivery_to_host_resolving_to_private_address_is_blocked(production, monkeypatch):
+    monkeypatch.setattr(webhooks.socket, "getaddrinfo", resolving_to("93.184.216.34", "10.0.0.5"))
+    url = webhooks.validate_callback_url("https://hooks.example.com/in")
+    event = webhooks.build_event("plagiarism.completed", "task-1", "completed")
+    entry = webhooks.deliver(url, [event], "delivery-1", 1)
+    assert entry["error"] == "Callback host hooks.example.com resolves to a private address"
+    assert entry["status_code"] is None
+    assert not webhooks.is_retryable(entry)
+
+def test_public_host_allowed(production, monkeypatch):
+    monkeypatch.setattr(webhooks.socket, "getaddrinfo", resolving_to("93.184.216.34"))
+    assert webhooks.resolved_host_error("https://hooks.example.com/in") is None
+
+class Down:
+    def ping(self):
+        raise redis.ConnectionError("refused")
+
+def test_store_switches_to_redis_when_it_comes_back(monkeypatch):
+    monkeypatch.setattr(webhooks, "_store", None)
+    monkeypatch.setattr(webhooks, "_local", None)
+    monkeypatch.setattr(webhooks, "_next_probe", 0.0)
+    monkeypatch.setattr(webhooks.redis_pool, "sync_client", Down)
+    local = webhooks.get_store()
+    assert isinstance(local, webhooks.LocalWebhookStore)
+    assert local.push("https://hooks.example.com/in", {"task_id": "task-1"})
+    # Not probed again until the interval has passed
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(webhooks.redis_pool, "sync_client", lambda: client)
+    assert webhooks.get_store() is local
+
+    monkeypatch.setattr(webhooks, "_next_probe", 0.0)
+    store = webhooks.get_store()
+    assert isinstance(store, webhooks.RedisWebhookStore)
+    assert store.pop_batch("https://hooks.example.com/in", 10) == ([{"task_id": "task-1"}], 0)
+    assert webhooks.get_store() is store
+
+def celery_with_state(state, result=None):
+    task = SimpleNamespace(AsyncResult=lambda task_id: SimpleNamespace(state=state, result=result, info=result))
+    return SimpleNamespace(check_plagiarism_task=task)
+
+async def test_unknown_task_is_404(monkeypatch):
+    from routes import plagiarism
+
+    monkeypatch.setattr(plagiarism.subsystems, "get", lambda name: celery_with_state("PENDING"))
+    with pytest.raises(HTTPException) as exc:
+        await plagiarism.get_plagiarism_result("made-up")
+    assert exc.value.status_code == 404
+
+async def test_queued_task_is_processing(monkeypatch):
+    from routes import plagiarism
+
+    monkeypatch.setattr(plagiarism.subsystems, "get", lambda name: celery_with_state("QUEUED"))
+    response = await plagiarism.get_plagiarism_result("queued")
+    assert response.body == b'{"task_id":"queued","status":"processing"}'
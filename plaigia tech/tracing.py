@@ -0,0 +1,256 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, List
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from config import settings
+from metrics import route_label
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class Span:
+    """A timed operation within a trace, identified W3C Trace Context style."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "sampled", "start", "end", "attributes")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, sampled: bool, start: Optional[float] = None):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.sampled = sampled
+        self.start = time.time() if start is None else start
+        self.end: Optional[float] = None
+        self.attributes: Dict[str, Any] = {}
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": round((self.end - self.start) * 1000, 3) if self.end else None,
+            "attributes": self.attributes,
+        }
+
+def parse_traceparent(value: Optional[str]):
+    """Return (trace_id, parent_span_id, sampled) from a traceparent header, or None."""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3][:2], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+class FileSpanExporter:
+    """
+    Writes finished spans as JSON lines from a background thread.
+
+    Stands in for a trace collector. The file is rotated to `<path>.1` once it
+    exceeds `max_bytes`, and spans are dropped rather than blocking the caller
+    if the queue is full.
+    """
+
+    def __init__(self, path: str, max_bytes: int, queue_size: int = 10000, batch_size: int = 256):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="span-exporter")
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch: List[Span] = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                logger.warning(f"Failed to export {len(batch)} spans: {e}")
+
+    def _write(self, batch: List[Span]):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+            os.replace(self.path, self.path + ".1")
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(span.to_dict()) + "\n" for span in batch))
+
+    def flush(self, timeout: float = 2.0):
+        """Wait (briefly) for queued spans to be written."""
+        deadline = time.monotonic() + timeout
+        while not self._queue.empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+class Tracer:
+    """
+    Minimal tracer with head sampling.
+
+    The sampling decision is made once, when a trace starts, and travels with
+    the trace context into Celery tasks and upstream calls. Unsampled traces
+    still propagate their ids but record nothing.
+    """
+
+    def __init__(self, exporter: FileSpanExporter, sample_rate: float, enabled: bool = True):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.enabled = enabled
+        self._current: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+    def current(self) -> Optional[Span]:
+        return self._current.get()
+
+    def start_span(
+        self, name: str, parent: Optional[str] = None, start: Optional[float] = None, trust_parent: bool = True
+    ) -> Span:
+        """
+        Start a span under the current one, or a new trace if there is none.
+
+        `parent` is a traceparent header value that takes precedence over the
+        current span, used when continuing a trace from another process. Its
+        sampled flag is followed only if `trust_parent`; otherwise the trace
+        keeps its id but is sampled at `sample_rate`, like a new one.
+        """
+        context = parse_traceparent(parent) if parent else None
+        if context is not None:
+            trace_id, parent_id, sampled = context
+            if not trust_parent:
+                sampled = self._sample()
+        else:
+            current = self._current.get()
+            if current is not None:
+                trace_id, parent_id, sampled = current.trace_id, current.span_id, current.sampled
+            else:
+                trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+                sampled = self._sample()
+        return Span(trace_id, parent_id, name, sampled, start)
+
+    def _sample(self) -> bool:
+        return self.enabled and random.random() < self.sample_rate
+
+    def finish(self, span: Span, end: Optional[float] = None):
+        span.end = time.time() if end is None else end
+        if span.sampled:
+            self.exporter.export(span)
+
+    def activate(self, span: Span):
+        """Make span the current span; returns a token for `deactivate`."""
+        return self._current.set(span)
+
+    def deactivate(self, token):
+        self._current.reset(token)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """Record a child span of the current span around a block."""
+        current = self._current.get()
+        if current is None or not current.sampled:
+            yield None
+            return
+        span = self.start_span(name)
+        span.attributes.update(attributes)
+        token = self._current.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.set("error", type(e).__name__)
+            raise
+        finally:
+            self._current.reset(token)
+            self.finish(span)
+
+    def inject(self, headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Add the current trace context to outgoing headers."""
+        headers = {} if headers is None else headers
+        current = self._current.get()
+        if current is not None:
+            headers["traceparent"] = current.traceparent
+        return headers
+
+class TracingMiddleware:
+    """
+    ASGI middleware that starts (or continues, from an incoming traceparent
+    header) a trace for every HTTP request and returns its traceparent.
+
+    Clients can send any traceparent, so its sampled flag is ignored (and
+    the sample rate applied) unless `trust_incoming` is set.
+    """
+
+    def __init__(self, app, tracer: Tracer, trust_incoming: bool = False):
+        self.app = app
+        self.tracer = tracer
+        self.trust_incoming = trust_incoming
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        incoming = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                incoming = value.decode("latin-1")
+                break
+        span = self.tracer.start_span(scope["method"], parent=incoming, trust_parent=self.trust_incoming)
+        token = self.tracer.activate(span)
+
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                span.set("http.status_code", message["status"])
+                message["headers"] = list(message.get("headers", [])) + [(b"traceparent", span.traceparent.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, traced_send)
+        finally:
+            route = route_label(scope)
+            span.name = f"{scope['method']} {route}"
+            span.set("http.route", route)
+            self.tracer.deactivate(token)
+            self.tracer.finish(span)
+
+# Process-wide tracer
+tracer = Tracer(
+    FileSpanExporter(settings.TRACE_EXPORT_PATH, settings.TRACE_EXPORT_MAX_BYTES),
+    sample_rate=settings.TRACE_SAMPLE_RATE,
+    enabled=settings.TRACING_ENABLED,
+)
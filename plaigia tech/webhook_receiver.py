@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Minimal webhook endpoint for testing completion callbacks locally.
+
+Verifies the signature of every delivery against WEBHOOK_SECRET, prints the
+events it receives and can fail the first N deliveries with a 500 to
+exercise the worker's retry backoff.
+
+Example:
+    ./webhook_receiver.py --port 9000 --fail 2 --output deliveries.jsonl
+    # then submit with "callback_url": "http://localhost:9000/hooks"
+"""
+
+import argparse
+import http.server
+import json
+import threading
+import time
+from config import settings
+from webhooks import SIGNATURE_HEADER, DELIVERY_HEADER, ATTEMPT_HEADER, verify_signature
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """Accepts signed webhook deliveries."""
+
+    protocol_version = "HTTP/1.1"
+    secret = settings.WEBHOOK_SECRET
+    fail_remaining = 0
+    output = None
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        delivery_id = self.headers.get(DELIVERY_HEADER, "-")
+        attempt = self.headers.get(ATTEMPT_HEADER, "-")
+
+        if not verify_signature(self.headers.get(SIGNATURE_HEADER, ""), body, self.secret):
+            print(f"Rejected delivery {delivery_id}: bad signature")
+            self.reply(401)
+            return
+
+        with self.lock:
+            fail = Handler.fail_remaining > 0
+            if fail:
+                Handler.fail_remaining -= 1
+        if fail:
+            print(f"Failing delivery {delivery_id} (attempt {attempt}) on purpose")
+            self.reply(500)
+            return
+
+        payload = json.loads(body)
+        for event in payload["events"]:
+            print(f"Delivery {delivery_id} (attempt {attempt}): {event['type']} task={event['task_id']}")
+        if self.output:
+            with self.lock, open(self.output, "a") as f:
+                f.write(json.dumps({"received_at": time.time(), "attempt": attempt, **payload}) + "\n")
+        self.reply(204)
+
+    def reply(self, status: int):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    """Run the webhook receiver."""
+    parser = argparse.ArgumentParser(description="Receive and verify webhook deliveries")
+    parser.add_argument("--port", type=int, default=9000, help="Port to listen on")
+    parser.add_argument("--fail", type=int, default=0, help="Answer the first N deliveries with HTTP 500")
+    parser.add_argument("--secret", default=settings.WEBHOOK_SECRET, help="Signing secret")
+    parser.add_argument("--output", help="Append verified deliveries to this JSONL file")
+
+    args = parser.parse_args()
+
+    Handler.secret = args.secret
+    Handler.fail_remaining = args.fail
+    Handler.output = args.output
+
+    with http.server.ThreadingHTTPServer(("", args.port), Handler) as httpd:
+        print(f"Receiving webhooks at http://localhost:{args.port}/")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\nReceiver stopped.")
+
+if __name__ == "__main__":
+    main()
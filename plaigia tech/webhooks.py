@@ -0,0 +1,300 @@
+from collections import defaultdict, deque
+from typing import Optional, Dict, List, Any, Tuple, Deque
+from urllib.parse import urlparse
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import random
+import socket
+import threading
+import time
+import uuid
+import httpx
+import redis
+from config import settings
+from redis_pool import redis_pool
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "X-PlagiaTech-Signature"
+DELIVERY_HEADER = "X-PlagiaTech-Delivery"
+ATTEMPT_HEADER = "X-PlagiaTech-Attempt"
+
+# Pending events are batched per endpoint; the "scheduled" key marks that a
+# delivery task is already on its way for that endpoint.
+#
+# KEYS[1] - pending event list for one endpoint
+# KEYS[2] - scheduled marker for that endpoint
+# ARGV[1] - maximum number of events to take
+#
+# Returns {remaining, events}; the marker is cleared with the last event so
+# an event pushed concurrently always schedules a new delivery.
+POP_BATCH_SCRIPT = """
+local events = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+redis.call('LTRIM', KEYS[1], #events, -1)
+local remaining = redis.call('LLEN', KEYS[1])
+if remaining == 0 then
+    redis.call('DEL', KEYS[2])
+end
+return {remaining, events}
+"""
+
+# Safety expiry for the scheduled marker, in case a delivery task is lost
+SCHEDULE_TTL = 300
+
+# While on the in-process store, seconds between attempts to reach Redis again
+STORE_PROBE_INTERVAL = 30
+
+def sign_payload(body: bytes, timestamp: int, secret: Optional[str] = None) -> str:
+    """Signature header value: `t=<unix time>,v1=<HMAC-SHA256 of "<t>.<body>">`."""
+    key = (secret if secret is not None else settings.WEBHOOK_SECRET).encode()
+    digest = hmac.new(key, f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+def verify_signature(header: str, body: bytes, secret: str, tolerance: int = 300) -> bool:
+    """Check a signature header, rejecting timestamps older than `tolerance` seconds."""
+    try:
+        parts = dict(part.split("=", 1) for part in header.split(","))
+        timestamp = int(parts["t"])
+    except (ValueError, KeyError):
+        return False
+    if abs(time.time() - timestamp) > tolerance:
+        return False
+    expected = sign_payload(body, timestamp, secret)
+    return hmac.compare_digest(expected, header)
+
+def address_allowed(address: str) -> bool:
+    """False for loopback, private, link-local and reserved addresses."""
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return not (ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved)
+
+def validate_callback_url(url: str) -> str:
+    """
+    Reject callback URLs we should never call.
+
+    In production, loopback, private and link-local addresses (and localhost)
+    are refused so callbacks can't be pointed at internal services. Host
+    names are checked again when resolved at delivery time (see
+    resolved_host_error).
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("Callback URL must be an absolute http(s) URL")
+    if settings.ENVIRONMENT == "production":
+        host = parsed.hostname
+        if host == "localhost" or host.endswith(".localhost"):
+            raise ValueError("Callback URL must not point to a local address")
+        try:
+            allowed = address_allowed(host)
+        except ValueError:
+            return url
+        if not allowed:
+            raise ValueError("Callback URL must not point to a private address")
+    return url
+
+def resolved_host_error(url: str) -> Optional[str]:
+    """
+    In production, why a callback URL's host must not be called, checking
+    every address it resolves to (a public name can point at an internal
+    address); None if it may be called.
+    """
+    if settings.ENVIRONMENT != "production":
+        return None
+    parsed = urlparse(url)
+    try:
+        infos = socket.getaddrinfo(parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80),
+                                   type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as e:
+        raise httpx.ConnectError(f"Could not resolve {parsed.hostname}: {e}")
+    for info in infos:
+        if not address_allowed(info[4][0]):
+            return f"Callback host {parsed.hostname} resolves to a private address"
+    return None
+
+def endpoint_key(url: str) -> str:
+    return hashlib.blake2b(url.encode(), digest_size=12).hexdigest()
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter before retry number `attempt` (1-based)."""
+    delay = min(settings.WEBHOOK_RETRY_MAX, settings.WEBHOOK_RETRY_BASE * 2 ** (attempt - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+class RedisWebhookStore:
+    """Pending events and the delivery log, shared by all workers through Redis."""
+
+    def __init__(self, client: redis.Redis, log_size: int):
+        self.client = client
+        self.log_size = log_size
+        self._pop_batch = client.register_script(POP_BATCH_SCRIPT)
+
+    def push(self, url: str, event: Dict[str, Any]) -> bool:
+        """Queue an event; returns True if the caller should schedule a delivery."""
+        key = endpoint_key(url)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.rpush(f"webhook:pending:{key}", json.dumps(event))
+        pipe.set(f"webhook:scheduled:{key}", "1", nx=True, ex=SCHEDULE_TTL)
+        _, scheduled = pipe.execute()
+        return bool(scheduled)
+
+    def pop_batch(self, url: str, size: int) -> Tuple[List[Dict[str, Any]], int]:
+        key = endpoint_key(url)
+        remaining, events = self._pop_batch(
+            keys=[f"webhook:pending:{key}", f"webhook:scheduled:{key}"], args=[size]
+        )
+        return [json.loads(event) for event in events], int(remaining)
+
+    def log(self, entry: Dict[str, Any]):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.lpush("webhook:log", json.dumps(entry))
+        pipe.ltrim("webhook:log", 0, self.log_size - 1)
+        pipe.execute()
+
+    def recent(self, limit: int) -> List[Dict[str, Any]]:
+        return [json.loads(entry) for entry in self.client.lrange("webhook:log", 0, limit - 1)]
+
+class LocalWebhookStore:
+    """In-process fallback used when Redis is unreachable (e.g. eager mode in development)."""
+
+    def __init__(self, log_size: int):
+        self._pending: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._scheduled: set = set()
+        self._log: Deque[Dict[str, Any]] = deque(maxlen=log_size)
+        self._lock = threading.Lock()
+
+    def push(self, url: str, event: Dict[str, Any]) -> bool:
+        with self._lock:
+            self._pending[url].append(event)
+            if url in self._scheduled:
+                return False
+            self._scheduled.add(url)
+            return True
+
+    def pop_batch(self, url: str, size: int) -> Tuple[List[Dict[str, Any]], int]:
+        with self._lock:
+            pending = self._pending[url]
+            events = [pending.popleft() for _ in range(min(size, len(pending)))]
+            if not pending:
+                self._scheduled.discard(url)
+            return events, len(pending)
+
+    def log(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._log.appendleft(entry)
+
+    def recent(self, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._log)[:limit]
+
+    def drain(self) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        """Take every pending event, per endpoint."""
+        with self._lock:
+            pending = [(url, list(events)) for url, events in self._pending.items() if events]
+            self._pending.clear()
+            self._scheduled.clear()
+            return pending
+
+_store = None
+_local: Optional[LocalWebhookStore] = None
+_next_probe = 0.0
+_client: Optional[httpx.Client] = None
+_lock = threading.Lock()
+
+def get_store():
+    """
+    Redis-backed store if Redis is reachable, otherwise the in-process fallback.
+
+    While on the fallback, Redis is tried again every STORE_PROBE_INTERVAL
+    seconds (or as soon as the pool reports it available), and events still
+    pending locally move to Redis when it comes back.
+    """
+    global _store, _local, _next_probe
+    if _store is not None:
+        return _store
+    with _lock:
+        if _store is None and (redis_pool.available or time.monotonic() >= _next_probe):
+            try:
+                client = redis_pool.sync_client()
+                client.ping()
+                store = RedisWebhookStore(client, settings.WEBHOOK_LOG_SIZE)
+                if _local is not None:
+                    for url, pending in _local.drain():
+                        for event in pending:
+                            store.push(url, event)
+                    logger.info("Redis reachable again; webhooks now use the shared store")
+                _store, _local = store, None
+            except redis.RedisError as e:
+                if _local is None:
+                    logger.warning(f"Redis unavailable for webhooks ({e}); batching and delivery log are per-process")
+                    _local = LocalWebhookStore(settings.WEBHOOK_LOG_SIZE)
+                _next_probe = time.monotonic() + STORE_PROBE_INTERVAL
+        return _store or _local
+
+def http_client() -> httpx.Client:
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = httpx.Client(timeout=settings.WEBHOOK_TIMEOUT, follow_redirects=False)
+    return _client
+
+def build_event(event_type: str, task_id: str, status: str, result: Any = None, error: Optional[str] = None) -> Dict[str, Any]:
+    event = {
+        "id": uuid.uuid4().hex,
+        "type": event_type,
+        "task_id": task_id,
+        "status": status,
+        "created_at": time.time(),
+    }
+    if result is not None:
+        event["result"] = result
+    if error is not None:
+        event["error"] = error
+    return event
+
+def deliver(url: str, events: List[Dict[str, Any]], delivery_id: str, attempt: int, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """POST one signed batch; returns its delivery log entry (without the outcome)."""
+    body = json.dumps({"delivery_id": delivery_id, "events": events}, separators=(",", ":")).encode()
+    request_headers = {
+        **(headers or {}),
+        "Content-Type": "application/json",
+        SIGNATURE_HEADER: sign_payload(body, int(time.time())),
+        DELIVERY_HEADER: delivery_id,
+        ATTEMPT_HEADER: str(attempt),
+    }
+    entry = {
+        "delivery_id": delivery_id,
+        "url": url,
+        "attempt": attempt,
+        "events": len(events),
+        "task_ids": [event["task_id"] for event in events],
+        "timestamp": time.time(),
+        "status_code": None,
+        "error": None,
+    }
+    start = time.perf_counter()
+    try:
+        blocked = resolved_host_error(url)
+        if blocked is not None:
+            entry["error"] = blocked
+            entry["blocked"] = True
+        else:
+            response = http_client().post(url, content=body, headers=request_headers)
+            entry["status_code"] = response.status_code
+            if response.status_code >= 300:
+                entry["error"] = f"HTTP {response.status_code}"
+    except httpx.HTTPError as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+    entry["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return entry
+
+def is_retryable(entry: Dict[str, Any]) -> bool:
+    """Network errors, timeouts, 429 and 5xx are retried; other 4xx and blocked hosts are final."""
+    if entry.get("blocked"):
+        return False
+    status = entry["status_code"]
+    return status is None or status in (408, 429) or status >= 500